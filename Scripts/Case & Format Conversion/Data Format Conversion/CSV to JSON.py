@@ -10,9 +10,91 @@ Convert CSV data to JSON format.
 """
 
 import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+if __name__ == "__main__":
+    # Hand the run to a script server, or profile it, before the imports below (see lib/script_client.py)
+    from script_client import bootstrap
+    bootstrap(__file__)
+
 import csv
 import json
 import io
+import itertools
+
+from stream_io import InputReader, OutputWriter
+
+
+# Keep column spill buffers in memory up to this size before rolling to disk
+SPILL_BUFFER_SIZE = 1024 * 1024
+
+
+def _format_element(value, indent):
+    """Return value as pretty JSON, indented to sit inside a container."""
+    text = json.dumps(value, indent=2, ensure_ascii=False)
+    return indent + text.replace('\n', '\n' + indent)
+
+
+def _format_key(key):
+    """Return the `"key": ` prefix of an object member, coercing key like json.dumps."""
+    return json.dumps({key: None}, ensure_ascii=False)[1:-len("null}")]
+
+
+def iter_csv_to_json(lines, format_type="array"):
+    """Convert CSV lines to JSON, yielding output fragments as rows are read.
+    
+    The joined fragments are identical to `csv_to_json`, but only one row is
+    held in memory at a time. The 'object' format spills every column to its
+    own temporary buffer and replays them once the input is exhausted.
+    
+    Args:
+        lines: Iterable of CSV lines (e.g. InputReader().lines())
+        format_type: 'array' for array of objects, 'object' for object with headers as keys
+    """
+    csv_reader = csv.DictReader(lines)
+    
+    if format_type == "array":
+        # Array of objects
+        separator = "[\n"
+        for row in csv_reader:
+            yield separator + _format_element(row, "  ")
+            separator = ",\n"
+        yield "[]" if separator == "[\n" else "\n]"
+    
+    elif format_type == "object":
+        # Object with headers as keys
+        first_row = next(csv_reader, None)
+        if first_row is None:
+            yield "{}"
+            return
+        
+        import tempfile
+        headers = list(first_row.keys())
+        buffers = [tempfile.SpooledTemporaryFile(max_size=SPILL_BUFFER_SIZE, mode='w+', encoding='utf-8')
+                   for _ in headers]
+        try:
+            separator = ""
+            for row in itertools.chain([first_row], csv_reader):
+                for header, buffer in zip(headers, buffers):
+                    buffer.write(separator + json.dumps(row.get(header), ensure_ascii=False))
+                separator = ",\n    "
+            
+            separator = "{\n"
+            for header, buffer in zip(headers, buffers):
+                yield separator + "  " + _format_key(header) + "[\n    "
+                buffer.seek(0)
+                for chunk in iter(lambda: buffer.read(SPILL_BUFFER_SIZE), ""):
+                    yield chunk
+                yield "\n  ]"
+                separator = ",\n"
+            yield "\n}"
+        finally:
+            for buffer in buffers:
+                buffer.close()
+    
+    else:
+        raise ValueError("Invalid format type. Use 'array' or 'object'.")
 
 
 def csv_to_json(csv_text, format_type="array"):
@@ -22,43 +104,28 @@ def csv_to_json(csv_text, format_type="array"):
         csv_text: CSV text to convert
         format_type: 'array' for array of objects, 'object' for object with headers as keys
     """
+    if format_type not in ("array", "object"):
+        return "Invalid format type. Use 'array' or 'object'."
+    
     try:
-        # Parse CSV
-        csv_reader = csv.DictReader(io.StringIO(csv_text))
-        data = list(csv_reader)
-        
-        if format_type == "array":
-            # Array of objects
-            json_output = json.dumps(data, indent=2, ensure_ascii=False)
-        elif format_type == "object":
-            # Object with headers as keys
-            if data:
-                headers = list(data[0].keys())
-                result = {}
-                for header in headers:
-                    result[header] = [row[header] for row in data]
-                json_output = json.dumps(result, indent=2, ensure_ascii=False)
-            else:
-                json_output = "{}"
-        else:
-            return "Invalid format type. Use 'array' or 'object'."
-        
-        return json_output
+        return ''.join(iter_csv_to_json(io.StringIO(csv_text), format_type))
         
     except csv.Error as e:
         return f"CSV Error: {e}"
-    except json.JSONEncodeError as e:
-        return f"JSON Error: {e}"
     except Exception as e:
         return f"Error: {e}"
 
 
 def main():
-    in_text = sys.stdin.read()
-    if in_text:
-        # Default to array format
-        result = csv_to_json(in_text, "array")
-        sys.stdout.write(result)
+    lines = InputReader().lines()
+    first_line = next(lines, '')
+    if first_line:
+        # Default to array format, streaming rows straight to the output
+        with OutputWriter() as output:
+            try:
+                output.writelines(iter_csv_to_json(itertools.chain([first_line], lines), "array"))
+            except csv.Error as e:
+                output.write(f"\nCSV Error: {e}")
     else:
         sys.stdout.write("No CSV data selected for conversion.")
 
@@ -10,9 +10,28 @@ Convert JSON data to CSV format.
 """
 
 import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+if __name__ == "__main__":
+    # Hand the run to a script server, or profile it, before the imports below (see lib/script_client.py)
+    from script_client import bootstrap
+    bootstrap(__file__)
+
 import json
 import csv
 import io
+import itertools
+import shutil
+import tempfile
+
+from json_lines import describe_error, map_json_lines, sniff_json_lines
+from stream_io import InputReader, OutputWriter
+
+
+# JSON Lines output is spooled until every record has converted, so a bad
+# record never replaces the selection with output missing its line
+SPOOL_SIZE = 1 << 24
 
 
 def json_to_csv(json_text):
@@ -67,8 +86,73 @@ def json_to_csv(json_text):
         return f"Error: {e}"
 
 
+def iter_json_lines_to_csv(lines, errors, workers=1):
+    """Convert JSON Lines to CSV, yielding output as each record is converted.
+    
+    Object records become rows under a header taken from the first
+    record's keys; otherwise each array record is a row and any other
+    value a one-cell row. Records that fail to parse or do not fit are
+    skipped and described in errors, and the script then writes nothing.
+    
+    Args:
+        lines: Iterable of input lines
+        errors: List to append "Line N: ..." messages to
+        workers: Worker processes to parse in; see map_json_lines()
+    """
+    output = io.StringIO()
+    writer = csv.writer(output)
+    dict_writer = None
+    has_header = None
+    
+    for number, record, error in map_json_lines(lines, json.loads, workers):
+        if error:
+            errors.append(f"Line {number}: JSON Error: {describe_error(error)}")
+            continue
+        
+        if has_header is None:
+            # The first record decides between object rows and plain rows
+            has_header = isinstance(record, dict)
+            if has_header:
+                dict_writer = csv.DictWriter(output, fieldnames=list(record.keys()))
+                dict_writer.writeheader()
+        
+        try:
+            if has_header:
+                if not isinstance(record, dict):
+                    raise ValueError("expected a JSON object")
+                dict_writer.writerow(record)
+            else:
+                writer.writerow(record if isinstance(record, list) else [record])
+        except ValueError as e:
+            errors.append(f"Line {number}: Error: {e}")
+        
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate()
+
+
 def main():
-    in_text = sys.stdin.read()
+    # Optional arguments: --ndjson to read JSON Lines even when not detected,
+    # and a worker process count to parse them in
+    args = sys.argv[1:]
+    counts = [arg for arg in args if arg.isdigit()]
+    workers = int(counts[0]) if counts else 1
+    
+    reader = InputReader()
+    lines = reader.lines()
+    head, json_lines = sniff_json_lines(lines)
+    if head and ('--ndjson' in args or json_lines):
+        errors = []
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE, mode='w+', encoding='utf-8') as spool:
+            spool.writelines(iter_json_lines_to_csv(itertools.chain(head, lines), errors, workers))
+            if errors:
+                sys.exit('\n'.join(errors))
+            spool.seek(0)
+            with OutputWriter() as output:
+                shutil.copyfileobj(spool, output)
+        return
+    
+    in_text = ''.join(head) + reader.read()
     if in_text:
         result = json_to_csv(in_text)
         sys.stdout.write(result)
@@ -10,12 +10,31 @@ Convert JSON data to YAML format.
 """
 
 import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+if __name__ == "__main__":
+    # Hand the run to a script server, or profile it, before the imports below (see lib/script_client.py)
+    from script_client import bootstrap
+    bootstrap(__file__)
+
+import itertools
 import json
-import yaml
+import shutil
+import tempfile
+
+from json_lines import describe_error, map_json_lines, sniff_json_lines
+from stream_io import InputReader, OutputWriter
+
+
+# JSON Lines output is spooled until every record has converted, so a bad
+# record never replaces the selection with output missing its line
+SPOOL_SIZE = 1 << 24
 
 
 def json_to_yaml(json_text):
     """Convert JSON text to YAML format."""
+    import yaml
     try:
         # Parse JSON
         data = json.loads(json_text)
@@ -33,8 +52,52 @@ def json_to_yaml(json_text):
         return f"Error: {e}"
 
 
+def json_record_to_yaml(line):
+    """Convert one JSON Lines record to a YAML document."""
+    import yaml
+    return yaml.dump(json.loads(line), explicit_start=True, default_flow_style=False, sort_keys=False, indent=2)
+
+
+def iter_json_lines_to_yaml(lines, errors, workers=None):
+    """Convert JSON Lines to a stream of YAML documents, one per record.
+    
+    Records that fail to parse are skipped and described in errors, and
+    the script then writes nothing.
+    
+    Args:
+        lines: Iterable of input lines
+        errors: List to append "Line N: ..." messages to
+        workers: Worker processes to convert in; see map_json_lines()
+    """
+    for number, document, error in map_json_lines(lines, json_record_to_yaml, workers):
+        if error:
+            errors.append(f"Line {number}: JSON Error: {describe_error(error)}")
+        else:
+            yield document
+
+
 def main():
-    in_text = sys.stdin.read()
+    # Optional arguments: --ndjson to read JSON Lines even when not detected,
+    # and a worker process count to convert them in
+    args = sys.argv[1:]
+    counts = [arg for arg in args if arg.isdigit()]
+    workers = int(counts[0]) if counts else None
+    
+    reader = InputReader()
+    lines = reader.lines()
+    head, json_lines = sniff_json_lines(lines)
+    if head and ('--ndjson' in args or json_lines):
+        errors = []
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE, mode='w+', encoding='utf-8') as spool:
+            spool.writelines(iter_json_lines_to_yaml(itertools.chain(head, lines), errors, workers))
+            if errors:
+                sys.exit('\n'.join(errors))
+            spool.seek(0)
+            with OutputWriter() as output:
+                shutil.copyfileobj(spool, output)
+        return
+    
+    in_text = ''.join(head) + reader.read()
     if in_text:
         result = json_to_yaml(in_text)
         sys.stdout.write(result)
@@ -10,12 +10,20 @@ Convert YAML data to JSON format.
 """
 
 import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+if __name__ == "__main__":
+    # Hand the run to a script server, or profile it, before the imports below (see lib/script_client.py)
+    from script_client import bootstrap
+    bootstrap(__file__)
+
 import json
-import yaml
 
 
 def yaml_to_json(yaml_text):
     """Convert YAML text to JSON format."""
+    import yaml
     try:
         # Parse YAML
         data = yaml.safe_load(yaml_text)
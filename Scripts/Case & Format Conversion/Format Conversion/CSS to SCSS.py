@@ -10,117 +10,183 @@ Convert CSS code to SCSS with basic nesting and variables.
 """
 
 import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+if __name__ == "__main__":
+    # Hand the run to a script server, or profile it, before the imports below (see lib/script_client.py)
+    from script_client import bootstrap
+    bootstrap(__file__)
+
 import re
 
+from css_parser import AtRule, Comment, Declaration, Rule, Selector, parse_stylesheet, tokens_text, walk
+
+
+# Functions timed as each phase of a profiled run (see lib/script_profiler.py)
+PROFILE_PHASES = {
+    'parse': ['parse_stylesheet'],
+    'transform': ['add_nesting', 'extract_color_variables', 'extract_mixins'],
+    'format': ['format_scss'],
+}
+
+HEX_COLOR_PATTERN = re.compile(r'#(?:[0-9a-fA-F]{3,4}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})')
+
+INDENT = '  '
+
+FLEX_MIXINS = """@mixin flex-center {
+  display: flex;
+  justify-content: center;
+  align-items: center;
+}
+
+@mixin flex-between {
+  display: flex;
+  justify-content: space-between;
+  align-items: center;
+}
+
+"""
+
 
 def css_to_scss(css_code):
     """Convert CSS code to SCSS."""
-    scss_code = css_code
+    nodes = parse_stylesheet(css_code).nodes
     
     # Add basic nesting for related selectors
-    scss_code = add_nesting(scss_code)
+    nested = add_nesting(nodes)
     
     # Convert color values to variables
-    scss_code = extract_color_variables(scss_code)
+    variable_map = extract_color_variables(nodes)
+    
+    scss_code = '\n'.join(format_scss(nested, variable_map)) + '\n'
+    if variable_map:
+        variables = [f"{var_name}: {color};" for color, var_name in variable_map.items()]
+        scss_code = "// Color Variables\n" + '\n'.join(variables) + "\n\n" + scss_code
     
     # Add basic mixins for repeated patterns
-    scss_code = extract_mixins(scss_code)
+    return extract_mixins(nodes) + scss_code
+
+
+def split_nesting(selector):
+    """Split a selector into (parent, nested selector), or (selector, None) if it does not nest.
     
-    return scss_code
+    The parent is the first compound selector; what follows a combinator
+    nests as is, and a pseudo-class or pseudo-element on the parent nests
+    as '&:hover'.
+    """
+    tokens = selector.tokens
+    depth = 0
+    for index, token in enumerate(tokens):
+        if token.kind in ('function', '(', '['):
+            depth += 1
+        elif token.kind in (')', ']'):
+            depth = max(depth - 1, 0)
+        elif depth == 0 and index and (token.kind == 'ws' or token.text in ('>', '+', '~')):
+            rest = tokens[index:]
+            while rest[0].kind == 'ws':
+                rest = rest[1:]
+            return tokens_text(tokens[:index]), Selector(tokens_text(rest), rest, rest[0].line, rest[0].column)
+    
+    pseudo = next((index for index, token in enumerate(tokens) if token.kind == ':'), 0)
+    if pseudo and tokens[0].text != '&':
+        return tokens_text(tokens[:pseudo]), Selector('&' + tokens_text(tokens[pseudo:]), tokens[pseudo:],
+                                                     tokens[pseudo].line, tokens[pseudo].column)
+    return selector.text, None
 
 
-def add_nesting(css):
-    """Add basic nesting to related selectors."""
-    # This is a simplified nesting implementation
-    # Look for selectors that might be related (e.g., .container .item)
-    lines = css.split('\n')
+def add_nesting(nodes):
+    """Nest consecutive rules that share a parent selector under one parent rule.
+    
+    Only neighbouring rules are merged, so the cascade order between rules
+    for the same elements is kept. Rules with several selectors stay as they are.
+    """
     result = []
-    i = 0
+    group = []  # (parent, nested selector or None, rule) for the rules being merged
     
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        if line and not line.startswith('/*'):
-            # Check if this selector contains another selector
-            if ' ' in line and not line.startswith('@'):
-                # Split the selector
-                parts = line.split(' ')
-                if len(parts) == 2:
-                    parent, child = parts
-                    # Look for the child selector in following lines
-                    result.append(f"{parent} {{")
-                    # Add the child selector with proper indentation
-                    child_selector = child.replace('.', '&.')
-                    result.append(f"  {child_selector}")
-                    # Skip the next few lines if they contain the child selector
-                    i += 1
-                    while i < len(lines) and lines[i].strip().startswith('}'):
-                        i += 1
-                    result.append("}")
-                else:
-                    result.append(line)
-            else:
-                result.append(line)
+    def flush():
+        if len(group) < 2:
+            result.extend(rule for _, _, rule in group)
         else:
-            result.append(line)
+            parent, first = group[0][0], group[0][2]
+            own = [child for _, nested, rule in group if nested is None for child in rule.children]
+            children = [Rule([nested], rule.children, rule.line, rule.column, rule.end_line)
+                        for _, nested, rule in group if nested is not None]
+            selector = Selector(parent, first.selectors[0].tokens, first.line, first.column)
+            result.append(Rule([selector], own + add_nesting(children), first.line, first.column,
+                               group[-1][2].end_line))
+        group.clear()
+    
+    for node in nodes:
+        if isinstance(node, Rule) and len(node.selectors) == 1:
+            parent, nested = split_nesting(node.selectors[0])
+            if group and group[0][0] != parent:
+                flush()
+            group.append((parent, nested, node._replace(children=add_nesting(node.children))))
+            continue
         
-        i += 1
+        flush()
+        if isinstance(node, (Rule, AtRule)) and node.children:
+            node = node._replace(children=add_nesting(node.children))
+        result.append(node)
     
-    return '\n'.join(result)
+    flush()
+    return result
 
 
-def extract_color_variables(css):
-    """Extract color values and convert to SCSS variables."""
-    # Find color values
-    color_pattern = r'#[0-9a-fA-F]{3,6}'
-    colors = re.findall(color_pattern, css)
+def extract_color_variables(nodes):
+    """Map each hex color used in a declaration value to a SCSS variable name, in order of appearance."""
+    variable_map = {}
     
-    if colors:
-        # Create variables section
-        variables = []
-        variable_map = {}
-        
-        for i, color in enumerate(colors):
-            if color not in variable_map:
-                var_name = f"$color-{i+1}"
-                variable_map[color] = var_name
-                variables.append(f"{var_name}: {color};")
-        
-        # Replace colors with variables
-        for color, var_name in variable_map.items():
-            css = css.replace(color, var_name)
-        
-        # Add variables at the top
-        if variables:
-            css = "// Color Variables\n" + '\n'.join(variables) + "\n\n" + css
+    for node in walk(nodes):
+        if isinstance(node, Declaration):
+            for token in node.tokens:
+                if token.kind == 'hash' and HEX_COLOR_PATTERN.fullmatch(token.text) and token.text not in variable_map:
+                    variable_map[token.text] = f"$color-{len(variable_map) + 1}"
     
-    return css
+    return variable_map
 
 
-def extract_mixins(css):
-    """Extract common patterns as mixins."""
-    # Look for repeated patterns (simplified)
-    # This would be more complex in a real implementation
-    
+def extract_mixins(nodes):
+    """Return mixins for common patterns used in the stylesheet."""
     # Look for common flexbox patterns
-    flex_pattern = r'display:\s*flex;'
-    if re.search(flex_pattern, css):
-        mixin = """
-@mixin flex-center {
-  display: flex;
-  justify-content: center;
-  align-items: center;
-}
+    for node in walk(nodes):
+        if isinstance(node, Declaration) and node.property == 'display' and node.value.lower() == 'flex':
+            return FLEX_MIXINS
+    return ''
 
-@mixin flex-between {
-  display: flex;
-  justify-content: space-between;
-  align-items: center;
-}
-"""
-        css = mixin + css
+
+def format_scss(nodes, variable_map, depth=0):
+    """Format nodes as SCSS lines, replacing colors with their variables."""
+    lines = []
+    indent = INDENT * depth
+    
+    for index, node in enumerate(nodes):
+        if isinstance(node, Declaration):
+            value = tokens_text([token._replace(text=variable_map.get(token.text, token.text))
+                                 if token.kind == 'hash' else token for token in node.tokens])
+            important = ' !important' if node.important else ''
+            lines.append(f"{indent}{node.property}: {value}{important};")
+            continue
+        
+        if index and not isinstance(nodes[index - 1], Comment):
+            lines.append('')
+        if isinstance(node, Comment):
+            lines.append(indent + node.text)
+        elif isinstance(node, AtRule):
+            head = f"{indent}@{node.name} {node.prelude}" if node.prelude else f"{indent}@{node.name}"
+            if node.children is None:
+                lines.append(head + ';')
+            else:
+                lines.append(head + ' {')
+                lines.extend(format_scss(node.children, variable_map, depth + 1))
+                lines.append(indent + '}')
+        else:
+            lines.append(f"{indent}{', '.join(selector.text for selector in node.selectors)} {{")
+            lines.extend(format_scss(node.children, variable_map, depth + 1))
+            lines.append(indent + '}')
     
-    return css
+    return lines
 
 
 def main():
@@ -10,10 +10,26 @@ Generate JSON Schema from JSON data.
 """
 
 import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+if __name__ == "__main__":
+    # Hand the run to a script server, or profile it, before the imports below (see lib/script_client.py)
+    from script_client import bootstrap
+    bootstrap(__file__)
+
 import json
 from collections import defaultdict
 
 
+# Functions timed as each phase of a profiled run (see lib/script_profiler.py)
+PROFILE_PHASES = {
+    'parse': ['json.loads'],
+    'transform': ['generate_schema'],
+    'format': ['format_schema'],
+}
+
+
 def generate_schema(data):
     """Generate JSON Schema from data."""
     schema = {
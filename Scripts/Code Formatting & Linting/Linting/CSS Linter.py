@@ -10,192 +10,489 @@ Basic CSS code quality checks and suggestions.
 """
 
 import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+if __name__ == "__main__":
+    # Hand the run to a script server, or profile it, before the imports below (see lib/script_client.py)
+    from script_client import bootstrap
+    bootstrap(__file__)
+
 import re
+import time
+from itertools import groupby
+
+from css_parser import AtRule, Declaration, Rule, parse_stylesheet, selector_specificity, split_number, walk
+
+
+# Functions timed as each phase of a profiled run (see lib/script_profiler.py)
+PROFILE_PHASES = {
+    'parse': ['parse_stylesheet'],
+    'transform': ['collect_css_issues'],
+    'format': ['format_css_issues'],
+}
+
+NAMED_COLORS = {'red', 'blue', 'green', 'black', 'white', 'gray'}
+VENDOR_PREFIX_PATTERN = re.compile(r'-(?:webkit|moz|ms|o)-', re.IGNORECASE)
+SHORT_HEX_PATTERN = re.compile(r'#[0-9a-fA-F]{3}')
+
+# Length units a zero value can drop
+ZERO_UNITS = {'px', 'em', 'rem', 'pt', 'pc', 'in', 'cm', 'mm', 'ex', 'ch'}
+
+# Properties whose plain numbers are not missing a unit
+UNITLESS_PROPERTIES = {
+    'z-index', 'opacity', 'line-height', 'font-weight', 'flex', 'flex-grow', 'flex-shrink',
+    'order', 'orphans', 'widows', 'zoom', 'column-count', 'tab-size', 'animation-iteration-count',
+    'counter-increment', 'counter-reset', 'counter-set', 'grid-row', 'grid-row-start', 'grid-row-end',
+    'grid-column', 'grid-column-start', 'grid-column-end', 'grid-area', 'fill-opacity',
+    'stroke-opacity', 'stroke-miterlimit', 'flood-opacity', 'stop-opacity', 'aspect-ratio',
+    'initial-letter', 'math-depth', 'shape-image-threshold', 'font-size-adjust', 'scale',
+}
 
+# Node types a lint rule can subscribe to, and the method each is visited with
+VISIT_METHODS = {
+    'block': 'visit_block',              # Rules and at-rules with a block
+    'selector': 'visit_selector',        # Each selector of a rule
+    'declaration': 'visit_declaration',  # Each declaration
+    'value': 'visit_value',              # Each value token of a declaration, but whitespace
+}
 
-def lint_css(css_code):
-    """Lint CSS code and return issues."""
-    issues = []
-    
-    # Check for common issues
-    issues.extend(check_missing_semicolons(css_code))
-    issues.extend(check_missing_braces(css_code))
-    issues.extend(check_color_format(css_code))
-    issues.extend(check_units(css_code))
-    issues.extend(check_z_index(css_code))
-    issues.extend(check_vendor_prefixes(css_code))
-    issues.extend(check_specificity(css_code))
-    
-    return format_css_issues(issues)
-
-
-def check_missing_semicolons(css):
-    """Check for missing semicolons."""
-    issues = []
-    lines = css.split('\n')
-    
-    for i, line in enumerate(lines, 1):
-        line = line.strip()
-        if (line and 
-            not line.startswith('/*') and
-            not line.startswith('*') and
-            not line.startswith('}') and
-            not line.startswith('{') and
-            ':' in line and
-            not line.endswith(';') and
-            not line.endswith('{') and
-            not line.endswith('}')):
-            issues.append({
-                'line': i,
-                'severity': 'error',
-                'message': 'Missing semicolon',
-                'code': 'missing-semicolon'
-            })
+# Value token kinds visited for rules that do not narrow token_kinds
+VALUE_TOKEN_KINDS = ('ident', 'function', 'hash', 'number', 'string', 'url', 'delim', ',', ':')
+
+# Specificity outliers need enough selectors to tell what is typical
+OUTLIER_MIN_SELECTORS = 20
+
+RULES = []
+
+
+def register(rule_class):
+    """Class decorator adding a lint rule class to RULES."""
+    RULES.append(rule_class)
+    return rule_class
+
+
+class LintRule:
+    """A lint rule, visited with only the nodes it subscribes to.
     
-    return issues
+    Subclasses list node_types from VISIT_METHODS and implement the matching
+    methods, each returning a list of issues. Declaration subscriptions can
+    be narrowed to properties, and value subscriptions to token_kinds.
+    A new instance lints each stylesheet, so rules may collect state while
+    visited and report on it from finish, called after the walk.
+    """
+    code = None
+    node_types = ()
+    properties = None
+    token_kinds = None
+    
+    def visit_block(self, block):
+        return []
+    
+    def visit_selector(self, selector, rule):
+        return []
+    
+    def visit_declaration(self, declaration):
+        return []
+    
+    def visit_value(self, token, declaration, depth):
+        """depth is the number of functions and parentheses token is nested in."""
+        return []
+    
+    def finish(self):
+        return []
 
 
-def check_missing_braces(css):
-    """Check for missing braces."""
-    issues = []
-    lines = css.split('\n')
+class LintEngine:
+    """Dispatch each node of one tree walk to the rules subscribed to its type.
     
-    brace_count = 0
-    for i, line in enumerate(lines, 1):
-        brace_count += line.count('{')
-        brace_count -= line.count('}')
+    With timings, a dict, every visit is timed and counted in it as
+    timings[rule code] = [visits, seconds].
+    """
+    
+    def __init__(self, rule_classes, timings=None):
+        self.finishers = []
+        self.block_visitors = []
+        self.selector_visitors = []
+        self.declaration_visitors = []
+        self.property_visitors = {}  # Property -> visitors of rules narrowed to it
+        self.value_visitors = {}  # Token kind -> visitors
         
-        if brace_count < 0:
-            issues.append({
-                'line': i,
-                'severity': 'error',
-                'message': 'Mismatched braces',
-                'code': 'mismatched-braces'
-            })
+        for rule_class in rule_classes:
+            rule = rule_class()
+            finish = rule.finish
+            if timings is not None:
+                finish = _timed(finish, timings.setdefault(rule.code, [0, 0.0]))
+            self.finishers.append(finish)
+            for node_type in rule.node_types:
+                visit = getattr(rule, VISIT_METHODS[node_type])
+                if timings is not None:
+                    visit = _timed(visit, timings.setdefault(rule.code, [0, 0.0]))
+                if node_type == 'block':
+                    self.block_visitors.append(visit)
+                elif node_type == 'selector':
+                    self.selector_visitors.append(visit)
+                elif node_type == 'declaration' and rule.properties is not None:
+                    for name in rule.properties:
+                        self.property_visitors.setdefault(name, []).append(visit)
+                elif node_type == 'declaration':
+                    self.declaration_visitors.append(visit)
+                else:
+                    for kind in rule.token_kinds or VALUE_TOKEN_KINDS:
+                        self.value_visitors.setdefault(kind, []).append(visit)
     
-    return issues
+    def lint(self, nodes):
+        """Walk nodes once and return the issues of every rule."""
+        issues = []
+        value_visitors = self.value_visitors
+        
+        for node in walk(nodes):
+            if isinstance(node, Declaration):
+                for visit in self.declaration_visitors:
+                    issues.extend(visit(node))
+                for visit in self.property_visitors.get(node.property, ()):
+                    issues.extend(visit(node))
+                
+                if value_visitors:
+                    depth = 0
+                    for token in node.tokens:
+                        kind = token.kind
+                        if kind in (')', ']'):
+                            depth = max(depth - 1, 0)
+                            continue
+                        for visit in value_visitors.get(kind, ()):
+                            issues.extend(visit(token, node, depth))
+                        if kind in ('function', '(', '['):
+                            depth += 1
+            
+            elif isinstance(node, (Rule, AtRule)):
+                for visit in self.block_visitors:
+                    issues.extend(visit(node))
+                if isinstance(node, Rule):
+                    for selector in node.selectors:
+                        for visit in self.selector_visitors:
+                            issues.extend(visit(selector, node))
+        
+        for finish in self.finishers:
+            issues.extend(finish())
+        return issues
 
 
-def check_color_format(css):
-    """Check color format consistency."""
-    issues = []
-    lines = css.split('\n')
-    
-    for i, line in enumerate(lines, 1):
-        # Check for hex colors
-        hex_colors = re.findall(r'#[0-9a-fA-F]{3,6}', line)
-        for color in hex_colors:
-            if len(color) == 4:  # Short hex
-                issues.append({
-                    'line': i,
-                    'severity': 'style',
-                    'message': f'Use full hex format: {color} → {color[0] + color[1]*2 + color[2]*2 + color[3]*2}',
-                    'code': 'hex-format'
-                })
-        
-        # Check for named colors that could be hex
-        named_colors = ['red', 'blue', 'green', 'black', 'white', 'gray']
-        for color in named_colors:
-            if f': {color}' in line or f': {color};' in line:
-                issues.append({
-                    'line': i,
-                    'severity': 'suggestion',
-                    'message': f'Consider using hex equivalent for {color}',
-                    'code': 'named-color'
-                })
+def _timed(visit, counter):
+    perf_counter = time.perf_counter
     
+    def timed_visit(*args):
+        start = perf_counter()
+        try:
+            return visit(*args)
+        finally:
+            counter[0] += 1
+            counter[1] += perf_counter() - start
+    
+    return timed_visit
+
+
+def lint_css(css_code, timings=None):
+    """Lint CSS code and return issues.
+    
+    With timings, a dict, parsing and each rule's visits are timed in it;
+    see LintEngine.
+    """
+    return format_css_issues(collect_css_issues(css_code, timings))
+
+
+def collect_css_issues(css_code, timings=None):
+    """Lint CSS code and return the issue dicts in source order; see lint_css()."""
+    start = time.perf_counter()
+    stylesheet = parse_stylesheet(css_code)
+    if timings is not None:
+        timings['(parse)'] = [1, time.perf_counter() - start]
+    
+    issues = [make_issue(error.line, error.column, 'error', error.message, error.code)
+              for error in stylesheet.errors]
+    issues.extend(LintEngine(RULES, timings).lint(stylesheet.nodes))
+    
+    issues.sort(key=lambda issue: (issue['line'], issue['column']))
     return issues
 
 
-def check_units(css):
-    """Check for proper unit usage."""
-    issues = []
-    lines = css.split('\n')
-    
-    for i, line in enumerate(lines, 1):
-        # Check for missing units on numeric values
-        if re.search(r':\s*[0-9]+\s*;', line) and not re.search(r':\s*[0-9]+\s*(px|em|rem|%|vh|vw|pt|pc|in|cm|mm|ex|ch)\s*;', line):
-            issues.append({
-                'line': i,
-                'severity': 'warning',
-                'message': 'Consider adding unit to numeric value',
-                'code': 'missing-unit'
-            })
+def make_issue(line, column, severity, message, code):
+    """Return an issue dict positioned at line and column."""
+    return {
+        'line': line,
+        'column': column,
+        'severity': severity,
+        'message': message,
+        'code': code
+    }
+
+
+@register
+class MissingSemicolonRule(LintRule):
+    """A block's last declaration running on to a closing brace on a later line.
+    
+    Semicolons missing between declarations are reported by the parser.
+    """
+    code = 'missing-semicolon'
+    node_types = ('block',)
+    
+    def visit_block(self, block):
+        last = next((child for child in reversed(block.children or ()) if isinstance(child, Declaration)), None)
+        if last is None or last.terminated:
+            return []
         
-        # Check for zero with units
-        if re.search(r':\s*0\s*(px|em|rem|pt|pc|in|cm|mm|ex|ch)\s*;', line):
-            issues.append({
-                'line': i,
-                'severity': 'style',
-                'message': 'Zero values don\'t need units',
-                'code': 'zero-unit'
-            })
+        end = last.tokens[-1] if last.tokens else last
+        if block.end_line == end.line:
+            return []
+        return [make_issue(end.line, end.column + len(getattr(end, 'text', last.property)),
+                           'error', 'Missing semicolon', self.code)]
+
+
+@register
+class HexFormatRule(LintRule):
+    """Short hex colors."""
+    code = 'hex-format'
+    node_types = ('value',)
+    token_kinds = ('hash',)
     
-    return issues
+    def visit_value(self, token, declaration, depth):
+        color = token.text
+        if not SHORT_HEX_PATTERN.fullmatch(color):
+            return []
+        return [make_issue(token.line, token.column, 'style',
+                           f'Use full hex format: {color} → {color[0] + color[1]*2 + color[2]*2 + color[3]*2}',
+                           self.code)]
 
 
-def check_z_index(css):
-    """Check z-index values."""
-    issues = []
-    lines = css.split('\n')
-    
-    for i, line in enumerate(lines, 1):
-        if 'z-index' in line:
-            match = re.search(r'z-index:\s*(-?\d+)', line)
-            if match:
-                value = int(match.group(1))
-                if value > 1000:
-                    issues.append({
-                        'line': i,
-                        'severity': 'warning',
-                        'message': f'High z-index value ({value}) - consider using CSS custom properties',
-                        'code': 'high-z-index'
-                    })
+@register
+class NamedColorRule(LintRule):
+    """Named colors that could be hex."""
+    code = 'named-color'
+    node_types = ('value',)
+    token_kinds = ('ident',)
     
-    return issues
+    def visit_value(self, token, declaration, depth):
+        color = token.text.lower()
+        if color not in NAMED_COLORS:
+            return []
+        return [make_issue(token.line, token.column, 'suggestion',
+                           f'Consider using hex equivalent for {color}', self.code)]
+
+
+@register
+class MissingUnitRule(LintRule):
+    """A plain nonzero number as the value of a property that takes lengths."""
+    code = 'missing-unit'
+    node_types = ('declaration',)
+    
+    def visit_declaration(self, declaration):
+        tokens = declaration.tokens
+        if (len(tokens) != 1 or tokens[0].kind != 'number' or
+                declaration.property in UNITLESS_PROPERTIES or declaration.property.startswith('--')):
+            return []
+        value, unit = split_number(tokens[0].text)
+        if unit or value == 0:
+            return []
+        return [make_issue(tokens[0].line, tokens[0].column, 'warning',
+                           'Consider adding unit to numeric value', self.code)]
 
 
-def check_vendor_prefixes(css):
-    """Check for vendor prefixes."""
-    issues = []
-    lines = css.split('\n')
+@register
+class ZeroUnitRule(LintRule):
+    """Zero lengths with units, outside calc() and other functions, which need them."""
+    code = 'zero-unit'
+    node_types = ('value',)
+    token_kinds = ('number',)
     
-    vendor_properties = ['-webkit-', '-moz-', '-ms-', '-o-']
+    def visit_value(self, token, declaration, depth):
+        if depth:
+            return []
+        value, unit = split_number(token.text)
+        if value != 0 or unit not in ZERO_UNITS:
+            return []
+        return [make_issue(token.line, token.column, 'style', 'Zero values don\'t need units', self.code)]
+
+
+@register
+class HighZIndexRule(LintRule):
+    """z-index values above 1000."""
+    code = 'high-z-index'
+    node_types = ('declaration',)
+    properties = ('z-index',)
     
-    for i, line in enumerate(lines, 1):
-        for prefix in vendor_properties:
-            if prefix in line:
-                issues.append({
-                    'line': i,
-                    'severity': 'info',
-                    'message': f'Vendor prefix {prefix} - check browser support',
-                    'code': 'vendor-prefix'
-                })
+    def visit_declaration(self, declaration):
+        if len(declaration.tokens) != 1 or declaration.tokens[0].kind != 'number':
+            return []
+        token = declaration.tokens[0]
+        value, unit = split_number(token.text)
+        if unit or value <= 1000 or value != int(value):
+            return []
+        return [make_issue(token.line, token.column, 'warning',
+                           f'High z-index value ({int(value)}) - consider using CSS custom properties',
+                           self.code)]
+
+
+@register
+class VendorPrefixRule(LintRule):
+    """Vendor prefixes on properties, value keywords and functions, selectors and at-rules."""
+    code = 'vendor-prefix'
+    node_types = ('block', 'selector', 'declaration', 'value')
+    token_kinds = ('ident', 'function')
     
-    return issues
+    def check(self, name, source):
+        match = VENDOR_PREFIX_PATTERN.match(name)
+        if not match:
+            return []
+        return [make_issue(source.line, source.column, 'info',
+                           f'Vendor prefix {match.group().lower()} - check browser support', self.code)]
+    
+    def visit_block(self, block):
+        return self.check(block.name, block) if isinstance(block, AtRule) else []
+    
+    def visit_selector(self, selector, rule):
+        issues = []
+        for token in selector.tokens:
+            if token.kind in ('ident', 'function'):
+                issues.extend(self.check(token.text, token))
+        return issues
+    
+    def visit_declaration(self, declaration):
+        return self.check(declaration.property, declaration)
+    
+    def visit_value(self, token, declaration, depth):
+        return self.check(token.text, token)
+
+
+@register
+class SpecificityRule(LintRule):
+    """Selectors with more than one ID."""
+    code = 'high-specificity'
+    node_types = ('selector',)
+    
+    def visit_selector(self, selector, rule):
+        if selector_specificity(selector)[0] <= 1:
+            return []
+        return [make_issue(selector.line, selector.column, 'warning',
+                           'High specificity selector - consider reducing ID usage', self.code)]
 
 
-def check_specificity(css):
-    """Check for high specificity selectors."""
-    issues = []
-    lines = css.split('\n')
+@register
+class SelectorIndexRule(LintRule):
+    """Duplicate selectors, overridden declarations and specificity outliers across the stylesheet.
+    
+    Rules are indexed by selector text within their context (the enclosing
+    at-rules and rules), so each report is a dict lookup or one sort rather
+    than a comparison of every pair of rules.
+    """
+    code = 'selector-index'
+    node_types = ('block',)
+    
+    def __init__(self):
+        self.contexts = {}  # id() of a nested rule or at-rule -> its context
+        self.rules = []  # (context, rule) in source order
+    
+    def visit_block(self, block):
+        context = self.contexts.pop(id(block), ())
+        if isinstance(block, AtRule):
+            inner = context + (f'@{block.name} {block.prelude}',)
+        else:
+            inner = context + (', '.join(selector.text for selector in block.selectors),)
+            self.rules.append((context, block))
+        for child in block.children or ():
+            if isinstance(child, (Rule, AtRule)):
+                self.contexts[id(child)] = inner
+        return []
+    
+    def finish(self):
+        index = {}  # (context, selector text) -> [(rule number, selector)]
+        for number, (context, rule) in enumerate(self.rules):
+            for selector in rule.selectors:
+                index.setdefault((context, selector.text), []).append((number, selector))
+        
+        issues = self.find_duplicate_selectors(index)
+        issues.extend(self.find_overridden_declarations(index))
+        issues.extend(self.find_specificity_outliers())
+        return issues
+    
+    def find_duplicate_selectors(self, index):
+        issues = []
+        for uses in index.values():
+            first = uses[0][1]
+            for _, selector in uses[1:]:
+                issues.append(make_issue(selector.line, selector.column, 'warning',
+                                         f'Duplicate selector {selector.text} (first used on line {first.line})',
+                                         'duplicate-selector'))
+        return issues
     
-    for i, line in enumerate(lines, 1):
-        line = line.strip()
-        if line and not line.startswith('/*') and not line.startswith('*'):
-            # Count selectors and IDs
-            selector_count = line.count(',') + 1
-            id_count = line.count('#')
+    def find_overridden_declarations(self, index):
+        """Report declarations that a later rule redeclares for every one of their rule's selectors.
+        
+        Repeats within one rule are left alone, as they are usually fallbacks.
+        A later declaration only overrides an !important one if it is !important too.
+        """
+        overriders = {}  # (id() of declaration, selector text) -> overriding declaration
+        for (context, text), uses in index.items():
+            if len(uses) < 2:
+                continue
+            by_property = {}
+            for number, _ in uses:
+                for child in self.rules[number][1].children:
+                    if isinstance(child, Declaration):
+                        by_property.setdefault(child.property, []).append((number, child))
             
-            if id_count > 1:
-                issues.append({
-                    'line': i,
-                    'severity': 'warning',
-                    'message': 'High specificity selector - consider reducing ID usage',
-                    'code': 'high-specificity'
-                })
+            for declarations in by_property.values():
+                # From the last rule back, remembering the nearest later overriders
+                later, later_important = None, None
+                for number, group in groupby(reversed(declarations), key=lambda item: item[0]):
+                    group = [declaration for _, declaration in group]
+                    for declaration in group:
+                        overrider = later_important if declaration.important else later
+                        if overrider is not None:
+                            overriders[id(declaration), text] = overrider
+                    later = group[-1]
+                    later_important = next((d for d in reversed(group) if d.important), later_important)
+        
+        issues = []
+        for context, rule in self.rules:
+            for child in rule.children:
+                if not isinstance(child, Declaration):
+                    continue
+                overriding = [overriders.get((id(child), selector.text)) for selector in rule.selectors]
+                if overriding and all(overriding):
+                    issues.append(make_issue(child.line, child.column, 'warning',
+                                             f'{child.property} is overridden on line {overriding[0].line}',
+                                             'overridden-declaration'))
+        return issues
     
-    return issues
+    def find_specificity_outliers(self):
+        """Report selectors far more specific than most in the stylesheet: beyond the upper
+        quartile by three interquartile ranges, or three classes, whichever is more."""
+        selectors = [(selector_specificity(selector), selector) for _, rule in self.rules for selector in rule.selectors]
+        if len(selectors) < OUTLIER_MIN_SELECTORS:
+            return []
+        
+        selectors.sort(key=lambda item: item[0])
+        scores = [a * 100 + b * 10 + c for (a, b, c), _ in selectors]
+        lower, upper = scores[len(scores) // 4], scores[len(scores) * 3 // 4]
+        fence = upper + max(3 * (upper - lower), 30)
+        typical = ','.join(map(str, selectors[len(selectors) // 2][0]))
+        
+        issues = []
+        for (specificity, selector), score in zip(selectors, scores):
+            # More than one ID is reported as high specificity already
+            if score > fence and specificity[0] <= 1:
+                issues.append(make_issue(selector.line, selector.column, 'info',
+                                         f'Specificity ({",".join(map(str, specificity))}) is far above '
+                                         f'this stylesheet\'s typical ({typical})', 'specificity-outlier'))
+        return issues
+
+
+def format_rule_timings(timings):
+    """Format timings from lint_css, slowest first."""
+    lines = [f"{'rule':<20} {'visits':>10} {'ms':>10}"]
+    for code, (visits, seconds) in sorted(timings.items(), key=lambda item: -item[1][1]):
+        lines.append(f"{code:<20} {visits:>10} {seconds * 1000:>10.1f}")
+    return '\n'.join(lines) + '\n'
 
 
 def format_css_issues(issues):
@@ -230,7 +527,7 @@ def format_css_issues(issues):
             output.append(f"{icon} {severity.upper()} ({len(by_severity[severity])})")
             
             for issue in by_severity[severity]:
-                output.append(f"  Line {issue['line']}: {issue['message']}")
+                output.append(f"  Line {issue['line']}:{issue['column']}: {issue['message']}")
             
             output.append("")
     
@@ -238,10 +535,15 @@ def format_css_issues(issues):
 
 
 def main():
+    # --timing reports the time spent parsing and in each rule on stderr,
+    # as stdout replaces the selection
+    timings = {} if '--timing' in sys.argv[1:] else None
     in_text = sys.stdin.read()
     if in_text:
-        result = lint_css(in_text)
+        result = lint_css(in_text, timings)
         sys.stdout.write(result)
+        if timings is not None:
+            sys.stderr.write(format_rule_timings(timings))
     else:
         sys.stdout.write("No CSS code selected for linting.")
 
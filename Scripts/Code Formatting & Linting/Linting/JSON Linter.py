@@ -10,20 +10,143 @@ Validate and lint JSON data with detailed error reporting.
 """
 
 import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+if __name__ == "__main__":
+    # Hand the run to a script server, or profile it, before the imports below (see lib/script_client.py)
+    from script_client import bootstrap
+    bootstrap(__file__)
+
+import itertools
 import json
 import re
 
+from json_lines import map_json_lines, sniff_json_lines
+from stream_io import InputReader
+
+
+# Functions timed as each phase of a profiled run (see lib/script_profiler.py)
+# JSON is parsed as it is checked, so parsing counts as the transform
+PROFILE_PHASES = {
+    'transform': ['collect_json_issues', 'collect_json_lines_issues'],
+    'format': ['format_json_issues'],
+}
+
+
+# One token per match, after any whitespace: punctuation, string, number,
+# bare word, comment, single-quoted string, stray character or end of text.
+# Strings match runs of plain characters between escapes, as an alternative
+# per character would keep backtracking state for each one.
+TOKEN_PATTERN = re.compile(r'''
+    ([ \t\n\r]*)
+    (?:
+        ([{}\[\]:,])
+      | ("[^"\\\x00-\x1f]*(?:\\.[^"\\\x00-\x1f]*)*")
+      | (-?(?:Infinity|(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?))
+      | ([A-Za-z_$][\w$]*)
+      | (//[^\n]*|/\*.*?\*/)
+      | ('[^'\\\n]*(?:\\.[^'\\\n]*)*')
+      | (.)
+      | \Z
+    )
+''', re.VERBOSE | re.DOTALL)
+(TOKEN_PUNCTUATION, TOKEN_STRING, TOKEN_NUMBER, TOKEN_WORD,
+ TOKEN_COMMENT, TOKEN_SINGLE_QUOTED, TOKEN_OTHER) = range(2, 9)
+
+LITERALS = {
+    'true': ('boolean', True),
+    'false': ('boolean', False),
+    'null': ('null', None),
+    'NaN': ('number', float('nan')),
+    'Infinity': ('number', float('inf')),
+}
+
+# Parser states and the error reported when a token does not fit them
+EXPECT_VALUE, EXPECT_KEY, EXPECT_COLON, EXPECT_COMMA, EXPECT_END = range(5)
+STATE_ERRORS = {
+    EXPECT_VALUE: 'Expecting value',
+    EXPECT_KEY: 'Expecting property name enclosed in double quotes',
+    EXPECT_COLON: "Expecting ':' delimiter",
+    EXPECT_COMMA: "Expecting ',' delimiter",
+    EXPECT_END: 'Extra data',
+}
+
+CONTROL_CHARACTER_PATTERN = re.compile(r'[\x00-\x1f]')
+
+# Value events and the type names they are counted under
+EVENT_TYPES = {
+    'start_map': 'objects',
+    'start_array': 'arrays',
+    'string': 'strings',
+    'number': 'numbers',
+    'boolean': 'booleans',
+    'null': 'nulls',
+}
+START_EVENTS = {'start_map', 'start_array'}
+END_EVENTS = {'end_map', 'end_array'}
+
+# Naming styles of root object keys, which should not be mixed
+CAMEL_CASE_PATTERN = re.compile(r'^[a-z][a-zA-Z0-9]*$')
+SNAKE_CASE_PATTERN = re.compile(r'^[a-z][a-z0-9_]*$')
+
 
 def lint_json(json_text):
     """Lint JSON code and return issues."""
+    return lint_json_chunks([json_text])
+
+
+def lint_json_chunks(chunks):
+    """Lint JSON read as an iterable of text chunks and return issues."""
+    return format_json_issues(*collect_json_issues(chunks))
+
+
+def lint_json_record(line):
+    """Lint one JSON Lines record and return its issues."""
+    return collect_json_issues([line])[0]
+
+
+def lint_json_lines(lines, workers=None):
+    """Lint JSON Lines, one record per line, and return issues.
+    
+    Records are linted independently, in worker processes for large
+    inputs (see map_json_lines), and their issues reported on their line.
+    """
+    return format_json_issues(collect_json_lines_issues(lines, workers))
+
+
+def collect_json_lines_issues(lines, workers=None):
+    """Lint JSON Lines and return the issue dicts; see lint_json_lines()."""
+    issues = []
+    for number, record_issues, error in map_json_lines(lines, lint_json_record, workers):
+        for issue in record_issues:
+            issue['line'] = number
+            issues.append(issue)
+    
+    return issues
+
+
+def collect_json_issues(chunks):
+    """Lint JSON read as an iterable of text chunks, returning (issues, structure).
+    
+    structure is None when the JSON could not be parsed.
+    """
     issues = []
+    structure = None
+    size = 0
     
-    # Basic JSON validation
+    def counted(chunks):
+        nonlocal size
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    
+    # A single parse reports syntax problems and collects what the checks need
     try:
-        data = json.loads(json_text)
-        issues.extend(check_json_structure(data, json_text))
-        issues.extend(check_json_style(json_text))
-        issues.extend(check_json_best_practices(data, json_text))
+        structure = analyze_json(iter_json_events(counted(chunks), issues))
+        structure['size'] = size
+        issues.extend(check_json_structure(structure))
+        issues.extend(check_json_best_practices(structure))
     except json.JSONDecodeError as e:
         issues.append({
             'line': e.lineno,
@@ -40,158 +163,386 @@ def lint_json(json_text):
             'code': 'json-error'
         })
     
-    return format_json_issues(issues)
+    return issues, structure
+
+
+def iter_json_events(chunks, issues):
+    """Parse JSON text from an iterable of chunks and yield (event, value, line, column) tuples.
+    
+    Events are start_map, map_key, end_map, start_array, end_array, string,
+    number, boolean and null, positioned at their first character. Comments,
+    single-quoted strings, unquoted keys and trailing commas are tolerated
+    and appended to issues, as are duplicate keys; any other syntax error
+    raises json.JSONDecodeError. Tokens may straddle chunks; only the
+    unfinished tail of a chunk is kept in memory.
+    """
+    stack = []  # Open containers: key -> (line, column) dict for objects, None for arrays
+    state = EXPECT_VALUE
+    opened = False  # The innermost container has no members yet
+    comma = None
+    line, line_start = 1, 0
+    base = 0  # Offset of text in the whole document
+    
+    chunks = iter(chunks)
+    text = next(chunks, '')
+    if text.startswith('\ufeff'):
+        # As json.loads() reports it
+        raise json_syntax_error('Unexpected UTF-8 BOM (decode using utf-8-sig)', 1, 1, 0)
+    while True:
+        following = next(chunks, None)
+        final = following is None
+        carry = None
+        
+        for match in TOKEN_PATTERN.finditer(text):
+            kind = match.lastindex
+            start = match.end(1)
+            if not final and (len(text) - match.end() < (3 if kind == TOKEN_NUMBER else 1) or
+                              (kind == TOKEN_OTHER and _may_continue(text, start))):
+                # The token may continue in the next chunk, as may a number cut
+                # off before an unfinished fraction or exponent
+                carry = match.start()
+                break
+            
+            space = match.group(1)
+            if '\n' in space:
+                line += space.count('\n')
+                line_start = base + match.start() + space.rindex('\n') + 1
+            column = base + start - line_start + 1
+            
+            if kind == 1:
+                # End of text
+                if state != EXPECT_END:
+                    raise json_syntax_error(STATE_ERRORS[state], line, column, base + start)
+                return
+            
+            token = match.group(kind)
+            if kind == TOKEN_COMMENT:
+                issues.append(make_issue(line, column, 'error', 'Comments not allowed in JSON', 'comments'))
+                if '\n' in token:
+                    line += token.count('\n')
+                    line_start = base + start + token.rindex('\n') + 1
+                continue
+            
+            if kind == TOKEN_PUNCTUATION:
+                if token in '{[' and state == EXPECT_VALUE:
+                    if token == '{':
+                        yield 'start_map', None, line, column
+                        stack.append({})
+                        state = EXPECT_KEY
+                    else:
+                        yield 'start_array', None, line, column
+                        stack.append(None)
+                        state = EXPECT_VALUE
+                    opened = True
+                    continue
+                
+                if token in '}]' and stack and (stack[-1] is None) == (token == ']'):
+                    closes_object = token == '}'
+                    if state == EXPECT_COMMA or (state == (EXPECT_KEY if closes_object else EXPECT_VALUE)):
+                        if state != EXPECT_COMMA and not opened:
+                            issues.append(make_issue(comma[0], comma[1], 'error',
+                                                     'Trailing comma not allowed in JSON', 'trailing-comma'))
+                        stack.pop()
+                        yield ('end_map' if closes_object else 'end_array'), None, line, column
+                        state = EXPECT_COMMA if stack else EXPECT_END
+                        opened = False
+                        continue
+                
+                if token == ',' and state == EXPECT_COMMA and stack:
+                    state = EXPECT_VALUE if stack[-1] is None else EXPECT_KEY
+                    comma = (line, column)
+                    opened = False
+                    continue
+                
+                if token == ':' and state == EXPECT_COLON:
+                    state = EXPECT_VALUE
+                    continue
+                
+                raise json_syntax_error(STATE_ERRORS[state], line, column, base + start)
+            
+            if kind == TOKEN_OTHER:
+                if token == '"' and state in (EXPECT_VALUE, EXPECT_KEY):
+                    # Let the standard scanner explain what is wrong with the string
+                    _scan_string(text, start, line, column, base + start)
+                raise json_syntax_error(STATE_ERRORS[state], line, column, base + start)
+            
+            # A scalar token, as a key or a value
+            if kind == TOKEN_STRING:
+                value = token[1:-1] if '\\' not in token else _scan_string(text, start, line, column, base + start)
+                event = 'string'
+            elif kind == TOKEN_SINGLE_QUOTED:
+                issues.append(make_issue(line, column, 'error',
+                                         'Single quotes not allowed in JSON - use double quotes', 'single-quotes'))
+                value = token[1:-1].replace("\\'", "'")
+                event = 'string'
+            elif kind == TOKEN_NUMBER:
+                value = int(token) if token.lstrip('-').isdigit() else float(token)
+                event = 'number'
+            elif state == EXPECT_KEY:
+                issues.append(make_issue(line, column, 'error', 'Object keys must be quoted in JSON', 'unquoted-keys'))
+                value = token
+                event = 'string'
+            elif token in LITERALS:
+                event, value = LITERALS[token]
+            else:
+                # A literal run into other characters fails where the literal ends
+                for literal in LITERALS:
+                    if state == EXPECT_VALUE and token.startswith(literal):
+                        raise json_syntax_error(STATE_ERRORS[EXPECT_COMMA if stack else EXPECT_END],
+                                                line, column + len(literal), base + start + len(literal))
+                raise json_syntax_error(STATE_ERRORS[state], line, column, base + start)
+            
+            if state == EXPECT_KEY and event == 'string':
+                keys = stack[-1]
+                if value in keys:
+                    first_line, first_column = keys[value]
+                    where = f'at column {first_column}' if first_line == line else f'on line {first_line}'
+                    issues.append(make_issue(line, column, 'warning',
+                                             f'Duplicate key "{value}" (first defined {where})', 'duplicate-key'))
+                else:
+                    keys[value] = (line, column)
+                yield 'map_key', value, line, column
+                state = EXPECT_COLON
+            elif state == EXPECT_VALUE:
+                yield event, value, line, column
+                state = EXPECT_COMMA if stack else EXPECT_END
+            else:
+                raise json_syntax_error(STATE_ERRORS[state], line, column, base + start)
+            opened = False
+        
+        base += carry
+        text = text[carry:] + following
+
 
+def _may_continue(text, start):
+    """Return whether a stray character in a chunk may start a token that ends in a later chunk."""
+    char = text[start]
+    if char == '"':
+        # An unterminated string, unless it already hit a character strings cannot hold
+        return not CONTROL_CHARACTER_PATTERN.search(text, start)
+    if char == "'":
+        return text.find('\n', start) < 0
+    if text.startswith('/*', start):
+        return True
+    return '-Infinity'.startswith(text[start:]) or text[start:] == '/'
+
+
+def _scan_string(text, start, line, column, offset):
+    """Decode the string token at start with json's scanner, positioning its errors in the document."""
+    try:
+        return json.decoder.scanstring(text, start + 1)[0]
+    except json.JSONDecodeError as e:
+        # Strings never span lines, so the error is on the token's line
+        raise json_syntax_error(e.msg, line, column + e.pos - start, offset + e.pos - start) from None
+
+
+def json_syntax_error(message, line, column, offset):
+    """Return a json.JSONDecodeError for a position in a streamed document."""
+    error = json.JSONDecodeError(message, '', 0)
+    error.pos, error.lineno, error.colno = offset, line, column
+    error.args = (f'{message}: line {line} column {column} (char {offset})',)
+    return error
+
+
+def make_issue(line, column, severity, message, code):
+    """Return an issue dict positioned at line and column."""
+    return {
+        'line': line,
+        'column': column,
+        'severity': severity,
+        'message': message,
+        'code': code
+    }
 
-def check_json_structure(data, json_text):
+
+def analyze_json(events):
+    """Collect structure statistics and what the checks need from parser events, in one pass.
+    
+    Open containers are tracked on an explicit stack, and each member of a
+    root object is checked with check_json_member() once its value ends,
+    so memory grows with the nesting depth and the issues found rather
+    than the document size. Returns a dict with the root event, position
+    and emptiness, the maximum nesting depth and where it is first
+    reached, value counts per type, the number of keys, the largest array
+    and object as (members, line), the lines of the first camelCase and
+    snake_case member keys, and the member issues as (structure issues,
+    best practice issues).
+    """
+    structure = {
+        'root': None,
+        'line': 1,
+        'column': 1,
+        'empty': False,
+        'max_depth': 0,
+        'max_depth_line': 1,
+        'counts': dict.fromkeys(EVENT_TYPES.values(), 0),
+        'keys': 0,
+        'largest_array': (0, None),
+        'largest_object': (0, None),
+        'camel_case_line': None,
+        'snake_case_line': None,
+        'member_issues': ([], []),
+    }
+    counts = structure['counts']
+    stack = []  # [member count, line] of each open container
+    member = None  # Root object member whose value has not ended
+    
+    def end_member():
+        for issues, found in zip(structure['member_issues'], check_json_member(member)):
+            issues.extend(found)
+    
+    for event, value, line, column in events:
+        if event == 'map_key':
+            structure['keys'] += 1
+            if len(stack) == 1:
+                member = {'key': value, 'line': line, 'column': column, 'empty': False}
+                for style, pattern in (('camel_case_line', CAMEL_CASE_PATTERN),
+                                       ('snake_case_line', SNAKE_CASE_PATTERN)):
+                    if structure[style] is None and pattern.match(value):
+                        structure[style] = line
+            continue
+        
+        if event in END_EVENTS:
+            size, start_line = stack.pop()
+            depth = len(stack)
+            if not size:
+                # Empty containers count at their own depth
+                if depth > structure['max_depth']:
+                    structure.update(max_depth=depth, max_depth_line=line)
+                if depth == 0:
+                    structure['empty'] = True
+            if depth == 1 and member is not None:
+                member['empty'] = not size
+                end_member()
+                member = None
+            largest = 'largest_object' if event == 'end_map' else 'largest_array'
+            if size > structure[largest][0]:
+                structure[largest] = (size, start_line)
+            continue
+        
+        # A value, either a scalar or the start of a container
+        counts[EVENT_TYPES[event]] += 1
+        depth = len(stack)
+        if stack:
+            stack[-1][0] += 1
+        if depth == 0:
+            structure.update(root=event, line=line, column=column)
+        elif depth == 1 and member is not None:
+            member.update(event=event, value=value, value_line=line, value_column=column)
+            if event not in START_EVENTS:
+                end_member()
+                member = None
+        
+        if event in START_EVENTS:
+            stack.append([0, line])
+        elif depth > structure['max_depth']:
+            structure.update(max_depth=depth, max_depth_line=line)
+    
+    return structure
+
+
+def check_json_structure(structure):
     """Check JSON structure and content."""
     issues = []
     
     # Check for empty objects/arrays
-    if isinstance(data, dict) and not data:
-        issues.append({
-            'line': 1,
-            'severity': 'info',
-            'message': 'Empty JSON object',
-            'code': 'empty-object'
-        })
-    elif isinstance(data, list) and not data:
-        issues.append({
-            'line': 1,
-            'severity': 'info',
-            'message': 'Empty JSON array',
-            'code': 'empty-array'
-        })
+    if structure['empty'] and structure['root'] == 'start_map':
+        issues.append(make_issue(structure['line'], structure['column'], 'info',
+                                 'Empty JSON object', 'empty-object'))
+    elif structure['empty'] and structure['root'] == 'start_array':
+        issues.append(make_issue(structure['line'], structure['column'], 'info',
+                                 'Empty JSON array', 'empty-array'))
     
     # Check for deeply nested structures
-    max_depth = get_max_depth(data)
+    max_depth = structure['max_depth']
     if max_depth > 5:
         issues.append({
-            'line': 1,
+            'line': structure['max_depth_line'],
             'severity': 'warning',
             'message': f'Deep nesting detected (depth: {max_depth})',
             'code': 'deep-nesting'
         })
     
-    # Check for duplicate keys (this is handled by JSON parser, but we can check)
-    if isinstance(data, dict):
-        for key, value in data.items():
-            if isinstance(value, dict) and not value:
-                issues.append({
-                    'line': 1,
-                    'severity': 'info',
-                    'message': f'Empty object for key "{key}"',
-                    'code': 'empty-nested-object'
-                })
+    # Empty nested objects, found by check_json_member()
+    issues.extend(structure['member_issues'][0])
     
     return issues
 
 
-def check_json_style(json_text):
-    """Check JSON formatting and style."""
-    issues = []
-    lines = json_text.split('\n')
-    
-    for i, line in enumerate(lines, 1):
-        # Check for trailing commas
-        if line.strip().endswith(','):
-            issues.append({
-                'line': i,
-                'severity': 'error',
-                'message': 'Trailing comma not allowed in JSON',
-                'code': 'trailing-comma'
-            })
-        
-        # Check for single quotes
-        if "'" in line and not line.strip().startswith('//'):
-            issues.append({
-                'line': i,
-                'severity': 'error',
-                'message': 'Single quotes not allowed in JSON - use double quotes',
-                'code': 'single-quotes'
-            })
-        
-        # Check for comments
-        if '//' in line or '/*' in line:
-            issues.append({
-                'line': i,
-                'severity': 'error',
-                'message': 'Comments not allowed in JSON',
-                'code': 'comments'
-            })
-        
-        # Check for unquoted keys
-        if re.search(r'[^"]\w+[^"]\s*:', line):
-            issues.append({
-                'line': i,
-                'severity': 'error',
-                'message': 'Object keys must be quoted in JSON',
-                'code': 'unquoted-keys'
-            })
-    
-    return issues
-
-
-def check_json_best_practices(data, json_text):
+def check_json_best_practices(structure):
     """Check JSON best practices."""
     issues = []
     
-    if isinstance(data, dict):
-        # Check for camelCase vs snake_case consistency
-        keys = list(data.keys())
-        camel_case_count = sum(1 for key in keys if re.match(r'^[a-z][a-zA-Z0-9]*$', key))
-        snake_case_count = sum(1 for key in keys if re.match(r'^[a-z][a-z0-9_]*$', key))
-        
-        if camel_case_count > 0 and snake_case_count > 0:
+    if structure['root'] == 'start_map':
+        # Check for camelCase vs snake_case consistency, reported where the mix starts
+        camel_case, snake_case = structure['camel_case_line'], structure['snake_case_line']
+        if camel_case is not None and snake_case is not None:
             issues.append({
-                'line': 1,
+                'line': max(camel_case, snake_case),
                 'severity': 'style',
                 'message': 'Mixed naming conventions - use consistent camelCase or snake_case',
                 'code': 'naming-convention'
             })
         
-        # Check for required fields in common structures
-        if 'email' in keys and '@' not in str(data.get('email', '')):
-            issues.append({
-                'line': 1,
-                'severity': 'warning',
-                'message': 'Email field may not contain valid email format',
-                'code': 'email-format'
-            })
-        
-        # Check for date formats
-        date_fields = [key for key in keys if 'date' in key.lower() or 'time' in key.lower()]
-        for field in date_fields:
-            value = data.get(field)
-            if isinstance(value, str) and not re.match(r'^\d{4}-\d{2}-\d{2}', value):
-                issues.append({
-                    'line': 1,
-                    'severity': 'suggestion',
-                    'message': f'Consider ISO 8601 date format for "{field}"',
-                    'code': 'date-format'
-                })
+        # Email and date fields, found by check_json_member()
+        issues.extend(structure['member_issues'][1])
     
     return issues
 
 
-def get_max_depth(obj, depth=0):
-    """Get maximum nesting depth of JSON object."""
-    if isinstance(obj, dict):
-        if not obj:
-            return depth
-        return max(get_max_depth(value, depth + 1) for value in obj.values())
-    elif isinstance(obj, list):
-        if not obj:
-            return depth
-        return max(get_max_depth(item, depth + 1) for item in obj)
-    else:
-        return depth
+def check_json_member(member):
+    """Check a root object member: a dict of key, value event, value and positions.
+    
+    Returns (structure issues, best practice issues), reported by
+    check_json_structure() and check_json_best_practices() in turn.
+    """
+    structure_issues, practice_issues = [], []
+    key = member['key']
+    value = member['value']
+    
+    # Check for empty nested objects
+    if member['event'] == 'start_map' and member['empty']:
+        structure_issues.append(make_issue(member['value_line'], member['value_column'], 'info',
+                                           f'Empty object for key "{key}"', 'empty-nested-object'))
+    
+    # Check for required fields in common structures
+    if key == 'email' and (member['event'] in START_EVENTS or '@' not in str(value)):
+        practice_issues.append(make_issue(member['value_line'], member['value_column'], 'warning',
+                                          'Email field may not contain valid email format', 'email-format'))
+    
+    # Check for date formats
+    if 'date' in key.lower() or 'time' in key.lower():
+        if isinstance(value, str) and not re.match(r'^\d{4}-\d{2}-\d{2}', value):
+            practice_issues.append(make_issue(member['value_line'], member['value_column'], 'suggestion',
+                                              f'Consider ISO 8601 date format for "{key}"', 'date-format'))
+    
+    return structure_issues, practice_issues
 
 
-def format_json_issues(issues):
+def format_json_structure(structure):
+    """Format structure statistics into summary lines."""
+    output = ["=== JSON STRUCTURE ==="]
+    output.extend(f"{name.capitalize()}: {count:,}" for name, count in structure['counts'].items() if count)
+    output.append(f"Keys: {structure['keys']:,}")
+    output.append(f"Max depth: {structure['max_depth']}")
+    
+    for label, key, unit in (('Largest array', 'largest_array', 'items'),
+                             ('Largest object', 'largest_object', 'members')):
+        size, line = structure[key]
+        if line is not None:
+            output.append(f"{label}: {size:,} {unit} (line {line})")
+    
+    output.append(f"Size: {structure['size']:,} characters")
+    return output
+
+
+def format_json_issues(issues, structure=None):
     """Format JSON issues into readable output."""
+    summary = format_json_structure(structure) if structure else []
     if not issues:
-        return "✓ No JSON linting issues found!"
+        if not summary:
+            return "✓ No JSON linting issues found!"
+        return '\n'.join(["✓ No JSON linting issues found!", ""] + summary)
     
     output = []
     output.append("=== JSON LINTING RESULTS ===\n")
@@ -227,13 +578,26 @@ def format_json_issues(issues):
             
             output.append("")
     
+    output.extend(summary)
     return '\n'.join(output)
 
 
 def main():
-    in_text = sys.stdin.read()
-    if in_text:
-        result = lint_json(in_text)
+    # Optional arguments: --ndjson to lint JSON Lines even when not detected,
+    # and a worker process count for them
+    args = sys.argv[1:]
+    counts = [arg for arg in args if arg.isdigit()]
+    workers = int(counts[0]) if counts else None
+    
+    # Stream the input so large documents are never held in memory whole
+    reader = InputReader()
+    lines = reader.lines()
+    head, json_lines = sniff_json_lines(lines)
+    if head and ('--ndjson' in args or json_lines):
+        result = lint_json_lines(itertools.chain(head, lines), workers)
+        sys.stdout.write(result)
+    elif head:
+        result = lint_json_chunks(itertools.chain(head, reader.chunks()))
         sys.stdout.write(result)
     else:
         sys.stdout.write("No JSON data selected for linting.")
@@ -10,170 +10,338 @@ Basic JavaScript code quality checks and suggestions.
 """
 
 import sys
-import re
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+if __name__ == "__main__":
+    # Hand the run to a script server, or profile it, before the imports below (see lib/script_client.py)
+    from script_client import bootstrap
+    bootstrap(__file__)
+
+
+from js_lexer import KEYWORDS, tokenize
+
+
+# Functions timed as each phase of a profiled run (see lib/script_profiler.py)
+PROFILE_PHASES = {
+    'parse': ['tokenize'],
+    'transform': ['collect_javascript_issues'],
+    'format': ['format_issues'],
+}
+
+# Keywords that can end a statement, as values or as statements of their own
+VALUE_KEYWORDS = {'this', 'super', 'null', 'true', 'false', 'break', 'continue', 'return', 'debugger'}
+
+# Names that continue an expression from the previous line rather than start a statement
+CONTINUING_NAMES = {'in', 'instanceof', 'of', 'as', 'else', 'catch', 'finally'}
+
+# Keywords whose parenthesized condition or clause is followed by a statement
+CONDITION_KEYWORDS = {'if', 'for', 'while', 'with', 'switch', 'catch'}
+
+# Contexts whose contents are statements
+STATEMENT_CONTEXTS = {'block', 'function-body'}
 
 
 def lint_javascript(js_code):
     """Lint JavaScript code and return issues."""
-    issues = []
-    
-    # Check for common issues
-    issues.extend(check_semicolons(js_code))
-    issues.extend(check_var_usage(js_code))
-    issues.extend(check_console_logs(js_code))
-    issues.extend(check_undefined_vars(js_code))
-    issues.extend(check_string_quotes(js_code))
-    issues.extend(check_function_declarations(js_code))
-    issues.extend(check_arrow_functions(js_code))
-    
-    return format_issues(issues)
-
-
-def check_semicolons(code):
-    """Check for missing semicolons."""
-    issues = []
-    lines = code.split('\n')
-    
-    for i, line in enumerate(lines, 1):
-        line = line.strip()
-        if (line and 
-            not line.startswith('//') and 
-            not line.startswith('/*') and
-            not line.startswith('*') and
-            not line.startswith('}') and
-            not line.startswith('{') and
-            not line.endswith(';') and
-            not line.endswith(',') and
-            not line.endswith('{') and
-            not line.endswith('}') and
-            'function' not in line and
-            'if' not in line and
-            'for' not in line and
-            'while' not in line and
-            'switch' not in line and
-            'try' not in line and
-            'catch' not in line and
-            'finally' not in line):
-            issues.append({
-                'line': i,
-                'severity': 'warning',
-                'message': 'Missing semicolon',
-                'code': 'missing-semicolon'
-            })
-    
-    return issues
+    return format_issues(collect_javascript_issues(js_code))
 
 
-def check_var_usage(code):
-    """Check for var usage (prefer let/const)."""
-    issues = []
-    lines = code.split('\n')
-    
-    for i, line in enumerate(lines, 1):
-        if re.search(r'\bvar\s+\w+', line):
-            issues.append({
-                'line': i,
-                'severity': 'warning',
-                'message': 'Use let or const instead of var',
-                'code': 'no-var'
-            })
+def collect_javascript_issues(js_code):
+    """Lint JavaScript code and return the issue dicts in source order."""
+    tokens, errors = tokenize(js_code)
+    issues = [make_issue(error.line, error.column, 'error', error.message, error.code) for error in errors]
     
+    # Every check runs in one pass over the token stream
+    state = LintState()
+    for index, token in enumerate(tokens):
+        issues.extend(state.statements.feed(token))
+        for check in TOKEN_CHECKS.get(token.text if token.kind == 'name' else token.kind, ()):
+            issues.extend(check(tokens, index, state))
+    issues.extend(state.statements.finish())
+    
+    issues.sort(key=lambda issue: (issue['line'], issue['column']))
     return issues
 
 
-def check_console_logs(code):
-    """Check for console.log statements."""
-    issues = []
-    lines = code.split('\n')
-    
-    for i, line in enumerate(lines, 1):
-        if 'console.log' in line and not line.strip().startswith('//'):
-            issues.append({
-                'line': i,
-                'severity': 'info',
-                'message': 'Consider removing console.log before production',
-                'code': 'no-console'
-            })
+def make_issue(line, column, severity, message, code):
+    """Return an issue dict positioned at line and column."""
+    return {
+        'line': line,
+        'column': column,
+        'severity': severity,
+        'message': message,
+        'code': code
+    }
+
+
+def token_end(token):
+    """Return the (line, column) just past token, which may span lines."""
+    lines = token.text.splitlines()
+    if len(lines) <= 1:
+        return token.line, token.column + len(token.text)
+    return token.line + len(lines) - 1, len(lines[-1]) + 1
+
+
+def is_property(tokens, index):
+    """Return whether the name at index is a property accessed with '.' or '?.'."""
+    return index > 0 and tokens[index - 1].text in ('.', '?.') and tokens[index - 1].kind == 'punct'
+
+
+class LintState:
+    """State shared by the checks during one pass."""
     
-    return issues
+    def __init__(self):
+        self.statements = StatementTracker()
+        self.quote = None  # The quote of the first string, which the others should use
 
 
-def check_undefined_vars(code):
-    """Check for potentially undefined variables."""
-    issues = []
+class StatementTracker:
+    """Follow blocks, object literals and parentheses through the token stream to find
+    statements that end without a semicolon, where automatic semicolon insertion
+    would end them: at a line break before something that cannot continue them,
+    at a closing brace or at the end of the code.
+    """
     
-    # Simple check for common undefined variables
-    undefined_patterns = [
-        (r'\bundefined\b', 'undefined'),
-        (r'\bnull\b', 'null'),
-    ]
+    def __init__(self):
+        self.stack = ['block']  # Open contexts, from PAREN_CONTEXTS, BRACE_CONTEXTS, 'bracket' and 'template'
+        self.previous = None
+        self.previous_is_property = False
+        self.previous_started_statement = False
+        self.previous_was_key = False
+        self.closed = None  # Context the previous ')' or '}' closed
+        self.statement_start = True  # Whether the next token starts a statement
+        self.key_position = False  # Whether the next token is a key in an object literal or class body
+        self.function = None  # 'declaration' or 'expression' from 'function' until its parameters
+        self.class_kind = None  # 'class' or 'class-expression' from 'class' until its body
+        self.case_label = False  # Whether the next ':' ends a case label
     
-    lines = code.split('\n')
-    for i, line in enumerate(lines, 1):
-        for pattern, var_name in undefined_patterns:
-            if re.search(pattern, line):
-                issues.append({
-                    'line': i,
-                    'severity': 'info',
-                    'message': f'Check usage of {var_name}',
-                    'code': f'check-{var_name}'
-                })
+    def ends_statement(self, token):
+        """Return whether a statement could end with token."""
+        kind = token.kind
+        if kind in ('number', 'string', 'regex'):
+            return True
+        if kind == 'template':
+            return token.text.endswith('`')
+        if kind == 'name':
+            return self.previous_is_property or token.text not in KEYWORDS or token.text in VALUE_KEYWORDS
+        if kind == 'punct':
+            if token.text == ')':
+                return self.closed == 'paren'
+            if token.text == '}':
+                return self.closed in ('object', 'function-body', 'class-expression')
+            return token.text in (']', '++', '--')
+        return False
     
-    return issues
-
-
-def check_string_quotes(code):
-    """Check for consistent string quotes."""
-    issues = []
-    lines = code.split('\n')
+    def starts_statement(self, token):
+        """Return whether token, after a line break, starts a new statement.
+        
+        Operators, '(', '[' and template literals continue the previous line.
+        """
+        kind = token.kind
+        if kind == 'name':
+            return token.text not in CONTINUING_NAMES
+        if kind == 'punct':
+            return token.text in ('{', '++', '--', '!', '~', '@')
+        return kind in ('number', 'string', 'regex')
     
-    for i, line in enumerate(lines, 1):
-        # Check for mixed quotes
-        if "'" in line and '"' in line:
-            issues.append({
-                'line': i,
-                'severity': 'style',
-                'message': 'Use consistent string quotes',
-                'code': 'consistent-quotes'
-            })
+    def feed(self, token):
+        """Follow token, returning a missing semicolon issue for the statement it ends, if any."""
+        issues = []
+        previous = self.previous
+        if previous is not None and self.stack[-1] in STATEMENT_CONTEXTS and self.ends_statement(previous):
+            closes = token.kind == 'punct' and token.text == '}'
+            if closes or (token.newline and self.starts_statement(token)):
+                issues.append(self.missing_semicolon(previous))
+                self.statement_start = True
+        
+        self.follow(token)
+        self.previous_is_property = token.kind == 'name' and previous is not None and previous.text in ('.', '?.')
+        self.previous = token
+        return issues
     
-    return issues
-
-
-def check_function_declarations(code):
-    """Check function declarations."""
-    issues = []
-    lines = code.split('\n')
+    def finish(self):
+        """Return a missing semicolon issue for the last statement, if any."""
+        if self.previous is not None and self.stack[-1] in STATEMENT_CONTEXTS and self.ends_statement(self.previous):
+            return [self.missing_semicolon(self.previous)]
+        return []
     
-    for i, line in enumerate(lines, 1):
-        # Check for function declarations without spacing
-        if re.search(r'function\w', line):
-            issues.append({
-                'line': i,
-                'severity': 'style',
-                'message': 'Add space after function keyword',
-                'code': 'function-spacing'
-            })
+    def missing_semicolon(self, token):
+        line, column = token_end(token)
+        return make_issue(line, column, 'warning', 'Missing semicolon', 'missing-semicolon')
     
-    return issues
+    def follow(self, token):
+        """Update the context for token."""
+        stack = self.stack
+        previous = self.previous
+        text = token.text
+        statement_start = False
+        key_position = False
+        
+        if token.kind == 'name':
+            keyword = text in KEYWORDS and not (previous is not None and previous.text in ('.', '?.'))
+            after_export = previous is not None and previous.text == 'export'
+            if keyword and text == 'function':
+                self.function = 'declaration' if self.statement_start else 'expression'
+            elif keyword and text == 'class':
+                self.class_kind = 'class' if self.statement_start else 'class-expression'
+            elif keyword and text in ('case', 'default') and not after_export:
+                self.case_label = True
+            elif keyword and text in ('else', 'do', 'try', 'finally', 'export', 'default'):
+                statement_start = True
+            elif text == 'async' and self.statement_start:
+                statement_start = True
+            # Modifiers keep the next token in key position: get x(), static y = 1, async *z()
+            key_position = self.key_position and text in ('get', 'set', 'async', 'static')
+        
+        elif token.kind == 'template':
+            if text.startswith('}') and stack[-1] == 'template':
+                stack.pop()
+            if text.endswith('${'):
+                stack.append('template')
+        
+        elif token.kind == 'punct':
+            if text == '(':
+                if previous is not None and previous.text in CONDITION_KEYWORDS and not self.previous_is_property:
+                    stack.append('condition')
+                elif self.function:
+                    stack.append('parameters-' + self.function)
+                    self.function = None
+                elif self.previous_was_key:
+                    stack.append('parameters-method')
+                else:
+                    stack.append('paren')
+            elif text == ')':
+                self.closed = stack.pop() if stack[-1] in PAREN_CONTEXTS else None
+                statement_start = self.closed == 'condition'
+            elif text == '[':
+                stack.append('bracket')
+            elif text == ']':
+                if stack[-1] == 'bracket':
+                    stack.pop()
+            elif text == '{':
+                context = self.brace_context(previous)
+                stack.append(context)
+                statement_start = context in STATEMENT_CONTEXTS
+                key_position = context in KEY_CONTEXTS
+            elif text == '}':
+                self.closed = stack.pop() if len(stack) > 1 and stack[-1] in BRACE_CONTEXTS else None
+                statement_start = self.closed in ('block', 'class')
+                key_position = stack[-1] in ('class', 'class-expression')
+            elif text == ';':
+                statement_start = stack[-1] in STATEMENT_CONTEXTS
+                key_position = stack[-1] in ('class', 'class-expression')
+            elif text == ',':
+                key_position = stack[-1] == 'object'
+            elif text == '*':
+                key_position = self.key_position
+            elif text == ':':
+                # Ends a case or statement label; in an object or a conditional, a value follows
+                label = (stack[-1] in STATEMENT_CONTEXTS and previous is not None and
+                         previous.kind == 'name' and self.previous_started_statement)
+                statement_start = self.case_label or label
+                self.case_label = False
+        
+        self.previous_started_statement = self.statement_start
+        self.previous_was_key = self.key_position
+        self.statement_start = statement_start
+        self.key_position = key_position
+    
+    def brace_context(self, previous):
+        """Return the context a '{' after previous opens."""
+        if self.class_kind:
+            context, self.class_kind = self.class_kind, None
+            return context
+        if previous is None:
+            return 'block'
+        if previous.kind == 'punct' and previous.text == ')':
+            return PARAMETER_BODIES.get(self.closed, 'object')
+        if previous.kind == 'punct' and previous.text == '=>':
+            return 'function-body'
+        if previous.text == 'default' and not self.case_label:
+            return 'object'  # export default {...}
+        return 'block' if self.statement_start else 'object'
 
 
-def check_arrow_functions(code):
-    """Check arrow function usage."""
-    issues = []
-    lines = code.split('\n')
-    
-    for i, line in enumerate(lines, 1):
-        # Check for function expressions that could be arrow functions
-        if re.search(r'function\s*\(\s*\)\s*{', line):
-            issues.append({
-                'line': i,
-                'severity': 'suggestion',
-                'message': 'Consider using arrow function',
-                'code': 'prefer-arrow'
-            })
-    
-    return issues
+PAREN_CONTEXTS = {'condition', 'parameters-declaration', 'parameters-expression', 'parameters-method', 'paren'}
+BRACE_CONTEXTS = {'block', 'function-body', 'object', 'class', 'class-expression'}
+KEY_CONTEXTS = {'object', 'class', 'class-expression'}
+
+# What the '{' after the ')' closing each context opens
+PARAMETER_BODIES = {
+    'condition': 'block',
+    'parameters-declaration': 'block',
+    'parameters-method': 'block',
+    'parameters-expression': 'function-body',
+}
+
+
+def check_var_usage(tokens, index, state):
+    """Check for var usage (prefer let/const)."""
+    if is_property(tokens, index) or index + 1 >= len(tokens) or tokens[index + 1].kind != 'name':
+        return []
+    token = tokens[index]
+    return [make_issue(token.line, token.column, 'warning', 'Use let or const instead of var', 'no-var')]
+
+
+def check_console_logs(tokens, index, state):
+    """Check for console.log calls."""
+    if (is_property(tokens, index) or index + 2 >= len(tokens) or
+            tokens[index + 1].text != '.' or tokens[index + 2].text != 'log'):
+        return []
+    token = tokens[index]
+    return [make_issue(token.line, token.column, 'info',
+                       'Consider removing console.log before production', 'no-console')]
+
+
+def check_undefined_vars(tokens, index, state):
+    """Check for uses of undefined and null."""
+    if is_property(tokens, index):
+        return []
+    token = tokens[index]
+    return [make_issue(token.line, token.column, 'info', f'Check usage of {token.text}', f'check-{token.text}')]
+
+
+def check_string_quotes(tokens, index, state):
+    """Check that strings use the quote of the first one, unless they contain it."""
+    token = tokens[index]
+    quote = token.text[0]
+    if state.quote is None:
+        state.quote = quote
+        return []
+    if quote == state.quote or state.quote in token.text[1:-1]:
+        return []
+    return [make_issue(token.line, token.column, 'style', 'Use consistent string quotes', 'consistent-quotes')]
+
+
+def check_function_declarations(tokens, index, state):
+    """Check for a space between the function keyword and its parameters."""
+    token = tokens[index]
+    if is_property(tokens, index) or index + 1 >= len(tokens):
+        return []
+    following = tokens[index + 1]
+    if following.text not in ('(', '*') or following.newline or following.column != token.column + len(token.text):
+        return []
+    return [make_issue(token.line, token.column, 'style', 'Add space after function keyword', 'function-spacing')]
+
+
+def check_arrow_functions(tokens, index, state):
+    """Check for anonymous function expressions that could be arrow functions."""
+    if state.statements.function != 'expression' or index + 1 >= len(tokens) or tokens[index + 1].text != '(':
+        return []
+    token = tokens[index]
+    return [make_issue(token.line, token.column, 'suggestion', 'Consider using arrow function', 'prefer-arrow')]
+
+
+# Checks by the name they are run for, or by token kind for other tokens
+TOKEN_CHECKS = {
+    'var': [check_var_usage],
+    'console': [check_console_logs],
+    'undefined': [check_undefined_vars],
+    'null': [check_undefined_vars],
+    'function': [check_function_declarations, check_arrow_functions],
+    'string': [check_string_quotes],
+}
 
 
 def format_issues(issues):
@@ -208,7 +376,7 @@ def format_issues(issues):
             output.append(f"{icon} {severity.upper()} ({len(by_severity[severity])})")
             
             for issue in by_severity[severity]:
-                output.append(f"  Line {issue['line']}: {issue['message']}")
+                output.append(f"  Line {issue['line']}:{issue['column']}: {issue['message']}")
             
             output.append("")
     
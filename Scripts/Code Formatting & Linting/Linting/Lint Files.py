@@ -0,0 +1,324 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#%%%{CotEditorXInput=Selection}%%%
+#%%%{CotEditorXOutput=InsertAfterSelection}%%%
+
+"""
+Lint Files - Python Script for CotEditor
+
+Lint whole files and folders with the CSS, JavaScript, JSON and Writing
+Style linters, chosen by file extension, and report every issue as a
+machine-readable record.
+
+Paths or glob patterns (`**` matches any folders) are taken from the
+command line, or one per line from the selection; folders are searched
+for files of the supported types. Files are linted in worker processes
+and each file's issues are written as soon as it is done, one JSON object
+per line:
+
+    {"file": "css/site.css", "linter": "css", "line": 12, "column": 5,
+     "severity": "warning", "message": "...", "code": "zero-unit"}
+
+Results are cached by file content, linter, rules and configuration, so
+files that have not changed since the last run are not linted again.
+
+Options:
+    --format=sarif  Write one SARIF 2.1.0 log once all files are linted
+    --workers=N     Worker processes, by default one per CPU
+    --no-cache      Lint every file, neither reading nor writing the cache
+
+The exit status is 1 if any file has an error-severity issue.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+if __name__ == "__main__":
+    # Hand the run to a script server, or profile it, before the imports below (see lib/script_client.py)
+    from script_client import bootstrap
+    bootstrap(__file__)
+
+import glob
+import importlib.util
+import itertools
+import json
+from collections import namedtuple
+
+from lint_cache import lint_cache_key, open_lint_cache, source_digest
+
+
+# Shared library folder, whose sources version the cached results
+LIB_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib')
+
+# Linter scripts by name: file in this folder, issue collecting function
+# and the file extensions routed to it
+Linter = namedtuple('Linter', ['script', 'function', 'extensions'])
+LINTERS = {
+    'css': Linter('CSS Linter.py', 'collect_css_issues', ('.css',)),
+    'javascript': Linter('JavaScript Linter.py', 'collect_javascript_issues', ('.js', '.mjs', '.cjs')),
+    'json': Linter('JSON Linter.py', 'collect_json_issues', ('.json',)),
+    'json-lines': Linter('JSON Linter.py', 'collect_json_lines_issues', ('.jsonl', '.ndjson')),
+    'writing-style': Linter('Writing Style Linter.py', 'collect_writing_issues', ('.txt', '.md', '.markdown')),
+}
+LINTER_BY_EXTENSION = {extension: name for name, linter in LINTERS.items() for extension in linter.extensions}
+
+# Characters read from a file at a time for the linters that stream their input
+READ_CHUNK_SIZE = 1 << 20
+
+SARIF_LEVELS = {'error': 'error', 'warning': 'warning'}
+
+# Issue codes of results that depend on more than the file content
+UNCACHED_CODES = {'unsupported-file', 'unreadable-file', 'linter-error'}
+
+_modules = {}
+_cache_versions = {}
+
+
+def linter_path(name):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), LINTERS[name].script)
+
+
+def load_linter_module(name):
+    """Return the module of a linter's script, importing it once per process."""
+    script = LINTERS[name].script
+    module = _modules.get(script)
+    if module is None:
+        module_name = os.path.splitext(script)[0].lower().replace(' ', '_')
+        spec = importlib.util.spec_from_file_location(module_name, linter_path(name))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[script] = module
+    return module
+
+
+def load_linter(name):
+    """Return the issue collecting function of a linter."""
+    return getattr(load_linter_module(name), LINTERS[name].function)
+
+
+def cache_version(name):
+    """Return (rule-set version, configuration) bytes keying a linter's cached results.
+    
+    The rule set is versioned by the source of the linter and the shared
+    library; the Writing Style Linter's configuration is its rule set
+    fingerprint, which covers the style dictionaries in use.
+    """
+    version = _cache_versions.get(name)
+    if version is None:
+        libraries = sorted(os.path.join(LIB_DIRECTORY, entry) for entry in os.listdir(LIB_DIRECTORY)
+                           if entry.endswith('.py'))
+        config = b''
+        if name == 'writing-style':
+            config = load_linter_module(name).get_rule_engine().fingerprint
+        version = _cache_versions[name] = (source_digest([linter_path(name)] + libraries), config)
+    return version
+
+
+def linter_for(path):
+    """Return the name of the linter for a file, or None if its type is not supported."""
+    return LINTER_BY_EXTENSION.get(os.path.splitext(path)[1].lower())
+
+
+def find_files(patterns):
+    """Yield each supported file named or matched by patterns once, in order.
+    
+    Folders are searched recursively, skipping hidden ones; files named
+    explicitly are yielded whatever their type, for the caller to report.
+    """
+    seen = set()
+    for pattern in patterns:
+        paths = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for path in paths:
+            if os.path.isdir(path):
+                found = []
+                for folder, folders, files in os.walk(path):
+                    folders[:] = sorted(name for name in folders if not name.startswith('.'))
+                    found.extend(os.path.join(folder, name) for name in sorted(files) if linter_for(name))
+            elif glob.has_magic(pattern) and not linter_for(path):
+                continue
+            else:
+                found = [path]
+            for path in found:
+                key = os.path.normpath(path)
+                if key not in seen:
+                    seen.add(key)
+                    yield path
+
+
+def lint_file(path):
+    """Lint one file with the linter for its type and return (path, linter name, issues)."""
+    name = linter_for(path)
+    if name is None:
+        return path, None, [make_issue(None, None, 'error', 'Unsupported file type', 'unsupported-file')]
+    
+    collect = load_linter(name)
+    try:
+        with open(path, encoding='utf-8') as file:
+            if name == 'json':
+                issues, structure = collect(iter(lambda: file.read(READ_CHUNK_SIZE), ''))
+            elif name == 'json-lines':
+                issues = collect(file, workers=1)
+            elif name == 'writing-style':
+                issues, metrics = collect(file.read())
+            else:
+                issues = collect(file.read())
+    except (OSError, UnicodeDecodeError) as e:
+        issues = [make_issue(None, None, 'error', f'Could not read file: {e}', 'unreadable-file')]
+    except ValueError as e:
+        # Style dictionary problems
+        issues = [make_issue(None, None, 'error', str(e), 'linter-error')]
+    except Exception as e:
+        # A linter bug fails this file only, not the rest of the batch
+        issues = [make_issue(None, None, 'error', f'Linter failed: {type(e).__name__}: {e}', 'linter-error')]
+    
+    return path, name, issues
+
+
+def make_issue(line, column, severity, message, code):
+    """Return an issue dict positioned at line and column, which may be None for the whole file."""
+    return {
+        'line': line,
+        'column': column,
+        'severity': severity,
+        'message': message,
+        'code': code
+    }
+
+
+def look_up_files(paths, cache):
+    """Yield (path, cache key, cached (path, linter name, issues) or None) for each path.
+    
+    The key is None for files that are not cached: without a cache, or for
+    unsupported or unreadable files, left for lint_file() to report.
+    """
+    for path in paths:
+        name = linter_for(path)
+        if cache is None or name is None:
+            yield path, None, None
+            continue
+        try:
+            with open(path, 'rb') as file:
+                content = file.read()
+        except OSError:
+            yield path, None, None
+            continue
+        key = lint_cache_key(content, name, *cache_version(name))
+        issues = cache.get(key)
+        yield path, key, (path, name, issues) if issues is not None else None
+
+
+def store_result(cache, key, result):
+    """Cache a file's fresh lint result under key, returning the result."""
+    path, name, issues = result
+    if key is not None and not any(issue['code'] in UNCACHED_CODES for issue in issues):
+        cache.put(key, issues)
+    return result
+
+
+def lint_files(paths, workers=None, cache=None):
+    """Lint files, yielding (path, linter name, issues) for each as soon as it is done.
+    
+    Files are linted in worker processes, at most twice as many at a time
+    as there are workers, so results stream in completion order; a single
+    file, or a single worker, is linted in this process. With a LintCache,
+    cached results are yielded as they are found and fresh ones are added.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    
+    files = look_up_files(paths, cache)
+    head = list(itertools.islice(files, 2))
+    if len(head) < 2 or workers <= 1:
+        for path, key, cached in itertools.chain(head, files):
+            yield cached or store_result(cache, key, lint_file(path))
+        return
+    
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    with ProcessPoolExecutor(workers) as executor:
+        pending = {}  # Cache key by future
+        for path, key, cached in itertools.chain(head, files):
+            if cached:
+                yield cached
+                continue
+            pending[executor.submit(lint_file, path)] = key
+            if len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield store_result(cache, pending.pop(future), future.result())
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield store_result(cache, pending.pop(future), future.result())
+
+
+def issue_records(path, linter, issues):
+    """Yield a record dict for each issue: its file and linter, then the issue's own keys."""
+    for issue in issues:
+        record = {'file': path, 'linter': linter, 'line': None, 'column': None}
+        record.update(issue)
+        yield record
+
+
+def sarif_log(records):
+    """Return a SARIF 2.1.0 log dict of issue records."""
+    rules = {}
+    results = []
+    for record in records:
+        rules.setdefault(record['code'], {'id': record['code']})
+        location = {'artifactLocation': {'uri': record['file'].replace(os.sep, '/')}}
+        if record['line'] is not None:
+            location['region'] = {'startLine': record['line']}
+            if record['column'] is not None:
+                location['region']['startColumn'] = record['column']
+        results.append({
+            'ruleId': record['code'],
+            'level': SARIF_LEVELS.get(record['severity'], 'note'),
+            'message': {'text': record['message']},
+            'locations': [{'physicalLocation': location}],
+        })
+    
+    return {
+        '$schema': 'https://json.schemastore.org/sarif-2.1.0.json',
+        'version': '2.1.0',
+        'runs': [{
+            'tool': {'driver': {'name': 'CotEditor Linters', 'rules': list(rules.values())}},
+            'results': results,
+        }],
+    }
+
+
+def main():
+    args = sys.argv[1:]
+    options = dict(arg[2:].partition('=')[::2] for arg in args if arg.startswith('--'))
+    patterns = [arg for arg in args if not arg.startswith('--')]
+    if not patterns:
+        patterns = [line.strip() for line in sys.stdin if line.strip()]
+    if not patterns:
+        sys.stdout.write("No files selected for linting.")
+        return
+    workers = int(options['workers']) if options.get('workers') else None
+    sarif = options.get('format') == 'sarif'
+    cache = None if 'no-cache' in options else open_lint_cache()
+    
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    records = []
+    failed = False
+    for path, linter, issues in lint_files(find_files(patterns), workers, cache):
+        failed = failed or any(issue['severity'] == 'error' for issue in issues)
+        if sarif:
+            records.extend(issue_records(path, linter, issues))
+        elif issues:
+            sys.stdout.write(''.join(encode(record) + '\n' for record in issue_records(path, linter, issues)))
+            sys.stdout.flush()
+    if cache is not None:
+        cache.prune()
+    
+    if sarif:
+        json.dump(sarif_log(records), sys.stdout, indent=2, ensure_ascii=False)
+        sys.stdout.write('\n')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,24 +10,608 @@ Analyze text for writing style, grammar, and readability issues.
 """
 
 import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+if __name__ == "__main__":
+    # Hand the run to a script server, or profile it, before the imports below (see lib/script_client.py)
+    from script_client import bootstrap
+    bootstrap(__file__)
+
+import hashlib
+import itertools
 import re
-from collections import Counter
+from collections import Counter, namedtuple
 
+from lint_cache import cache_directory
 
-def lint_writing(text):
-    """Lint text for writing style issues."""
-    issues = []
+
+# Functions timed as each phase of a profiled run (see lib/script_profiler.py)
+PROFILE_PHASES = {
+    'setup': ['get_rule_engine'],
+    'cache': ['open_paragraph_cache', 'ParagraphCache.save'],
+    'transform': ['lint_paragraphs'],
+    'format': ['format_writing_issues'],
+}
+
+# Rule tables; literals and words are matched case-insensitively
+WEASEL_WORDS = [
+    'very', 'really', 'quite', 'rather', 'pretty', 'fairly',
+    'somewhat', 'kind of', 'sort of', 'basically', 'essentially',
+    'literally', 'actually', 'just', 'simply', 'merely'
+]
+
+REDUNDANT_PHRASES = [
+    'free gift', 'new innovation', 'past history', 'future plans',
+    'end result', 'final outcome', 'basic fundamentals',
+    'true facts', 'personal opinion', 'advance warning'
+]
+
+COMMON_TYPOS = {
+    'teh': 'the',
+    'adn': 'and',
+    'recieve': 'receive',
+    'seperate': 'separate',
+    'definately': 'definitely'
+}
+
+WORD_SUGGESTIONS = {
+    'utilize': 'use',
+    'facilitate': 'help',
+    'implement': 'do',
+    'leverage': 'use',
+    'optimize': 'improve',
+    'synergy': 'cooperation',
+    'paradigm': 'model'
+}
+
+# Patterns must not match across lines
+PASSIVE_PATTERNS = [
+    r'(?i:\b(is|are|was|were|be|been|being)[^\S\n]+\w+ed\b)',
+    r'(?i:\b(has|have|had)[^\S\n]+been[^\S\n]+\w+ed\b)',
+    r'(?i:\bwill[^\S\n]+be[^\S\n]+\w+ed\b)'
+]
+MISSING_SPACE_PATTERN = r'[.!?][A-Za-z]'
+
+# Keys a style dictionary file may define
+DICTIONARY_KEYS = ('weasel_words', 'redundant_phrases', 'typos', 'word_suggestions')
+
+# Bump when compiled rule engines change shape, to invalidate cached ones
+RULE_ENGINE_VERSION = '2'
+
+# Paragraph results kept by the incremental lint cache (--cache)
+RESULT_CACHE_ENTRIES = 20000
+
+WORD_PATTERN = re.compile(r'\b\w+\b')
+# Characters dropped from whitespace-separated tokens before they are compared with words
+TOKEN_NOISE_PATTERN = re.compile(r'[^\w\s]+')
+SENTENCE_BREAK_PATTERN = re.compile(r'[.!?]+')
+
+# Report order of the rule families
+(FAMILY_SENTENCE, FAMILY_PASSIVE, FAMILY_WEASEL, FAMILY_REDUNDANCY,
+ FAMILY_READABILITY, FAMILY_GRAMMAR, FAMILY_WORD_CHOICE) = range(7)
+
+# A lint rule. Issues sort by (family, line, rank, position); a rule with
+# once_per_line reports at most one issue per line however often it matches.
+Rule = namedtuple('Rule', ['code', 'severity', 'message', 'family', 'rank',
+                           'whole_word', 'once_per_line'])
+
+
+def _is_word_char(char):
+    """Return whether char is matched by the regex \\w."""
+    return char.isalnum() or char == '_'
+
+
+def _trie_pattern(literals):
+    """Return a regex matching the longest of literals, alternatives factored by common prefixes.
+    
+    A position is then rejected after one character per branch, rather
+    than once for each literal.
+    """
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + pattern + ')?' if '' in node else pattern
+    
+    return build(trie)
+
+
+class RuleEngine:
+    """Literal, word and pattern rules compiled into a few regexes over the text.
+    
+    All literals share one regex over the lowercased text, its alternatives
+    factored by common prefixes like a trie, and all words one alternation
+    over its whitespace-separated tokens, so the cost of a scan grows little
+    with the number of rules. Each rule's patterns are joined into a regex
+    scanned on its own, so no rule hides another's match where the two
+    overlap.
+    
+    to_data() and from_data() exchange the engine as plain data, which is
+    what the dictionary cache stores; the regexes are compiled again from it.
+    """
+    
+    def __init__(self):
+        self.rules = []
+        self._literals = {}  # Literal: ((length, rule index), ...) of it and the literals it starts with
+        self._patterns = []
+        self._words = {}
+        self._literal_regex = None
+        self._regexes = []
+        self._word_regex = None
+        # Identifies the rule set for cached lint results
+        self.fingerprint = b''
+    
+    def _add_rule(self, rule):
+        if not self.rules or self.rules[-1] is not rule:
+            self.rules.append(rule)
+        return len(self.rules) - 1
+    
+    def add_literal(self, literal, rule):
+        literal = literal.lower()
+        self._literals[literal] = self._literals.get(literal, ()) + ((len(literal), self._add_rule(rule)),)
+    
+    def add_pattern(self, pattern, rule):
+        self._patterns.append((pattern, self._add_rule(rule)))
+    
+    def add_word(self, word, rule):
+        """Add a rule matching tokens equal to word once their non-word characters are dropped."""
+        self._words[word.lower()] = self._add_rule(rule)
+    
+    def compile(self):
+        """Complete the literal table and compile the regexes; returns self."""
+        # The literal regex finds the longest literal starting at each position,
+        # so each one also reports the shorter literals it starts with
+        literals = self._literals
+        self._literals = {literal: tuple(entry for length in range(1, len(literal) + 1)
+                                         for entry in literals.get(literal[:length], ()))
+                          for literal in literals if literal}
+        self._compile_regexes()
+        return self
+    
+    def _compile_regexes(self):
+        if self._literals:
+            self._literal_regex = re.compile('(?=(' + _trie_pattern(self._literals) + '))')
+        
+        alternatives = {}
+        for pattern, rule_index in self._patterns:
+            alternatives.setdefault(rule_index, []).append(f'(?:{pattern})')
+        self._regexes = [(re.compile('|'.join(patterns)), rule_index)
+                         for rule_index, patterns in alternatives.items()]
+        
+        # A word with whitespace in it, such as "kind of", is never a single token
+        words = sorted((word for word in self._words if word.split() == [word]), key=len, reverse=True)
+        if words:
+            self._word_regex = re.compile(r'(?<!\S)(?:' + '|'.join(map(re.escape, words)) + r')(?!\S)')
+    
+    def to_data(self):
+        """Return the compiled engine as builtin containers, for pickling."""
+        return {
+            'rules': [tuple(rule) for rule in self.rules],
+            'literals': self._literals,
+            'patterns': self._patterns,
+            'words': self._words,
+        }
+    
+    @classmethod
+    def from_data(cls, data):
+        """Rebuild a compiled engine from to_data() output."""
+        engine = cls()
+        engine.rules = [Rule(*rule) for rule in data['rules']]
+        engine._literals = data['literals']
+        engine._patterns = data['patterns']
+        engine._words = data['words']
+        engine._compile_regexes()
+        return engine
+    
+    def scan(self, text):
+        """Return (family, issue) pairs for the issues found in text, in report order."""
+        return [(key[0], issue) for key, issue in self.scan_keyed(text)]
+    
+    def scan_keyed(self, text):
+        """Return (sort key, issue) pairs for the issues found in text, in report order.
+        
+        Sort keys are (family, line, rank, position) tuples.
+        """
+        found = []
+        seen_lines = set()
+        
+        def report(rule_index, line, position):
+            rule = self.rules[rule_index]
+            if rule.once_per_line:
+                if (rule_index, line) in seen_lines:
+                    return
+                seen_lines.add((rule_index, line))
+            found.append(((rule.family, line, rule.rank, position), rule))
+        
+        lowered = text.lower()
+        if self._literal_regex:
+            literals = self._literals
+            line, line_start = 1, 0
+            for match in self._literal_regex.finditer(lowered):
+                start = match.start()
+                line += lowered.count('\n', line_start, start)
+                line_start = start
+                for length, rule_index in literals[match.group(1)]:
+                    end = start + length
+                    if self.rules[rule_index].whole_word and (
+                            (start and _is_word_char(lowered[start - 1]))
+                            or (end < len(lowered) and _is_word_char(lowered[end]))):
+                        continue
+                    report(rule_index, line, start)
+        
+        if self._word_regex:
+            # Tokens keep their places in the text once other characters are dropped,
+            # so "really," is the word "really" but "very-good" and "(just)really" are none
+            tokens = TOKEN_NOISE_PATTERN.sub('', lowered)
+            line, line_start = 1, 0
+            for match in self._word_regex.finditer(tokens):
+                line += tokens.count('\n', line_start, match.start())
+                line_start = match.start()
+                report(self._words[match.group()], line, match.start())
+        
+        for regex, rule_index in self._regexes:
+            once_per_line = self.rules[rule_index].once_per_line
+            line, line_start, position = 1, 0, 0
+            while True:
+                match = regex.search(text, position)
+                if match is None:
+                    break
+                line += text.count('\n', line_start, match.start())
+                line_start = match.start()
+                report(rule_index, line, match.start())
+                if once_per_line:
+                    # Nothing more can be reported for the rest of the line
+                    position = text.find('\n', match.end())
+                    if position < 0:
+                        break
+                else:
+                    position = max(match.end(), match.start() + 1)
+        
+        found.sort(key=lambda entry: entry[0])
+        return [(key, {'line': key[1], 'severity': rule.severity,
+                       'message': rule.message, 'code': rule.code})
+                for key, rule in found]
+
+
+def rule_set_fingerprint(digests=()):
+    """Return a digest of the built-in rule tables plus the given dictionary digests."""
+    tables = (RULE_ENGINE_VERSION, WEASEL_WORDS, REDUNDANT_PHRASES, COMMON_TYPOS,
+              WORD_SUGGESTIONS, PASSIVE_PATTERNS, MISSING_SPACE_PATTERN, list(digests))
+    return hashlib.blake2b(repr(tables).encode('utf-8'), digest_size=32).digest()
+
+
+def build_rule_engine(weasel_words=WEASEL_WORDS, redundant_phrases=REDUNDANT_PHRASES,
+                      common_typos=COMMON_TYPOS, word_suggestions=WORD_SUGGESTIONS):
+    """Compile the word lists, phrase lists, typo table and patterns into a RuleEngine."""
+    engine = RuleEngine()
+    
+    passive_voice = Rule('passive-voice', 'suggestion', 'Consider using active voice instead of passive',
+                         FAMILY_PASSIVE, 0, False, True)
+    for pattern in PASSIVE_PATTERNS:
+        engine.add_pattern(pattern, passive_voice)
+    
+    for word in weasel_words:
+        engine.add_word(word, Rule('weasel-word', 'suggestion', f'Consider removing weak word: "{word}"',
+                                   FAMILY_WEASEL, 0, True, False))
+    
+    for rank, phrase in enumerate(redundant_phrases):
+        engine.add_literal(phrase, Rule('redundancy', 'style', f'Redundant phrase: "{phrase}"',
+                                        FAMILY_REDUNDANCY, rank, False, True))
+    
+    engine.add_literal('  ', Rule('double-space', 'style', 'Multiple consecutive spaces',
+                                  FAMILY_GRAMMAR, 0, False, True))
+    engine.add_pattern(MISSING_SPACE_PATTERN, Rule('missing-space', 'style', 'Missing space after punctuation',
+                                                   FAMILY_GRAMMAR, 1, False, True))
+    for rank, (typo, correction) in enumerate(common_typos.items(), 2):
+        engine.add_literal(typo, Rule('typo', 'error', f'Possible typo: "{typo}" should be "{correction}"',
+                                      FAMILY_GRAMMAR, rank, True, True))
+    
+    for word, suggestion in word_suggestions.items():
+        engine.add_literal(word, Rule('word-choice', 'suggestion',
+                                      f'Consider simpler word: "{word}" → "{suggestion}"',
+                                      FAMILY_WORD_CHOICE, 0, True, False))
+    
+    return engine.compile()
+
+
+def load_dictionary(path):
+    """Load a style dictionary from a JSON or YAML file.
+    
+    A dictionary may define any of 'weasel_words' and 'redundant_phrases'
+    (lists) and 'typos' and 'word_suggestions' (mappings to replacements).
+    """
+    import json
+    with open(path, encoding='utf-8') as file:
+        if path.lower().endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError(f"PyYAML is required to read {path}")
+            data = yaml.safe_load(file)
+        else:
+            data = json.load(file)
+    
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: a style dictionary must be a mapping")
+    unknown = set(data) - set(DICTIONARY_KEYS)
+    if unknown:
+        raise ValueError(f"{path}: unknown keys: {', '.join(sorted(unknown))}")
+    return data
+
+
+def build_dictionary_rule_engine(paths):
+    """Compile the built-in rule tables extended by the dictionaries at paths."""
+    tables = {
+        'weasel_words': dict.fromkeys(WEASEL_WORDS),
+        'redundant_phrases': dict.fromkeys(REDUNDANT_PHRASES),
+        'typos': dict(COMMON_TYPOS),
+        'word_suggestions': dict(WORD_SUGGESTIONS),
+    }
+    for path in paths:
+        for key, entries in load_dictionary(path).items():
+            if isinstance(tables[key], dict) and not isinstance(entries, dict):
+                entries = dict.fromkeys(entries)
+            tables[key].update(entries)
+    
+    return build_rule_engine(list(tables['weasel_words']), list(tables['redundant_phrases']),
+                             tables['typos'], tables['word_suggestions'])
+
+
+def _file_digest(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def load_cached_rule_engine(paths):
+    """Return the RuleEngine for dictionaries at paths via an on-disk cache.
+    
+    The cache file holds a JSON header line listing every dictionary's
+    size, mtime and SHA-256, followed by the pickled engine data. It is
+    memory-mapped on load and used as is while sizes and mtimes match; if
+    only mtimes changed, the hashes decide. Otherwise the dictionaries are
+    compiled again and the cache is rewritten.
+    """
+    import json
+    import mmap
+    import pickle
+    paths = [os.path.abspath(path) for path in paths]
+    key = hashlib.sha256('\0'.join([RULE_ENGINE_VERSION] + paths).encode('utf-8')).hexdigest()
+    try:
+        cache_path = os.path.join(cache_directory(), f'writing-style-{key[:16]}.cache')
+    except OSError:
+        engine = build_dictionary_rule_engine(paths)
+        engine.fingerprint = rule_set_fingerprint(_file_digest(path) for path in paths)
+        return engine
+    
+    stats = [os.stat(path) for path in paths]
+    files = [{'path': path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+             for path, stat in zip(paths, stats)]
+    
+    try:
+        with open(cache_path, 'rb') as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            header_end = mapped.find(b'\n') + 1
+            cached_files = json.loads(mapped[:header_end])['files']
+            same_files = ([(entry['path'], entry['size']) for entry in cached_files]
+                          == [(entry['path'], entry['size']) for entry in files])
+            if same_files:
+                touched = any(cached['mtime_ns'] != entry['mtime_ns']
+                              for cached, entry in zip(cached_files, files))
+                digests = [cached['sha256'] for cached in cached_files]
+                if not touched or digests == [_file_digest(path) for path in paths]:
+                    engine = RuleEngine.from_data(pickle.loads(mapped[header_end:]))
+                    engine.fingerprint = rule_set_fingerprint(digests)
+                    if touched:
+                        _write_rule_engine_cache(cache_path, files, engine, digests)
+                    return engine
+    except (OSError, ValueError, KeyError, pickle.UnpicklingError, EOFError):
+        pass
+    
+    engine = build_dictionary_rule_engine(paths)
+    digests = [_file_digest(path) for path in paths]
+    engine.fingerprint = rule_set_fingerprint(digests)
+    _write_rule_engine_cache(cache_path, files, engine, digests)
+    return engine
+
+
+def _write_rule_engine_cache(cache_path, files, engine, digests):
+    """Atomically write the rule engine cache; failures only cost a rebuild next time."""
+    import json
+    import pickle
+    import tempfile
+    header = {'version': RULE_ENGINE_VERSION,
+              'files': [dict(entry, sha256=digest) for entry, digest in zip(files, digests)]}
+    try:
+        descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path))
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(json.dumps(header).encode('utf-8') + b'\n')
+            pickle.dump(engine.to_data(), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+
+
+def dictionary_paths():
+    """Return the style dictionaries listed in $COT_WRITING_STYLE_DICTIONARIES."""
+    value = os.environ.get('COT_WRITING_STYLE_DICTIONARIES', '')
+    return [path for path in value.split(os.pathsep) if path]
+
+
+_rule_engines = {}
+
+
+def get_rule_engine(paths=None):
+    """Return the RuleEngine for the built-in tables plus the dictionaries at paths.
+    
+    Paths default to dictionary_paths(). Engines are compiled once per
+    process; those using dictionaries also go through the on-disk cache.
+    """
+    paths = tuple(dictionary_paths() if paths is None else paths)
+    if paths not in _rule_engines:
+        if paths:
+            engine = load_cached_rule_engine(paths)
+        else:
+            engine = build_rule_engine()
+            engine.fingerprint = rule_set_fingerprint()
+        _rule_engines[paths] = engine
+    return _rule_engines[paths]
+
+
+# Words, letters in words, and sentence-ending punctuation runs
+TextMetrics = namedtuple('TextMetrics', ['words', 'word_characters', 'sentence_breaks'])
+
+
+def measure_text(text):
+    """Return the TextMetrics of text; they add up across paragraphs."""
+    words = WORD_PATTERN.findall(text)
+    return TextMetrics(len(words), sum(map(len, words)), len(SENTENCE_BREAK_PATTERN.findall(text)))
+
+
+def split_paragraphs(text):
+    """Yield (first line number, text) for each run of non-empty lines."""
+    first_line, lines = None, []
+    for number, line in enumerate(text.split('\n'), 1):
+        if line:
+            if first_line is None:
+                first_line = number
+            lines.append(line)
+        elif first_line is not None:
+            yield first_line, '\n'.join(lines)
+            first_line, lines = None, []
+    if first_line is not None:
+        yield first_line, '\n'.join(lines)
+
+
+class ParagraphCache:
+    """Lint results per paragraph, persisted between runs.
+    
+    Entries are keyed by a digest of the paragraph text keyed with the rule
+    set fingerprint, and hold the paragraph's keyed issues, with lines
+    relative to the paragraph, and its TextMetrics. The least recently used
+    entries are dropped beyond max_entries.
+    
+    The whole cache is loaded and, after any hit or addition, written back
+    on every run, which costs more than linting a short selection; it only
+    pays off for long documents linted again and again, so it is opt-in.
+    """
     
-    # Check for common writing issues
+    def __init__(self, path, max_entries=RESULT_CACHE_ENTRIES):
+        import pickle
+        self.path = path
+        self.max_entries = max_entries
+        self.modified = False
+        try:
+            with open(path, 'rb') as file:
+                self.entries = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            self.entries = {}
+    
+    def get(self, key):
+        # Move hits to the most recently used end, and save that order, so
+        # entries still in use are not dropped as if they were stale
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.entries[key] = entry
+            self.modified = True
+        return entry
+    
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.modified = True
+    
+    def save(self):
+        """Write the cache back if it changed; failures only cost a re-lint."""
+        if not self.modified:
+            return
+        import pickle
+        import tempfile
+        for key in list(itertools.islice(self.entries, max(0, len(self.entries) - self.max_entries))):
+            del self.entries[key]
+        try:
+            descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path))
+            with os.fdopen(descriptor, 'wb') as file:
+                pickle.dump(self.entries, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+        self.modified = False
+
+
+def open_paragraph_cache():
+    """Return the shared ParagraphCache, or None if there is no cache directory."""
+    try:
+        return ParagraphCache(os.path.join(cache_directory(), 'writing-style-paragraphs.cache'))
+    except OSError:
+        return None
+
+
+def lint_paragraphs(text, engine, cache=None):
+    """Run the rule engine paragraph by paragraph, reusing cached results.
+    
+    Only paragraphs missing from cache are scanned; cached issues have
+    their line numbers shifted to where the paragraph now starts. Returns
+    the keyed issues of the whole text, in report order, and its
+    TextMetrics summed from the paragraphs.
+    """
+    keyed = []
+    totals = [0, 0, 0]
+    for first_line, paragraph in split_paragraphs(text):
+        entry = None
+        if cache is not None:
+            key = hashlib.blake2b(paragraph.encode('utf-8', 'surrogatepass'),
+                                  digest_size=16, key=engine.fingerprint).digest()
+            entry = cache.get(key)
+        if entry is None:
+            entry = (engine.scan_keyed(paragraph), tuple(measure_text(paragraph)))
+            if cache is not None:
+                cache.put(key, entry)
+        
+        paragraph_issues, metrics = entry
+        offset = first_line - 1
+        for (family, line, rank, position), issue in paragraph_issues:
+            keyed.append(((family, line + offset, rank, position), dict(issue, line=line + offset)))
+        totals = [total + value for total, value in zip(totals, metrics)]
+    
+    keyed.sort(key=lambda entry: entry[0])
+    return keyed, TextMetrics(*totals)
+
+
+def lint_writing(text, dictionaries=None, incremental=False):
+    """Lint text for writing style issues.
+    
+    Args:
+        text: Text to lint
+        dictionaries: Extra style dictionary paths; see get_rule_engine()
+        incremental: Reuse the on-disk results of unchanged paragraphs
+    """
+    issues, metrics = collect_writing_issues(text, dictionaries, incremental)
+    return format_writing_issues(issues, text, metrics)
+
+
+def collect_writing_issues(text, dictionaries=None, incremental=False):
+    """Lint text for writing style issues, returning (issues, TextMetrics); see lint_writing()."""
+    # All word, phrase and pattern rules run through the rule engine, paragraph by paragraph
+    cache = open_paragraph_cache() if incremental else None
+    scanned, metrics = lint_paragraphs(text, get_rule_engine(dictionaries), cache)
+    if cache is not None:
+        cache.save()
+    
+    issues = []
     issues.extend(check_sentence_length(text))
-    issues.extend(check_passive_voice(text))
-    issues.extend(check_weasel_words(text))
-    issues.extend(check_redundancy(text))
-    issues.extend(check_readability(text))
-    issues.extend(check_grammar_basics(text))
-    issues.extend(check_word_choice(text))
+    issues.extend(issue for (family, *_), issue in scanned if family < FAMILY_READABILITY)
+    issues.extend(check_readability(metrics))
+    issues.extend(issue for (family, *_), issue in scanned if family > FAMILY_READABILITY)
     
-    return format_writing_issues(issues, text)
+    return issues, metrics
 
 
 def check_sentence_length(text):
@@ -52,93 +636,16 @@ def check_sentence_length(text):
     return issues
 
 
-def check_passive_voice(text):
-    """Check for passive voice usage."""
+def check_readability(metrics):
+    """Check text readability from its TextMetrics."""
     issues = []
-    lines = text.split('\n')
-    
-    passive_patterns = [
-        r'\b(is|are|was|were|be|been|being)\s+\w+ed\b',
-        r'\b(has|have|had)\s+been\s+\w+ed\b',
-        r'\bwill\s+be\s+\w+ed\b'
-    ]
-    
-    for i, line in enumerate(lines, 1):
-        for pattern in passive_patterns:
-            if re.search(pattern, line, re.IGNORECASE):
-                issues.append({
-                    'line': i,
-                    'severity': 'suggestion',
-                    'message': 'Consider using active voice instead of passive',
-                    'code': 'passive-voice'
-                })
-                break
     
-    return issues
-
-
-def check_weasel_words(text):
-    """Check for weak or unclear words."""
-    issues = []
-    lines = text.split('\n')
-    
-    weasel_words = [
-        'very', 'really', 'quite', 'rather', 'pretty', 'fairly',
-        'somewhat', 'kind of', 'sort of', 'basically', 'essentially',
-        'literally', 'actually', 'just', 'simply', 'merely'
-    ]
-    
-    for i, line in enumerate(lines, 1):
-        words = line.lower().split()
-        for word in words:
-            clean_word = re.sub(r'[^\w]', '', word)
-            if clean_word in weasel_words:
-                issues.append({
-                    'line': i,
-                    'severity': 'suggestion',
-                    'message': f'Consider removing weak word: "{clean_word}"',
-                    'code': 'weasel-word'
-                })
-    
-    return issues
-
-
-def check_redundancy(text):
-    """Check for redundant phrases."""
-    issues = []
-    lines = text.split('\n')
-    
-    redundant_phrases = [
-        'free gift', 'new innovation', 'past history', 'future plans',
-        'end result', 'final outcome', 'basic fundamentals',
-        'true facts', 'personal opinion', 'advance warning'
-    ]
-    
-    for i, line in enumerate(lines, 1):
-        line_lower = line.lower()
-        for phrase in redundant_phrases:
-            if phrase in line_lower:
-                issues.append({
-                    'line': i,
-                    'severity': 'style',
-                    'message': f'Redundant phrase: "{phrase}"',
-                    'code': 'redundancy'
-                })
-    
-    return issues
-
-
-def check_readability(text):
-    """Check text readability."""
-    issues = []
+    # Simple readability metrics; the text splits into one more sentence than it has breaks
+    sentences = metrics.sentence_breaks + 1
     
-    # Simple readability metrics
-    sentences = re.split(r'[.!?]+', text)
-    words = re.findall(r'\b\w+\b', text)
-    
-    if sentences and words:
-        avg_sentence_length = len(words) / len(sentences)
-        avg_word_length = sum(len(word) for word in words) / len(words)
+    if metrics.words:
+        avg_sentence_length = metrics.words / sentences
+        avg_word_length = metrics.word_characters / metrics.words
         
         if avg_sentence_length > 20:
             issues.append({
@@ -159,81 +666,7 @@ def check_readability(text):
     return issues
 
 
-def check_grammar_basics(text):
-    """Check for basic grammar issues."""
-    issues = []
-    lines = text.split('\n')
-    
-    for i, line in enumerate(lines, 1):
-        # Check for double spaces
-        if '  ' in line:
-            issues.append({
-                'line': i,
-                'severity': 'style',
-                'message': 'Multiple consecutive spaces',
-                'code': 'double-space'
-            })
-        
-        # Check for missing space after punctuation
-        if re.search(r'[.!?][A-Za-z]', line):
-            issues.append({
-                'line': i,
-                'severity': 'style',
-                'message': 'Missing space after punctuation',
-                'code': 'missing-space'
-            })
-        
-        # Check for common typos
-        common_typos = {
-            'teh': 'the',
-            'adn': 'and',
-            'recieve': 'receive',
-            'seperate': 'separate',
-            'definately': 'definitely'
-        }
-        
-        for typo, correction in common_typos.items():
-            if re.search(r'\b' + typo + r'\b', line, re.IGNORECASE):
-                issues.append({
-                    'line': i,
-                    'severity': 'error',
-                    'message': f'Possible typo: "{typo}" should be "{correction}"',
-                    'code': 'typo'
-                })
-    
-    return issues
-
-
-def check_word_choice(text):
-    """Check for word choice improvements."""
-    issues = []
-    lines = text.split('\n')
-    
-    word_suggestions = {
-        'utilize': 'use',
-        'facilitate': 'help',
-        'implement': 'do',
-        'leverage': 'use',
-        'optimize': 'improve',
-        'synergy': 'cooperation',
-        'paradigm': 'model'
-    }
-    
-    for i, line in enumerate(lines, 1):
-        words = re.findall(r'\b\w+\b', line.lower())
-        for word in words:
-            if word in word_suggestions:
-                issues.append({
-                    'line': i,
-                    'severity': 'suggestion',
-                    'message': f'Consider simpler word: "{word}" → "{word_suggestions[word]}"',
-                    'code': 'word-choice'
-                })
-    
-    return issues
-
-
-def format_writing_issues(issues, text):
+def format_writing_issues(issues, text, metrics=None):
     """Format writing issues into readable output."""
     if not issues:
         return "✓ No writing style issues found!"
@@ -242,8 +675,10 @@ def format_writing_issues(issues, text):
     output.append("=== WRITING STYLE ANALYSIS ===\n")
     
     # Calculate basic stats
-    sentences = len(re.split(r'[.!?]+', text))
-    words = len(re.findall(r'\b\w+\b', text))
+    if metrics is None:
+        metrics = measure_text(text)
+    sentences = metrics.sentence_breaks + 1
+    words = metrics.words
     characters = len(text)
     
     output.append(f"Text Statistics:")
@@ -289,9 +724,17 @@ def format_writing_issues(issues, text):
 
 
 def main():
+    # Style dictionary files may be given as arguments; --cache keeps each
+    # paragraph's results, so long documents linted again skip unchanged ones
+    args = sys.argv[1:]
+    incremental = '--cache' in args
+    dictionaries = [arg for arg in args if arg != '--cache'] or None
     in_text = sys.stdin.read()
     if in_text:
-        result = lint_writing(in_text)
+        try:
+            result = lint_writing(in_text, dictionaries, incremental)
+        except (OSError, ValueError) as e:
+            result = f"Dictionary Error: {e}"
         sys.stdout.write(result)
     else:
         sys.stdout.write("No text selected for writing style analysis.")
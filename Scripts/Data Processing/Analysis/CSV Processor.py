@@ -10,54 +10,403 @@ Process and analyze CSV data with various operations.
 """
 
 import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+if __name__ == "__main__":
+    # Hand the run to a script server, or profile it, before the imports below (see lib/script_client.py)
+    from script_client import bootstrap
+    bootstrap(__file__)
+
 import csv
+import heapq
 import io
-from collections import Counter
+import itertools
+import struct
+from array import array
+from collections import Counter, namedtuple
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from stream_io import InputReader, OutputWriter
+
+# NumPy is optional, and imported by load_numpy() once a table is built
+np = None
+
+
+# Functions timed as each phase of a profiled run (see lib/script_profiler.py)
+PROFILE_PHASES = {
+    'parse': ['read_csv_table', 'parse_sort_keys'],
+    'transform': ['process_csv'],
+    'format': ['write_csv'],
+}
+
+# Code stored for cells past the end of a short row
+MISSING = -1
 
+# Rows parsed per batch while building the columns
+BATCH_SIZE = 65536
 
-def process_csv(text, operation="info"):
-    """Process CSV data based on the specified operation."""
+# Approximate bytes of rows a keyed sort holds before spilling a sorted run
+SORT_MEMORY_BUDGET = 64 * 1024 * 1024
+
+# Formats tried for 'date' sort keys after ISO 8601
+DATE_FORMATS = ('%m/%d/%Y', '%m/%d/%y', '%d.%m.%Y', '%Y/%m/%d', '%d %b %Y', '%b %d, %Y')
+
+SORT_TYPES = ('string', 'numeric', 'date')
+
+# Approximate bytes of row digests kept in memory while removing duplicates
+DEDUP_MEMORY_BUDGET = 64 * 1024 * 1024
+
+# Number of digest buckets used once duplicate removal spills to disk
+DEDUP_PARTITIONS = 64
+
+SortKey = namedtuple('SortKey', ['column', 'type', 'descending'])
+
+
+class CSVColumn:
+    """A CSV column stored as integer codes into its distinct cell values.
+    
+    Every distinct string is kept once in `values`; `codes[i]` is its index
+    for row i, or MISSING when row i is too short to reach this column.
+    Type inference runs over the distinct values rather than every cell.
+    """
+    
+    def __init__(self, row_count=0):
+        # None stands for a missing cell while encoding
+        self.index = {None: MISSING}
+        self.values = []
+        self.codes = array('q', [MISSING]) * row_count
+        self.kind = 'empty'
+        self.numbers = None
+    
+    def extend(self, cells):
+        """Append the codes for cells, registering new distinct values."""
+        index = self.index
+        encode = index.setdefault
+        self.codes.extend([encode(cell, len(index) - 1) for cell in cells])
+    
+    def finish(self):
+        """Freeze the codes and collect the distinct values in code order."""
+        del self.index[None]
+        self.values = list(self.index)
+        if np is not None:
+            self.codes = np.frombuffer(self.codes, dtype=np.int64)
+    
+    def infer_type(self, counts):
+        """Infer the column type from the distinct values with a nonzero count.
+        
+        Sets `kind` to 'empty', 'integer', 'float' or 'text' and, for numeric
+        columns, `numbers` to the float value of each distinct value.
+        """
+        numbers = [0.0] * len(self.values)
+        kind = 'empty'
+        for code, value in enumerate(self.values):
+            if not counts[code] or not value.strip():
+                continue
+            try:
+                numbers[code] = float(value)
+            except ValueError:
+                self.kind = 'text'
+                return
+            if kind != 'float':
+                try:
+                    int(value)
+                    kind = 'integer'
+                except ValueError:
+                    kind = 'float'
+        self.kind = kind
+        self.numbers = np.array(numbers) if np is not None else array('d', numbers)
+
+
+class CSVTable:
+    """CSV data parsed once into dictionary-encoded, typed columns.
+    
+    Row 0 is the header. With NumPy available the code columns are int64
+    arrays and the operations below run vectorized over them.
+    """
+    
+    def __init__(self):
+        self.columns = []
+        self.lengths = array('q')
+    
+    @property
+    def row_count(self):
+        return len(self.lengths)
+    
+    @property
+    def header(self):
+        return next(self.rows([0])) if self.lengths else []
+    
+    def extend(self, rows):
+        """Append a batch of parsed CSV rows."""
+        width = max(map(len, rows), default=0)
+        while len(self.columns) < width:
+            self.columns.append(CSVColumn(self.row_count))
+        
+        missing = (None,) * len(rows)
+        cells_by_column = itertools.zip_longest(*rows) if width else ()
+        for column, cells in itertools.zip_longest(self.columns, cells_by_column,
+                                                   fillvalue=missing):
+            column.extend(cells)
+        self.lengths.extend(map(len, rows))
+    
+    def finish(self):
+        """Freeze the columns and infer their types from the data rows."""
+        for column in self.columns:
+            column.finish()
+            column.infer_type(self.value_counts(column, first_row=1))
+        return self
+    
+    def value_counts(self, column, first_row=0):
+        """Return how many rows from first_row on hold each distinct value."""
+        codes = column.codes[first_row:]
+        if np is not None:
+            return np.bincount(codes[codes != MISSING], minlength=len(column.values))
+        counter = Counter(codes)
+        return [counter[code] for code in range(len(column.values))]
+    
+    def rows(self, indices=None):
+        """Iterate rebuilt rows, in the given order if indices are passed."""
+        if indices is None:
+            indices = range(self.row_count)
+        
+        # Decode column by column; the trailing None decodes MISSING
+        if np is not None:
+            indices = np.asarray(indices, dtype=np.int64)
+            decoded = [np.array(column.values + [None], dtype=object)[column.codes[indices]].tolist()
+                       for column in self.columns]
+            lengths = np.frombuffer(self.lengths, dtype=np.int64)[indices].tolist()
+        else:
+            decoded = []
+            for column in self.columns:
+                values, codes = column.values + [None], column.codes
+                decoded.append([values[codes[index]] for index in indices])
+            lengths = [self.lengths[index] for index in indices]
+        
+        width = len(self.columns)
+        for row, length in zip(zip(*decoded) if width else itertools.repeat(()), lengths):
+            yield row if length == width else row[:length]
+
+
+@lru_cache(maxsize=None)
+def load_numpy():
+    """Import NumPy as np if it is installed; columns fall back to array.array without it."""
+    global np
+    try:
+        import numpy as np
+    except ImportError:
+        pass
+
+
+def read_csv_table(text):
+    """Parse CSV text once into a CSVTable."""
+    load_numpy()
+    table = CSVTable()
+    reader = csv.reader(io.StringIO(text))
+    for batch in iter(lambda: list(itertools.islice(reader, BATCH_SIZE)), []):
+        table.extend(batch)
+    return table.finish()
+
+
+def write_csv(rows):
+    """Render rows as CSV text."""
+    output = io.StringIO()
+    csv.writer(output).writerows(rows)
+    return output.getvalue()
+
+
+def process_csv(text, operation="info", sort_keys=None, key_columns=None):
+    """Process CSV data based on the specified operation.
+    
+    A 'sort' with sort_keys (a list of SortKeys) streams the rows through
+    the external merge sort, and 'unique' streams them through the digest
+    deduplicator (on key_columns only, if given), instead of building the
+    columnar table.
+    """
     try:
-        csv_reader = csv.reader(io.StringIO(text))
-        rows = list(csv_reader)
+        if operation == "sort" and sort_keys:
+            return write_csv(sort_csv_rows(csv.reader(io.StringIO(text)), sort_keys))
+        if operation == "unique":
+            return remove_duplicate_rows(csv.reader(io.StringIO(text)), key_columns)
+        
+        table = read_csv_table(text)
         
         if operation == "info":
-            return get_csv_info(rows)
+            return get_csv_info(table)
         elif operation == "transpose":
-            return transpose_csv(rows)
+            return transpose_csv(table)
         elif operation == "sort":
-            return sort_csv(rows)
-        elif operation == "unique":
-            return remove_duplicate_rows(rows)
+            return sort_csv(table)
         elif operation == "stats":
-            return csv_statistics(rows)
+            return csv_statistics(table)
         else:
             return text
             
     except csv.Error as e:
         return f"CSV Error: {e}"
+    except OSError as e:
+        return f"Error: {e}"
 
 
-def get_csv_info(rows):
+def parse_sort_keys(spec):
+    """Parse a sort spec such as '3:numeric:desc,1' into SortKeys.
+    
+    Each comma-separated key is a 1-based column number, optionally followed
+    by a type (string, numeric or date) and a direction (asc or desc).
+    """
+    keys = []
+    for part in spec.split(','):
+        fields = part.strip().split(':')
+        if not fields[0].isdigit() or int(fields[0]) < 1:
+            raise ValueError(f"Invalid sort column: {fields[0]!r}")
+        key_type = fields[1] if len(fields) > 1 and fields[1] else 'string'
+        direction = fields[2] if len(fields) > 2 else 'asc'
+        if key_type not in SORT_TYPES:
+            raise ValueError(f"Invalid sort type: {key_type!r}")
+        if direction not in ('asc', 'desc'):
+            raise ValueError(f"Invalid sort direction: {direction!r}")
+        keys.append(SortKey(int(fields[0]) - 1, key_type, direction == 'desc'))
+    return keys
+
+
+class _Descending:
+    """Wrap a sort value so that it compares in reverse order."""
+    
+    __slots__ = ('value',)
+    
+    def __init__(self, value):
+        self.value = value
+    
+    def __eq__(self, other):
+        return self.value == other.value
+    
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+@lru_cache(maxsize=65536)
+def _parse_date(cell):
+    """Return cell as a POSIX timestamp, or None if it is not a date."""
+    cell = cell.strip()
+    try:
+        date = datetime.fromisoformat(cell)
+    except ValueError:
+        for date_format in DATE_FORMATS:
+            try:
+                date = datetime.strptime(cell, date_format)
+                break
+            except ValueError:
+                continue
+        else:
+            return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.timestamp()
+
+
+def _parse_number(cell):
+    """Return cell as a float, or None if it is not a finite number."""
+    try:
+        number = float(cell)
+    except ValueError:
+        return None
+    return number if number == number else None
+
+
+def make_sort_key(sort_keys):
+    """Build a row key function for a list of SortKeys.
+    
+    Cells that are missing or do not parse as the key type sort after all
+    valid values regardless of direction.
+    """
+    parsers = {'string': str, 'numeric': _parse_number, 'date': _parse_date}
+    fields = [(key.column, parsers[key.type], key.descending) for key in sort_keys]
+    
+    def row_key(row):
+        key = []
+        for column, parse, descending in fields:
+            value = parse(row[column]) if column < len(row) else None
+            if value is None:
+                key.append((1, 0))
+            else:
+                key.append((0, _Descending(value) if descending else value))
+        return key
+    
+    return row_key
+
+
+def _estimate_row_size(row):
+    """Roughly estimate the memory held by a parsed row in bytes."""
+    return 56 + 8 * len(row) + sum(49 + len(cell) for cell in row)
+
+
+def external_sort_rows(rows, key, memory_budget=SORT_MEMORY_BUDGET):
+    """Yield rows sorted (stably) by key.
+    
+    Rows are sorted in memory until their estimated size exceeds
+    memory_budget; each full run is then spilled sorted to a temporary CSV
+    file and all runs are combined with a k-way heapq.merge.
+    """
+    run, run_size, run_files = [], 0, []
+    try:
+        for row in rows:
+            run.append(row)
+            run_size += _estimate_row_size(row)
+            if run_size >= memory_budget:
+                run.sort(key=key)
+                import tempfile
+                run_file = tempfile.TemporaryFile('w+', newline='', encoding='utf-8')
+                csv.writer(run_file).writerows(run)
+                run_file.seek(0)
+                run_files.append(run_file)
+                run, run_size = [], 0
+        
+        run.sort(key=key)
+        if not run_files:
+            yield from run
+            return
+        
+        # The runs are in input order, so heapq.merge keeps the sort stable
+        runs = [csv.reader(run_file) for run_file in run_files] + [run]
+        yield from heapq.merge(*runs, key=key)
+    finally:
+        for run_file in run_files:
+            run_file.close()
+
+
+def sort_csv_rows(rows, sort_keys, memory_budget=SORT_MEMORY_BUDGET):
+    """Yield the header row followed by the data rows sorted by sort_keys."""
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return
+    yield header
+    yield from external_sort_rows(rows, make_sort_key(sort_keys), memory_budget)
+
+
+def get_csv_info(table):
     """Get basic information about CSV data."""
-    if not rows:
+    if not table.row_count:
         return "No data found"
     
+    header = table.header
+    
     info = []
     info.append("=== CSV INFORMATION ===")
-    info.append(f"Rows: {len(rows)}")
-    info.append(f"Columns: {len(rows[0]) if rows else 0}")
+    info.append(f"Rows: {table.row_count}")
+    info.append(f"Columns: {len(header)}")
     
-    if rows:
-        info.append("\nColumn headers:")
-        for i, header in enumerate(rows[0]):
-            info.append(f"  {i+1}: {header}")
+    info.append("\nColumn headers:")
+    for i, name in enumerate(header):
+        info.append(f"  {i+1}: {name}")
     
     # Check for empty cells
     empty_cells = 0
-    total_cells = len(rows) * len(rows[0]) if rows else 0
-    for row in rows:
-        empty_cells += row.count('')
+    total_cells = table.row_count * len(header)
+    for column in table.columns:
+        if '' in column.index:
+            empty_cells += int(table.value_counts(column)[column.index['']])
     
     if total_cells > 0:
         info.append(f"\nEmpty cells: {empty_cells} ({empty_cells/total_cells*100:.1f}%)")
@@ -65,108 +414,254 @@ def get_csv_info(rows):
     return '\n'.join(info)
 
 
-def transpose_csv(rows):
+def transpose_csv(table):
     """Transpose CSV data (swap rows and columns)."""
-    if not rows:
+    if not table.row_count:
         return ""
     
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Transpose the data
-    transposed = list(zip(*rows))
-    
-    for row in transposed:
-        writer.writerow(row)
-    
-    return output.getvalue()
+    # Like zip(*rows), stop at the shortest row
+    width = min(table.lengths)
+    return write_csv([column.values[code] for code in column.codes]
+                     for column in table.columns[:width])
 
 
-def sort_csv(rows):
+def sort_csv(table):
     """Sort CSV data by the first column."""
-    if not rows:
+    if not table.row_count:
         return ""
     
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
     # Keep header and sort the rest
-    if len(rows) > 1:
-        header = rows[0]
-        data_rows = rows[1:]
-        sorted_rows = sorted(data_rows, key=lambda x: x[0] if x else "")
+    if table.row_count > 1 and table.columns:
+        column = table.columns[0]
+        # Rank the distinct values once; the trailing '' ranks empty rows (MISSING)
+        keys = column.values + ['']
+        ranks = [0] * len(keys)
+        rank, previous = -1, None
+        for code in sorted(range(len(keys)), key=keys.__getitem__):
+            if keys[code] != previous:
+                rank, previous = rank + 1, keys[code]
+            ranks[code] = rank
         
-        writer.writerow(header)
-        for row in sorted_rows:
-            writer.writerow(row)
-    else:
-        for row in rows:
-            writer.writerow(row)
+        if np is not None:
+            row_ranks = np.array(ranks)[column.codes[1:]]
+            order = np.argsort(row_ranks, kind='stable') + 1
+        else:
+            codes = column.codes
+            order = sorted(range(1, table.row_count), key=lambda i: ranks[codes[i]])
+        return write_csv(table.rows([0, *order]))
     
-    return output.getvalue()
+    return write_csv(table.rows())
 
 
-def remove_duplicate_rows(rows):
-    """Remove duplicate rows from CSV data."""
-    if not rows:
-        return ""
+class RowDeduplicator:
+    """Drop repeated CSV rows while keeping first occurrences in order.
     
-    output = io.StringIO()
-    writer = csv.writer(output)
+    Rows are remembered by a fixed-size BLAKE2 digest (16 bytes by default,
+    or 8) of the whole row, or of key_columns (0-based) only, rather than by
+    the row itself. Once the digests exceed memory_budget, the remaining rows
+    are spooled to disk and their digests spilled into DEDUP_PARTITIONS
+    bucket files; each bucket is deduplicated on its own and the spooled
+    rows are then replayed without the duplicates found.
     
-    seen = set()
-    for row in rows:
-        row_tuple = tuple(row)
-        if row_tuple not in seen:
-            seen.add(row_tuple)
-            writer.writerow(row)
+    `duplicates` counts the rows dropped so far.
+    """
     
-    return output.getvalue()
+    # Rough memory held per digest in the in-memory set
+    ENTRY_SIZE = 100
+    
+    def __init__(self, key_columns=None, digest_size=16, memory_budget=DEDUP_MEMORY_BUDGET):
+        self.key_columns = key_columns
+        self.digest_size = digest_size
+        self.max_entries = max(1, memory_budget // self.ENTRY_SIZE)
+        self.duplicates = 0
+        from hashlib import blake2b
+        self.blake2b = blake2b
+    
+    def digest(self, row):
+        """Return the digest identifying row."""
+        if self.key_columns is not None:
+            row = [row[column] if column < len(row) else None for column in self.key_columns]
+        data = repr(tuple(row)).encode('utf-8', 'surrogatepass')
+        return self.blake2b(data, digest_size=self.digest_size).digest()
+    
+    def filter(self, rows):
+        """Yield the first occurrence of every distinct row."""
+        rows = iter(rows)
+        seen = set()
+        for index, row in enumerate(rows):
+            digest = self.digest(row)
+            if digest in seen:
+                self.duplicates += 1
+                continue
+            seen.add(digest)
+            yield row
+            if len(seen) >= self.max_entries:
+                yield from self._filter_spilled(rows, seen, index + 1)
+                return
+    
+    def _filter_spilled(self, rows, seen, start):
+        """Deduplicate rows from index start on through on-disk digest buckets."""
+        import tempfile
+        record = struct.Struct(f'<{self.digest_size}sq')
+        buckets = [tempfile.TemporaryFile() for _ in range(DEDUP_PARTITIONS)]
+        spool = tempfile.TemporaryFile('w+', newline='', encoding='utf-8')
+        try:
+            # Digests already emitted go first, so they always win in their bucket
+            for digest in seen:
+                buckets[digest[0] % DEDUP_PARTITIONS].write(record.pack(digest, -1))
+            seen.clear()
+            
+            writer = csv.writer(spool)
+            for index, row in enumerate(rows, start):
+                digest = self.digest(row)
+                buckets[digest[0] % DEDUP_PARTITIONS].write(record.pack(digest, index))
+                writer.writerow(row)
+            
+            # Replace every bucket with the ascending indices of its duplicates
+            for bucket in buckets:
+                bucket.seek(0)
+                first_seen = set()
+                dropped = array('q')
+                for digest, index in record.iter_unpack(bucket.read()):
+                    if digest in first_seen:
+                        dropped.append(index)
+                    else:
+                        first_seen.add(digest)
+                bucket.seek(0)
+                bucket.truncate()
+                bucket.write(dropped.tobytes())
+                bucket.seek(0)
+            
+            drops = heapq.merge(*(_read_indices(bucket) for bucket in buckets))
+            next_drop = next(drops, None)
+            spool.seek(0)
+            for index, row in enumerate(csv.reader(spool), start):
+                if index == next_drop:
+                    self.duplicates += 1
+                    next_drop = next(drops, None)
+                else:
+                    yield row
+        finally:
+            spool.close()
+            for bucket in buckets:
+                bucket.close()
+
+
+def _read_indices(file, chunk_size=65536):
+    """Iterate the int64 indices stored in a binary file."""
+    while True:
+        chunk = file.read(chunk_size * 8)
+        if not chunk:
+            return
+        yield from array('q', chunk)
 
 
-def csv_statistics(rows):
+def remove_duplicate_rows(rows, key_columns=None):
+    """Remove duplicate rows from CSV data.
+    
+    Args:
+        rows: Iterable of parsed CSV rows
+        key_columns: 0-based columns that identify a row, or None for the whole row
+    """
+    deduplicator = RowDeduplicator(key_columns)
+    return write_csv(deduplicator.filter(rows))
+
+
+def csv_statistics(table):
     """Generate statistics for CSV data."""
-    if not rows:
+    if not table.row_count:
         return "No data found"
     
     stats = []
     stats.append("=== CSV STATISTICS ===")
-    stats.append(f"Total rows: {len(rows)}")
+    stats.append(f"Total rows: {table.row_count}")
     
-    if len(rows) > 1:
-        stats.append(f"Data rows: {len(rows) - 1}")
+    if table.row_count > 1:
+        stats.append(f"Data rows: {table.row_count - 1}")
     
     # Column statistics
-    if rows:
-        num_cols = len(rows[0])
-        stats.append(f"Columns: {num_cols}")
+    header = table.header
+    stats.append(f"Columns: {len(header)}")
+    
+    for col_idx, name in enumerate(header):
+        column = table.columns[col_idx]
+        counts = table.value_counts(column, first_row=1)
+        non_blank = [bool(counts[code]) and bool(value.strip())
+                     for code, value in enumerate(column.values)]
         
-        for col_idx in range(num_cols):
-            col_data = [row[col_idx] for row in rows[1:] if len(row) > col_idx]
-            non_empty = [cell for cell in col_data if cell.strip()]
-            
-            stats.append(f"\nColumn {col_idx + 1} ({rows[0][col_idx] if rows else 'Unknown'}):")
-            stats.append(f"  Non-empty values: {len(non_empty)}")
-            
-            if non_empty:
-                # Try to determine if it's numeric
-                try:
-                    numeric_values = [float(cell) for cell in non_empty]
-                    stats.append(f"  Numeric values: {len(numeric_values)}")
-                    stats.append(f"  Average: {sum(numeric_values)/len(numeric_values):.2f}")
-                    stats.append(f"  Min: {min(numeric_values)}")
-                    stats.append(f"  Max: {max(numeric_values)}")
-                except ValueError:
-                    # Not numeric, show unique values
-                    unique_values = set(non_empty)
-                    stats.append(f"  Unique values: {len(unique_values)}")
-                    if len(unique_values) <= 10:
-                        stats.append(f"  Values: {', '.join(sorted(unique_values))}")
+        if np is not None:
+            non_blank = np.array(non_blank, dtype=bool)
+            non_empty_count = int(counts[non_blank].sum())
+        else:
+            non_empty_count = sum(count for count, flag in zip(counts, non_blank) if flag)
+        
+        stats.append(f"\nColumn {col_idx + 1} ({name}):")
+        stats.append(f"  Non-empty values: {non_empty_count}")
+        
+        if not non_empty_count:
+            continue
+        
+        if column.kind in ('integer', 'float'):
+            if np is not None:
+                numbers = column.numbers[non_blank]
+                total = float(numbers @ counts[non_blank])
+                minimum, maximum = float(numbers.min()), float(numbers.max())
+            else:
+                numbers = [number for number, flag in zip(column.numbers, non_blank) if flag]
+                weights = [count for count, flag in zip(counts, non_blank) if flag]
+                total = sum(number * weight for number, weight in zip(numbers, weights))
+                minimum, maximum = min(numbers), max(numbers)
+            stats.append(f"  Type: {column.kind}")
+            stats.append(f"  Numeric values: {non_empty_count}")
+            stats.append(f"  Average: {total/non_empty_count:.2f}")
+            stats.append(f"  Min: {minimum}")
+            stats.append(f"  Max: {maximum}")
+        else:
+            # Not numeric, show unique values
+            unique_values = [value for value, flag in zip(column.values, non_blank) if flag]
+            stats.append(f"  Unique values: {len(unique_values)}")
+            if len(unique_values) <= 10:
+                stats.append(f"  Values: {', '.join(sorted(unique_values))}")
     
     return '\n'.join(stats)
 
 
 def main():
+    # Streaming operations can be requested on the command line, for example:
+    #   "CSV Processor.py" sort 3:numeric:desc,1:string
+    #   "CSV Processor.py" unique 1,3
+    # They read stdin and write stdout row by row, spilling to disk for large inputs.
+    if len(sys.argv) > 2 and sys.argv[1] == "sort":
+        try:
+            sort_keys = parse_sort_keys(sys.argv[2])
+        except ValueError as e:
+            sys.stdout.write(f"Error: {e}")
+            return
+        with OutputWriter() as output:
+            try:
+                csv.writer(output).writerows(sort_csv_rows(csv.reader(InputReader().lines()), sort_keys))
+            except csv.Error as e:
+                output.write(f"CSV Error: {e}")
+        return
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "unique":
+        key_columns = None
+        if len(sys.argv) > 2:
+            columns = [column.strip() for column in sys.argv[2].split(',')]
+            if not all(column.isdigit() and int(column) >= 1 for column in columns):
+                sys.stdout.write(f"Error: Invalid key columns: {sys.argv[2]!r}")
+                return
+            key_columns = [int(column) - 1 for column in columns]
+        deduplicator = RowDeduplicator(key_columns)
+        with OutputWriter() as output:
+            try:
+                csv.writer(output).writerows(deduplicator.filter(csv.reader(InputReader().lines())))
+            except csv.Error as e:
+                output.write(f"CSV Error: {e}")
+        # stdout replaces the selection, so report on stderr
+        sys.stderr.write(f"Removed {deduplicator.duplicates} duplicate rows\n")
+        return
+    
     in_text = sys.stdin.read()
     if in_text:
         # For this example, we'll show CSV info
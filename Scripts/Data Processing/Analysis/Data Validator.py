@@ -10,11 +10,16 @@ Validate various data formats and structures.
 """
 
 import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+if __name__ == "__main__":
+    # Hand the run to a script server, or profile it, before the imports below (see lib/script_client.py)
+    from script_client import bootstrap
+    bootstrap(__file__)
+
 import json
-import csv
 import re
-import email
-from datetime import datetime
 
 
 def validate_data(text, data_type="auto"):
@@ -52,6 +57,7 @@ def detect_data_type(text):
     
     # Check for CSV
     if ',' in text and '\n' in text:
+        import csv
         try:
             csv.Sniffer().sniff(text[:1024])
             return "csv"
@@ -84,6 +90,7 @@ def validate_json(text):
 
 def validate_csv(text):
     """Validate CSV data."""
+    import csv
     try:
         csv.Sniffer().sniff(text[:1024])
         reader = csv.reader(text.splitlines())
@@ -111,6 +118,7 @@ def validate_csv(text):
 
 def validate_emails(text):
     """Validate email addresses."""
+    from email.utils import parseaddr
     email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
     emails = re.findall(email_pattern, text)
     
@@ -119,8 +127,7 @@ def validate_emails(text):
     
     for email_addr in emails:
         try:
-            email.utils.parseaddr(email_addr)
-            if email.utils.parseaddr(email_addr)[1]:
+            if parseaddr(email_addr)[1]:
                 results.append(f"✓ {email_addr}")
                 valid_count += 1
             else:
@@ -176,6 +183,7 @@ def validate_urls(text):
 
 def validate_dates(text):
     """Validate date formats."""
+    from datetime import datetime
     date_patterns = [
         r'\b\d{4}-\d{2}-\d{2}\b',  # YYYY-MM-DD
         r'\b\d{2}/\d{2}/\d{4}\b',  # MM/DD/YYYY
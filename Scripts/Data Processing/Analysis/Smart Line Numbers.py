@@ -10,8 +10,16 @@ Add line numbers with proper padding and customizable separators.
 Based on the template but enhanced with more options.
 """
 
-import math
 import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+if __name__ == "__main__":
+    # Hand the run to a script server, or profile it, before the imports below (see lib/script_client.py)
+    from script_client import bootstrap
+    bootstrap(__file__)
+
+import math
 
 
 def digit(number):
@@ -10,35 +10,535 @@ Generate comprehensive statistics about selected text.
 """
 
 import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+if __name__ == "__main__":
+    # Hand the run to a script server, or profile it, before the imports below (see lib/script_client.py)
+    from script_client import bootstrap
+    bootstrap(__file__)
+
+import hashlib
+import heapq
+import io
+import itertools
+import math
 import re
-from collections import Counter
+from array import array
+from collections import Counter, deque
+
+from stream_io import InputReader
+
+
+# Functions timed as each phase of a profiled run (see lib/script_profiler.py)
+PROFILE_PHASES = {
+    'transform': ['analyze_stream', 'analyze_text'],
+    'format': ['format_stats'],
+}
+
+# Characters read from stdin per chunk
+CHUNK_SIZE = 1024 * 1024
+
+# Characters per chunk handed to a worker process; smaller inputs run serially
+PARALLEL_CHUNK_SIZE = 8 * 1024 * 1024
+
+# How far past a target cut to look for a paragraph break before settling for a line break
+SPLIT_WINDOW = 64 * 1024
+
+# Text carried over between chunks before it is cut without whitespace
+CARRY_LIMIT = 64 * 1024
+
+NEWLINE_RUN_PATTERN = re.compile(r'\n+')
+WORD_PATTERN = re.compile(r'\b\w+\b')
+SENTENCE_PATTERN = re.compile(r'[.!?]+')
+# The line boundaries recognized by str.splitlines()
+LINE_BREAK_PATTERN = re.compile(r'\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]')
+LINE_BREAK_CHARS = '\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029'
+# A character text may be cut after when it has no whitespace, searched in reversed text:
+# not part of a word or sentence end, nor a '\r' of '\r\n', nor a character lowercasing looks
+# past or at to tell a final sigma, which are these, cased symbols and CASE_IGNORABLE_CATEGORIES
+FORCED_CUT_PATTERN = re.compile(r"[^\w.!?\r':^`\u00b7\u0387\u055f\u05f4\u2018\u2019\u2024\u2027"
+                                r"\ufe13\ufe52\ufe55\uff07\uff0e\uff1a\u24b6-\u24e9"
+                                r"\U0001f130-\U0001f149\U0001f150-\U0001f169\U0001f170-\U0001f189]")
+CASE_IGNORABLE_CATEGORIES = {'Mn', 'Me', 'Cf', 'Sk'}
+
+# Approximate mode: Count-Min Sketch shape, heavy-hitter slots and HyperLogLog precision.
+# The defaults take about 0.5 MiB per sketch, count within e/width of the total
+# with probability 1 - e^-depth, and estimate vocabulary size within about 0.8%.
+SKETCH_WIDTH = 1 << 14
+SKETCH_DEPTH = 4
+HEAVY_HITTERS = 1024
+HLL_PRECISION = 14
+
+
+def _hash_pair(item):
+    """Return two 64-bit hashes of item, stable across processes."""
+    digest = hashlib.blake2b(item.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+
+class CountMinSketch:
+    """Count-Min Sketch over string items.
+    
+    An estimate never undercounts, and overcounts by more than
+    epsilon * total with probability at most delta, where
+    epsilon = e / width and delta = e^-depth.
+    """
+    
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.rows = [array('q', [0]) * width for _ in range(depth)]
+    
+    @property
+    def epsilon(self):
+        return math.e / self.width
+    
+    @property
+    def delta(self):
+        return math.exp(-self.depth)
+    
+    def add(self, hashes, count=1):
+        """Add count occurrences of the item with the given _hash_pair()."""
+        first, second = hashes
+        for index, row in enumerate(self.rows):
+            row[(first + index * second) % self.width] += count
+        self.total += count
+    
+    def estimate(self, hashes):
+        first, second = hashes
+        return min(row[(first + index * second) % self.width]
+                   for index, row in enumerate(self.rows))
+    
+    def merge(self, other):
+        for row, other_row in zip(self.rows, other.rows):
+            for index, count in enumerate(other_row):
+                if count:
+                    row[index] += count
+        self.total += other.total
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitters over at most capacity counters.
+    
+    Every item occurring more than total / capacity times is tracked, and a
+    tracked count overestimates the true one by at most total / capacity.
+    """
+    
+    def __init__(self, capacity=HEAVY_HITTERS):
+        self.capacity = capacity
+        self.counts = {}
+        # Min-heap of (count, item); entries go stale as counts grow
+        self._heap = []
+    
+    def add(self, item, count=1):
+        counts = self.counts
+        if item in counts:
+            counts[item] += count
+        else:
+            if len(counts) >= self.capacity:
+                # Take over the smallest counter, inheriting its count as error
+                count += self._pop_min()
+            counts[item] = count
+        heapq.heappush(self._heap, (counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, item) for item, count in counts.items()]
+            heapq.heapify(self._heap)
+    
+    def _pop_min(self):
+        while True:
+            count, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == count:
+                del self.counts[item]
+                return count
+    
+    def floor(self):
+        """Return the most an untracked item can have occurred."""
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+    
+    def merge(self, other):
+        floor, other_floor = self.floor(), other.floor()
+        merged = {item: count + other.counts.get(item, other_floor)
+                  for item, count in self.counts.items()}
+        for item, count in other.counts.items():
+            if item not in merged:
+                merged[item] = count + floor
+        self.counts = dict(heapq.nlargest(self.capacity, merged.items(), key=lambda entry: entry[1]))
+        self._heap = [(count, item) for item, count in self.counts.items()]
+        heapq.heapify(self._heap)
+
+
+class HyperLogLog:
+    """HyperLogLog distinct-count estimator with 2^precision registers.
+    
+    The standard error of the estimate is about 1.04 / sqrt(2^precision).
+    """
+    
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+    
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+    
+    def add(self, hash_value):
+        """Add an item by its 64-bit hash."""
+        bits = 64 - self.precision
+        index = hash_value >> bits
+        rank = bits - (hash_value & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+    
+    def estimate(self):
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        raw = alpha * size * size / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * size and zeros:
+            # Small-range correction (linear counting)
+            return round(size * math.log(size / zeros))
+        return round(raw)
+    
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+
+class FrequencySketch:
+    """Approximate item frequencies and distinct count in fixed memory.
+    
+    Candidates for the most common items come from Space-Saving; each is
+    reported with the smaller of its Space-Saving and Count-Min counts,
+    both of which can only overestimate.
+    """
+    
+    def __init__(self):
+        self.counts = CountMinSketch()
+        self.heavy_hitters = SpaceSaving()
+        self.distinct = HyperLogLog()
+    
+    def add(self, item, count=1):
+        hashes = _hash_pair(item)
+        self.counts.add(hashes, count)
+        self.heavy_hitters.add(item, count)
+        self.distinct.add(hashes[0])
+    
+    def update(self, counter):
+        for item, count in counter.items():
+            self.add(item, count)
+    
+    def merge(self, other):
+        self.counts.merge(other.counts)
+        self.heavy_hitters.merge(other.heavy_hitters)
+        self.distinct.merge(other.distinct)
+    
+    def error_bound(self):
+        """Return the most a reported count exceeds the true one (with probability 1 - delta)."""
+        return math.ceil(self.counts.epsilon * self.counts.total)
+    
+    def most_common(self, n):
+        estimates = [(item, min(count, self.counts.estimate(_hash_pair(item))))
+                     for item, count in self.heavy_hitters.counts.items()]
+        return heapq.nlargest(n, estimates, key=lambda entry: entry[1])
+
+
+def fold_word_forms(forms):
+    """Lowercase a Counter of word forms into a Counter of words.
+    
+    Each distinct form is lowered once; lowering may split a word in two.
+    Forms must not hold a capital sigma, whose lowercase depends on the
+    letters around it (see TextAnalyzer._process).
+    """
+    word_freq = Counter()
+    for form, count in forms.items():
+        for word in WORD_PATTERN.findall(form.lower()):
+            word_freq[word] += count
+    return word_freq
+
+
+class TextAnalyzer:
+    """Collect text statistics in a single pass over a stream of chunks.
+    
+    Chunks may be cut anywhere. Input is processed up to the last space, tab
+    or newline seen, so no word, punctuation run or line break is ever split,
+    and the rest is carried over to the next chunk. Past CARRY_LIMIT without
+    whitespace, it is cut after the last character no word, punctuation run
+    or line break continues across instead; only a single word longer than
+    that is carried whole. The only state that crosses a cut is a pending
+    newline that may pair with the next one to form a paragraph break.
+    
+    Analyzers fed adjacent pieces of a text can be combined with merge(),
+    provided the later piece does not start with a newline that continues
+    a paragraph break.
+    
+    In approximate mode, character and word frequencies go into fixed-size
+    FrequencySketches instead of exact Counters, so memory no longer grows
+    with the vocabulary; all other counts stay exact.
+    """
+    
+    def __init__(self, approximate=False):
+        self.approximate = approximate
+        self.characters = 0
+        self.spaces = 0
+        self.line_breaks = 0
+        self.words = 0
+        self.sentences = 0
+        self.paragraphs = 0
+        if approximate:
+            self.char_freq = FrequencySketch()
+            self.word_freq = FrequencySketch()
+        else:
+            self.char_freq = Counter()
+            self.word_forms = Counter()
+        self.last_char = ''
+        self._carry = []  # Pieces of the text after the last cut
+        self._carry_size = 0
+        self._pending_newline = False
+        self._paragraph_has_text = False
+        # Whether a paragraph break was seen, and if the text before it was non-blank
+        self._paragraph_closed = False
+        self._first_paragraph_has_text = False
+    
+    def feed(self, chunk):
+        """Add the next chunk of text."""
+        if not chunk:
+            return
+        # The carried text has no cut in it, so only the new chunk is searched
+        cut = max(chunk.rfind(' '), chunk.rfind('\t'), chunk.rfind('\n')) + 1
+        if not cut and self._carry_size + len(chunk) > CARRY_LIMIT:
+            import unicodedata  # Only needed here, in text without whitespace
+            for match in FORCED_CUT_PATTERN.finditer(chunk[::-1]):
+                if unicodedata.category(match.group()) not in CASE_IGNORABLE_CATEGORIES:
+                    cut = len(chunk) - match.start()
+                    break
+        if not cut:
+            self._carry.append(chunk)
+            self._carry_size += len(chunk)
+            return
+        self._carry.append(chunk[:cut])
+        text = ''.join(self._carry)
+        self._carry = [chunk[cut:]]
+        self._carry_size = len(chunk) - cut
+        self._process(text)
+    
+    def _process(self, text):
+        if not text:
+            return
+        self.characters += len(text)
+        self.spaces += text.count(' ') + text.count('\n') + text.count('\t')
+        self.line_breaks += len(LINE_BREAK_PATTERN.findall(text))
+        self.sentences += len(SENTENCE_PATTERN.findall(text))
+        self.last_char = text[-1]
+        words = WORD_PATTERN.findall(text)
+        self.words += len(words)
+        lowered = text.lower()
+        if '\u03a3' in text:
+            # A capital sigma lowers to a final or a medial one depending on the letters
+            # around it, so words are taken from the whole text lowered, as they come
+            words = WORD_PATTERN.findall(lowered)
+        if self.approximate:
+            self.char_freq.update(Counter(lowered))
+            self.word_freq.update(fold_word_forms(Counter(words)))
+        else:
+            self.char_freq.update(lowered)
+            self.word_forms.update(words)
+        
+        # Paragraphs are the non-blank pieces of text.split('\n\n')
+        if self._pending_newline:
+            text = '\n' + text
+        pieces = text.split('\n\n')
+        for piece in pieces[:-1]:
+            has_text = self._paragraph_has_text or bool(piece.strip())
+            if not self._paragraph_closed:
+                self._paragraph_closed = True
+                self._first_paragraph_has_text = has_text
+            if has_text:
+                self.paragraphs += 1
+            self._paragraph_has_text = False
+        last = pieces[-1]
+        self._pending_newline = last.endswith('\n')
+        if last.strip():
+            self._paragraph_has_text = True
+    
+    def flush(self):
+        """Process the carried-over text; the analyzer can then be merged."""
+        self._process(''.join(self._carry))
+        self._carry = []
+        self._carry_size = 0
+        return self
+    
+    def merge(self, other):
+        """Add the flushed statistics of other, fed the text following this one."""
+        self.flush()
+        self.characters += other.characters
+        self.spaces += other.spaces
+        self.line_breaks += other.line_breaks
+        self.words += other.words
+        self.sentences += other.sentences
+        if self.approximate:
+            self.char_freq.merge(other.char_freq)
+            self.word_freq.merge(other.word_freq)
+        else:
+            self.char_freq.update(other.char_freq)
+            self.word_forms.update(other.word_forms)
+        if other.characters:
+            self.last_char = other.last_char
+            self._pending_newline = other._pending_newline
+        
+        # Our open paragraph runs on into other's first one
+        if other._paragraph_closed:
+            if self._paragraph_has_text and not other._first_paragraph_has_text:
+                self.paragraphs += 1
+            if not self._paragraph_closed:
+                self._paragraph_closed = True
+                self._first_paragraph_has_text = (self._paragraph_has_text
+                                                  or other._first_paragraph_has_text)
+            self.paragraphs += other.paragraphs
+            self._paragraph_has_text = other._paragraph_has_text
+        else:
+            self._paragraph_has_text = self._paragraph_has_text or other._paragraph_has_text
+        return self
+    
+    def close(self):
+        """Flush the carried-over text and return the statistics dict."""
+        self.flush()
+        if self._paragraph_has_text:
+            self.paragraphs += 1
+            self._paragraph_has_text = False
+        
+        # Like str.splitlines(), a trailing line break does not start a new line
+        lines = self.line_breaks
+        if self.characters and self.last_char not in LINE_BREAK_CHARS:
+            lines += 1
+        
+        stats = {}
+        stats['characters'] = self.characters
+        stats['characters_no_spaces'] = self.characters - self.spaces
+        stats['lines'] = lines
+        stats['words'] = self.words
+        stats['sentences'] = self.sentences
+        stats['paragraphs'] = self.paragraphs
+        stats['approximate'] = self.approximate
+        if self.approximate:
+            stats['most_common_chars'] = self.char_freq.most_common(10)
+            stats['most_common_words'] = self.word_freq.most_common(10)
+            stats['vocabulary_size'] = self.word_freq.distinct.estimate()
+            stats['vocabulary_error'] = self.word_freq.distinct.relative_error
+            stats['char_count_error'] = self.char_freq.error_bound()
+            stats['word_count_error'] = self.word_freq.error_bound()
+        else:
+            word_freq = fold_word_forms(self.word_forms)
+            stats['most_common_chars'] = self.char_freq.most_common(10)
+            stats['most_common_words'] = word_freq.most_common(10)
+            stats['vocabulary_size'] = len(word_freq)
+        
+        # Reading time estimate (average 200 words per minute)
+        stats['reading_time_minutes'] = round(stats['words'] / 200, 1)
+        
+        return stats
 
 
-def analyze_text(text):
-    """Analyze text and return comprehensive statistics."""
-    stats = {}
+def analyze_text(text, workers=1, approximate=False):
+    """Analyze text and return comprehensive statistics.
     
-    # Basic counts
-    stats['characters'] = len(text)
-    stats['characters_no_spaces'] = len(text.replace(' ', '').replace('\n', '').replace('\t', ''))
-    stats['lines'] = len(text.splitlines())
-    stats['words'] = len(re.findall(r'\b\w+\b', text))
-    stats['sentences'] = len(re.findall(r'[.!?]+', text))
-    stats['paragraphs'] = len([p for p in text.split('\n\n') if p.strip()])
+    With workers other than 1, large texts are analyzed in parallel; see
+    analyze_stream().
+    """
+    if workers != 1 and len(text) > PARALLEL_CHUNK_SIZE:
+        return analyze_stream(io.StringIO(text), workers=workers, approximate=approximate)
+    analyzer = TextAnalyzer(approximate)
+    analyzer.feed(text)
+    return analyzer.close()
+
+
+def find_safe_cut(text, start):
+    """Return a position at or after start where text can be split for merge().
     
-    # Character frequency
-    char_freq = Counter(text.lower())
-    stats['most_common_chars'] = char_freq.most_common(10)
+    Prefers the end of a paragraph break within SPLIT_WINDOW, then the end
+    of any line break, then a space or tab. The character after the cut is
+    never a newline. Returns None if there is no such position.
+    """
+    index = text.find('\n\n', start, start + SPLIT_WINDOW)
+    if index < 0:
+        index = text.find('\n', start)
+    if index >= 0:
+        end = NEWLINE_RUN_PATTERN.match(text, index).end()
+        if end < len(text):
+            return end
     
-    # Word frequency
-    words = re.findall(r'\b\w+\b', text.lower())
-    word_freq = Counter(words)
-    stats['most_common_words'] = word_freq.most_common(10)
+    positions = [index for index in (text.find(' ', start), text.find('\t', start)) if index >= 0]
+    if positions and min(positions) + 1 < len(text):
+        return min(positions) + 1
+    return None
+
+
+def iter_safe_chunks(stream, size=PARALLEL_CHUNK_SIZE):
+    """Yield consecutive pieces of a text stream, each about size characters.
     
-    # Reading time estimate (average 200 words per minute)
-    stats['reading_time_minutes'] = round(stats['words'] / 200, 1)
+    Pieces are cut with find_safe_cut() near the end of each block read, so
+    they can be analyzed independently and merged.
+    """
+    buffer = ''
+    for block in iter(lambda: stream.read(size), ''):
+        buffer += block
+        if len(block) < size:
+            break
+        cut = find_safe_cut(buffer, max(0, len(buffer) - SPLIT_WINDOW))
+        if cut is not None:
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+    if buffer:
+        yield buffer
+
+
+def _analyze_chunk(text, approximate):
+    """Analyze one chunk in a worker process."""
+    analyzer = TextAnalyzer(approximate)
+    analyzer.feed(text)
+    return analyzer.flush()
+
+
+def analyze_stream(stream, chunk_size=CHUNK_SIZE, workers=1, approximate=False):
+    """Analyze a text stream chunk by chunk with flat memory use.
+    
+    Args:
+        stream: Text stream to read
+        chunk_size: Characters read per chunk when analyzing serially
+        workers: Worker processes to analyze PARALLEL_CHUNK_SIZE chunks in,
+            or None for one per CPU. Inputs that fit in a single parallel
+            chunk are analyzed serially.
+        approximate: Sketch character and word frequencies in fixed memory
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    
+    analyzer = TextAnalyzer(approximate)
+    if workers <= 1:
+        for chunk in iter(lambda: stream.read(chunk_size), ''):
+            analyzer.feed(chunk)
+        return analyzer.close()
     
-    return stats
+    chunks = iter_safe_chunks(stream)
+    first = next(chunks, '')
+    following = next(chunks, None)
+    if following is None:
+        analyzer.feed(first)
+        return analyzer.close()
+    
+    # Only imported here, as it costs more at startup than small inputs take to analyze
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(workers) as executor:
+        # Merge in input order, keeping a bounded number of chunks in flight
+        pending = deque()
+        for chunk in itertools.chain([first, following], chunks):
+            pending.append(executor.submit(_analyze_chunk, chunk, approximate))
+            if len(pending) > 2 * workers:
+                analyzer.merge(pending.popleft().result())
+        for future in pending:
+            analyzer.merge(future.result())
+    
+    return analyzer.close()
 
 
 def format_stats(stats):
@@ -53,14 +553,27 @@ def format_stats(stats):
     report.append(f"  Words: {stats['words']:,}")
     report.append(f"  Sentences: {stats['sentences']:,}")
     report.append(f"  Paragraphs: {stats['paragraphs']:,}")
+    if stats.get('approximate'):
+        report.append(f"  Vocabulary: ~{stats['vocabulary_size']:,} distinct words"
+                      f" (±{stats['vocabulary_error']:.1%})")
+    elif 'vocabulary_size' in stats:
+        report.append(f"  Vocabulary: {stats['vocabulary_size']:,} distinct words")
     report.append(f"  Reading time: {stats['reading_time_minutes']} minutes\n")
     
-    report.append("Most Common Characters:")
+    if stats.get('approximate'):
+        report.append(f"Most Common Characters (approximate, counts may be up to "
+                      f"{stats['char_count_error']:,} too high):")
+    else:
+        report.append("Most Common Characters:")
     for char, count in stats['most_common_chars']:
         if char.isprintable():
             report.append(f"  '{char}': {count}")
     
-    report.append("\nMost Common Words:")
+    if stats.get('approximate'):
+        report.append(f"\nMost Common Words (approximate, counts may be up to "
+                      f"{stats['word_count_error']:,} too high):")
+    else:
+        report.append("\nMost Common Words:")
     for word, count in stats['most_common_words']:
         report.append(f"  '{word}': {count}")
     
@@ -68,9 +581,14 @@ def format_stats(stats):
 
 
 def main():
-    in_text = sys.stdin.read()
-    if in_text:
-        stats = analyze_text(in_text)
+    # Optional arguments: a worker process count, and --approximate to
+    # sketch frequencies in fixed memory for high-cardinality text
+    args = sys.argv[1:]
+    approximate = '--approximate' in args
+    counts = [arg for arg in args if arg.isdigit()]
+    workers = int(counts[0]) if counts else None
+    stats = analyze_stream(InputReader(), workers=workers, approximate=approximate)
+    if stats['characters']:
         report = format_stats(stats)
         sys.stdout.write(report)
     else:
@@ -10,9 +10,16 @@ Process URLs with various operations like validation, parsing, and manipulation.
 """
 
 import sys
-import urllib.parse
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+if __name__ == "__main__":
+    # Hand the run to a script server, or profile it, before the imports below (see lib/script_client.py)
+    from script_client import bootstrap
+    bootstrap(__file__)
+
 import re
-from urllib.parse import urlparse, urljoin, urlunparse
+from urllib.parse import parse_qs, urlencode, urljoin, urlparse, urlunparse
 
 
 def process_urls(text, operation="validate"):
@@ -78,7 +85,7 @@ def parse_urls(urls):
             
             # Parse query parameters
             if parsed.query:
-                query_params = urllib.parse.parse_qs(parsed.query)
+                query_params = parse_qs(parsed.query)
                 results.append(f"   Query Parameters:")
                 for key, values in query_params.items():
                     results.append(f"     {key}: {', '.join(values)}")
@@ -97,14 +104,14 @@ def clean_urls(urls):
     for url in urls:
         try:
             parsed = urlparse(url)
-            query_params = urllib.parse.parse_qs(parsed.query)
+            query_params = parse_qs(parsed.query)
             
             # Remove tracking parameters
             cleaned_params = {k: v for k, v in query_params.items() 
                             if k not in tracking_params}
             
             # Rebuild URL
-            cleaned_query = urllib.parse.urlencode(cleaned_params, doseq=True)
+            cleaned_query = urlencode(cleaned_params, doseq=True)
             cleaned_url = urlunparse((
                 parsed.scheme, parsed.netloc, parsed.path,
                 parsed.params, cleaned_query, parsed.fragment
@@ -1,11 +1,351 @@
 #!/usr/bin/env -S-P"/opt/homebrew/bin:/usr/local/bin:${PATH}" python3
 #%%%{CotEditorXInput=AllText}%%%
 #%%%{CotEditorXOutput=ReplaceAllText}%%%
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+if __name__ == "__main__":
+  # Hand the run to a script server, or profile it, before the imports below (see lib/script_client.py)
+  from script_client import bootstrap
+  bootstrap(__file__)
+
 import fileinput
+import functools
+import itertools
 import json
+import re
+import shutil
+import tempfile
+
+from json_lines import describe_error, map_json_lines, sniff_json_lines
+
+INDENT = '  '
+
+# Characters of input lines joined into each chunk re-indented at a time
+CHUNK_SIZE = 1 << 20
+
+# Output is spooled until the whole input has been checked, so a syntax
+# error never replaces the document with partial output
+SPOOL_SIZE = 1 << 24
+
+# One token per match, after any whitespace: punctuation, string,
+# unterminated string, bare scalar or end of text. Strings match runs of
+# plain characters between escapes, as an alternative per character would
+# keep backtracking state for each one.
+TOKEN_PATTERN = re.compile(r'''
+  [ \t\n\r]*
+  (?:
+      ([{}\[\]:,])
+    | ("[^"\\]*(?:\\.[^"\\]*)*")
+    | ("[^"\\]*(?:\\.[^"\\]*)*\\?\Z)
+    | ([^ \t\n\r{}\[\]:,"]+)
+    | \Z
+  )
+''', re.VERBOSE | re.DOTALL)
+TOKEN_PUNCTUATION, TOKEN_STRING, TOKEN_UNTERMINATED, TOKEN_SCALAR = range(1, 5)
+
+# What most output lines hold, matched at once rather than token by token:
+# an object member with a scalar value, or a scalar array item, either with
+# its trailing comma
+LINE_PATTERN = re.compile(r'''
+  [ \t\n\r]*
+  (?:("[^"\\]*(?:\\.[^"\\]*)*")[ \t\n\r]*:[ \t\n\r]*)?
+  ("[^"\\]*(?:\\.[^"\\]*)*"|[^ \t\n\r{}\[\]:,"]+)
+  [ \t\n\r]*(,?)
+''', re.VERBOSE | re.DOTALL)
+
+# Strings json.dumps would write back unchanged
+PLAIN_STRING_PATTERN = re.compile(r'"[ !#-\[\]-~]*"')
+INTEGER_PATTERN = re.compile(r'-?(?:0|[1-9]\d*)')
+FLOAT_PATTERN = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+LITERALS = {'true', 'false', 'null', 'NaN', 'Infinity', '-Infinity'}
+INFINITY = float('inf')
+
+EXPECT_VALUE, EXPECT_KEY, EXPECT_COLON, EXPECT_COMMA, EXPECT_END = range(5)
+STATE_ERRORS = {
+  EXPECT_VALUE: 'Expecting value',
+  EXPECT_KEY: 'Expecting property name enclosed in double quotes',
+  EXPECT_COLON: "Expecting ':' delimiter",
+  EXPECT_COMMA: "Expecting ',' delimiter",
+  EXPECT_END: 'Extra data',
+}
+
+
+def format_string(token):
+  # Escape the way json.dumps does; strings holding raw control characters,
+  # which the old line joining silently mangled, are escaped too
+  if PLAIN_STRING_PATTERN.fullmatch(token):
+    return token
+  return json.encoder.encode_basestring_ascii(json.decoder.scanstring(token, 1, False)[0])
+
+
+def decode_string(token):
+  return token[1:-1] if PLAIN_STRING_PATTERN.fullmatch(token) else json.decoder.scanstring(token, 1, False)[0]
+
+
+def format_scalar(token):
+  if token in LITERALS:
+    return token
+  if INTEGER_PATTERN.fullmatch(token):
+    return '0' if token == '-0' else token
+  if FLOAT_PATTERN.fullmatch(token):
+    return json.dumps(float(token))
+  return None
+
+
+def format_value(value, indent, sort_keys):
+  # Decoded JSON formatted as json.dumps(value, indent=2) would format it at
+  # that indentation, building strings rather than yielding pieces of them
+  kind = type(value)
+  if kind is str:
+    return json.encoder.encode_basestring_ascii(value)
+  if kind is dict:
+    if not value:
+      return '{}'
+    inner = indent + INDENT
+    items = sorted(value.items()) if sort_keys else value.items()
+    return '{\n' + inner + (',\n' + inner).join([json.encoder.encode_basestring_ascii(key) + ': ' +
+                                                 format_value(item, inner, sort_keys) for key, item in items]) + \
+      '\n' + indent + '}'
+  if kind is list:
+    if not value:
+      return '[]'
+    inner = indent + INDENT
+    return '[\n' + inner + (',\n' + inner).join([format_value(item, inner, sort_keys) for item in value]) + \
+      '\n' + indent + ']'
+  if kind is int:
+    return int.__repr__(value)
+  if kind is float:
+    if value != value:
+      return 'NaN'
+    if value in (INFINITY, -INFINITY):
+      return 'Infinity' if value > 0 else '-Infinity'
+    return float.__repr__(value)
+  return 'true' if value is True else 'false' if value is False else 'null'
+
+
+def unique_object(pairs):
+  result = dict(pairs)
+  if len(result) < len(pairs):
+    raise ValueError('Duplicate keys')
+  return result
+
+
+def tidy_json(chunks, write, sort_keys=False):
+  """Re-indent JSON read as text chunks token by token, passing the output to write.
+
+  No object tree is built: output follows the input as it is read, except
+  that with sort_keys each object is buffered as formatted member text
+  until it closes, so its members can be ordered. Raises ValueError with
+  the position of the first syntax error.
+  """
+  parts = []  # Output not yet written, or the member value being buffered
+  sinks = []  # Enclosing output lists while objects are buffered
+  objects = []  # Buffered objects: [members by key, (key, key text) of the open member]
+  containers = []  # '{' or '[' for each open container
+  state = EXPECT_VALUE
+  opened = False
+  line_base, column_base = 0, 0  # Position of the start of text
+  # Decoded objects keep duplicate keys apart, as they are when followed token by token,
+  # unless keys are sorted, where the last one is kept either way
+  decoder = json.JSONDecoder(strict=False, object_pairs_hook=None if sort_keys else unique_object)
+  deep = None  # Depth of a container nested too deeply to decode; none inside it is tried
+
+  chunks = iter(chunks)
+  text = next(chunks, '')
+  while True:
+    following = next(chunks, None)
+    final = following is None
+    position = 0
+
+    while True:
+      depth = len(containers)
+      if state == EXPECT_KEY or (state == EXPECT_VALUE and depth and containers[-1] == '['):
+        match = LINE_PATTERN.match(text, position)
+        if match and (match.group(1) is None) == (state == EXPECT_VALUE) and (final or match.end() < len(text)):
+          key, token, comma = match.groups()
+          value = format_string(token) if token[0] == '"' else format_scalar(token)
+          if value is not None:
+            position = match.end()
+            opened = False
+            if key is None:
+              state = EXPECT_VALUE if comma else EXPECT_COMMA
+            else:
+              state = EXPECT_KEY if comma else EXPECT_COMMA
+              if sort_keys:
+                # Filed in the open object as the member's tokens would be one by one
+                if comma:
+                  objects[-1][0][decode_string(key)] = format_string(key) + ': ' + value
+                else:
+                  objects[-1][1] = (decode_string(key), format_string(key))
+                  parts.append(value)
+                continue
+              value = format_string(key) + ': ' + value
+            parts.append('\n' + INDENT * depth + value + comma)
+            if comma and not sinks and len(parts) > 4096:
+              write(''.join(parts))
+              parts = []
+            continue
+
+      match = TOKEN_PATTERN.match(text, position)
+      kind = match.lastindex
+      if not final and match.end() == len(text):
+        # The token may continue in the next chunk
+        carry = match.start()
+        break
+      position = match.end()
+      token = match.group(kind) if kind else None
+      buffered = sort_keys and depth and containers[-1] == '{'
+
+      if kind == TOKEN_PUNCTUATION:
+        if token in '{[' and state == EXPECT_VALUE:
+          if deep is not None and depth <= deep:
+            deep = None
+          if deep is None:
+            try:
+              # A container ending within this chunk is decoded and dumped whole, much
+              # faster; one that does not, or holds an error, is followed token by token
+              value, end = decoder.raw_decode(text, position - 1)
+              value = format_value(value, INDENT * depth, sort_keys)
+            except RecursionError:
+              deep = depth
+            except ValueError:
+              pass
+            else:
+              if containers and containers[-1] == '[':
+                parts.append('\n' + INDENT * depth)
+              parts.append(value)
+              position = end
+              state = EXPECT_COMMA if containers else EXPECT_END
+              opened = False
+              continue
+          if containers and containers[-1] == '[':
+            parts.append('\n' + INDENT * depth)
+          containers.append(token)
+          if sort_keys and token == '{':
+            sinks.append(parts)
+            parts = []
+            objects.append([{}, None])
+          else:
+            parts.append(token)
+          state = EXPECT_KEY if token == '{' else EXPECT_VALUE
+          opened = True
+          continue
+
+        if token in '}]' and containers and containers[-1] == ('{' if token == '}' else '[') and \
+            (state == EXPECT_COMMA or (opened and state == (EXPECT_KEY if token == '}' else EXPECT_VALUE))):
+          containers.pop()
+          if buffered:
+            members, key = objects.pop()
+            if key is not None:
+              members[key[0]] = key[1] + ': ' + ''.join(parts)
+            parts = sinks.pop()
+            if members:
+              separator = ',\n' + INDENT * depth
+              parts.append('{' + separator[1:] + separator.join(members[key] for key in sorted(members)) +
+                           '\n' + INDENT * (depth - 1) + '}')
+            else:
+              parts.append('{}')
+          else:
+            parts.append(token if opened else '\n' + INDENT * (depth - 1) + token)
+          state = EXPECT_COMMA if containers else EXPECT_END
+          opened = False
+          continue
+
+        if token == ',' and state == EXPECT_COMMA:
+          if buffered:
+            members, key = objects[-1]
+            members[key[0]] = key[1] + ': ' + ''.join(parts)
+            objects[-1][1] = None
+            parts = []
+          else:
+            parts.append(',')
+            if not sinks and len(parts) > 4096:
+              write(''.join(parts))
+              parts = []
+          state = EXPECT_VALUE if containers[-1] == '[' else EXPECT_KEY
+          continue
+
+        if token == ':' and state == EXPECT_COLON:
+          if not buffered:
+            parts.append(': ')
+          state = EXPECT_VALUE
+          continue
+
+      elif kind == TOKEN_STRING and state == EXPECT_KEY:
+        if buffered:
+          objects[-1][1] = (decode_string(token), format_string(token))
+        else:
+          parts.append('\n' + INDENT * depth + format_string(token))
+        state = EXPECT_COLON
+        opened = False
+        continue
+
+      elif kind in (TOKEN_STRING, TOKEN_SCALAR) and state == EXPECT_VALUE:
+        value = format_string(token) if kind == TOKEN_STRING else format_scalar(token)
+        if value is not None:
+          if containers and containers[-1] == '[':
+            parts.append('\n' + INDENT * depth)
+          parts.append(value)
+          state = EXPECT_COMMA if containers else EXPECT_END
+          opened = False
+          continue
+
+      elif kind is None and state == EXPECT_END:
+        write(''.join(parts))
+        write('\n')
+        return
+
+      # Anything else is a syntax error at the token
+      start = match.end() - len(token or '')
+      newline = text.rfind('\n', 0, start)
+      line = line_base + text.count('\n', 0, start) + 1
+      column = start - newline if newline >= 0 else column_base + start + 1
+      message = 'Unterminated string starting at' if kind == TOKEN_UNTERMINATED else STATE_ERRORS[state]
+      raise ValueError(f'{message}: line {line} column {column}')
+
+    newline = text.rfind('\n', 0, carry)
+    line_base += text.count('\n', 0, carry)
+    column_base = carry - newline - 1 if newline >= 0 else column_base + carry
+    text = text[carry:] + following
+
+
+def join_lines(lines, size=CHUNK_SIZE):
+  # Lines joined into large chunks, as most of a line would otherwise be
+  # carried over to the next chunk in case its last token continues there
+  parts, length = [], 0
+  for line in lines:
+    parts.append(line)
+    length += len(line)
+    if length >= size:
+      yield ''.join(parts)
+      parts, length = [], 0
+  if parts:
+    yield ''.join(parts)
+
+
+def tidy_record(line, sort_keys=False):
+  return json.dumps(json.loads(line), sort_keys=sort_keys)
+
+
 if __name__ == "__main__":
-  jsonStr = ''
-  for a_line in fileinput.input():
-    jsonStr = jsonStr + ' ' + a_line.strip()
-  jsonObj = json.loads(jsonStr)
-  print(json.dumps(jsonObj, sort_keys=True, indent=2))
\ No newline at end of file
+  # --sort-keys orders object members by key; other arguments are input files
+  sort_keys = '--sort-keys' in sys.argv[1:]
+  lines = fileinput.input(files=[arg for arg in sys.argv[1:] if not arg.startswith('--')])
+  head, json_lines = sniff_json_lines(lines)
+  if json_lines:
+    # JSON Lines: tidy each record onto its own line, keeping any that fail to parse as they are
+    tidy = functools.partial(tidy_record, sort_keys=sort_keys)
+    for number, record, error in map_json_lines(itertools.chain(head, lines), tidy, workers=None):
+      if error:
+        print(f'Line {number}: {describe_error(error)}', file=sys.stderr)
+      print(record)
+    sys.exit()
+  with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE, mode='w+', encoding='utf-8') as output:
+    try:
+      tidy_json(join_lines(itertools.chain(head, lines)), output.write, sort_keys)
+    except ValueError as e:
+      sys.exit(f'JSON Error: {e}')
+    output.seek(0)
+    shutil.copyfileobj(output, sys.stdout)
@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+
+"""
+CSS Parser - Shared CSS tokenizer and parser for the CotEditor CSS scripts
+
+Tokenize a stylesheet once and parse it into a compact tree of rules,
+at-rules, declarations and comments, each with its source position.
+Parsing never fails: syntax problems are recorded as errors and parsing
+recovers the way browsers do.
+"""
+
+import re
+from collections import namedtuple
+
+
+# One token per match: whitespace, comment, string, unquoted url(),
+# at-keyword, hash, number (with any unit or %), ident or function,
+# punctuation, or any other single character
+TOKEN_PATTERN = re.compile(r'''
+    (\s+)
+  | (/\*.*?(?:\*/|\Z))
+  | ("(?:[^"\\\n]|\\.)*"?|'(?:[^'\\\n]|\\.)*'?)
+  | ([uU][rR][lL]\(\s*(?:[^)"'\s\\]|\\.)*\s*\))
+  | (@(?:--|-?(?:[^\W\d]|\\.))(?:[\w-]|\\.)*)
+  | (\#(?:[\w-]|\\.)+)
+  | ([+-]?(?:\d*\.\d+|\d+)(?:[eE][+-]?\d+)?(?:%|(?:--|-?(?:[^\W\d]|\\.))(?:[\w-]|\\.)*)?)
+  | ((?:--|-?(?:[^\W\d]|\\.))(?:[\w-]|\\.)*\(?)
+  | ([{}()\[\];:,])
+  | (.)
+''', re.VERBOSE | re.DOTALL)
+TOKEN_KINDS = (None, 'ws', 'comment', 'string', 'url', 'at-keyword', 'hash', 'number', 'ident', None, 'delim')
+
+# Splits a number token into its value and unit ('%' for percentages)
+NUMBER_PATTERN = re.compile(r'([+-]?(?:\d*\.\d+|\d+)(?:[eE][+-]?\d+)?)(.*)', re.DOTALL)
+
+Token = namedtuple('Token', ['kind', 'text', 'line', 'column'])
+
+Stylesheet = namedtuple('Stylesheet', ['nodes', 'errors'])
+Comment = namedtuple('Comment', ['text', 'line', 'column'])
+Rule = namedtuple('Rule', ['selectors', 'children', 'line', 'column', 'end_line'])
+AtRule = namedtuple('AtRule', ['name', 'prelude', 'children', 'line', 'column', 'end_line'])
+Selector = namedtuple('Selector', ['text', 'tokens', 'line', 'column'])
+Declaration = namedtuple('Declaration', ['property', 'value', 'important', 'tokens',
+                                         'line', 'column', 'terminated'])
+ParseError = namedtuple('ParseError', ['code', 'message', 'line', 'column'])
+
+Rule.__doc__ = "A qualified rule; children are its declarations and any nested rules or at-rules."
+AtRule.__doc__ = "An at-rule; children is None for statements such as @import."
+Selector.__doc__ = "A selector; tokens are its tokens without comments or surrounding whitespace."
+Declaration.__doc__ = "A declaration; tokens are its value tokens without comments, surrounding whitespace or !important."
+
+SKIPPED = {'ws', 'comment'}
+
+# Pseudo-elements that may be written with a single colon
+LEGACY_PSEUDO_ELEMENTS = {'before', 'after', 'first-line', 'first-letter'}
+
+# Pseudo-classes taking the specificity of their most specific argument, and none of their own
+SELECTOR_LIST_PSEUDO_CLASSES = {'is', 'not', 'has', 'matches', '-webkit-any', '-moz-any'}
+
+_specificity_cache = {}
+
+
+def tokenize(css):
+    """Split css into Tokens, returning (tokens, errors) for unterminated strings and comments."""
+    tokens = []
+    errors = []
+    line, line_start = 1, 0
+    append = tokens.append
+    new = tuple.__new__  # Skips the namedtuple constructor's argument handling
+    
+    for match in TOKEN_PATTERN.finditer(css):
+        index = match.lastindex
+        text = match.group(index)
+        start = match.start()
+        kind = TOKEN_KINDS[index] or text
+        if index == 8 and text[-1] == '(':
+            kind = 'function'
+        append(new(Token, (kind, text, line, start - line_start + 1)))
+        
+        # Only whitespace, comments and strings can be unterminated or span lines
+        if index <= 3:
+            if index == 2 and not (len(text) > 3 and text.endswith('*/')):
+                errors.append(ParseError('unterminated-comment', 'Unterminated comment', line, start - line_start + 1))
+            elif index == 3 and not _is_closed_string(text):
+                errors.append(ParseError('unterminated-string', 'Unterminated string', line, start - line_start + 1))
+            if '\n' in text:
+                line += text.count('\n')
+                line_start = start + text.rindex('\n') + 1
+    
+    return tokens, errors
+
+
+def _is_closed_string(text):
+    # The closing quote counts unless it is escaped by an odd run of backslashes
+    if len(text) < 2 or text[-1] != text[0]:
+        return False
+    body = text[1:-1]
+    return (len(body) - len(body.rstrip('\\'))) % 2 == 0
+
+
+def split_number(text):
+    """Return (value, unit) for a number token; unit is '' for plain numbers and '%' for percentages."""
+    number, unit = NUMBER_PATTERN.match(text).groups()
+    return float(number), unit.lower()
+
+
+def strip_whitespace(tokens):
+    """Return tokens without leading and trailing whitespace tokens."""
+    start, end = 0, len(tokens)
+    while start < end and tokens[start].kind == 'ws':
+        start += 1
+    while end > start and tokens[end - 1].kind == 'ws':
+        end -= 1
+    return tokens[start:end]
+
+
+def tokens_text(tokens):
+    """Join tokens back into text, dropping comments and collapsing whitespace to single spaces."""
+    parts = []
+    for token in tokens:
+        if token.kind == 'ws':
+            if parts and parts[-1] != ' ':
+                parts.append(' ')
+        elif token.kind != 'comment':
+            parts.append(token.text)
+    return ''.join(parts).strip()
+
+
+def parse_stylesheet(css):
+    """Parse css into a Stylesheet of top-level nodes and the syntax errors found."""
+    tokens, errors = tokenize(css)
+    parser = _Parser(tokens, errors)
+    nodes = parser.parse_contents(top_level=True)
+    return Stylesheet(nodes, errors)
+
+
+def walk(nodes):
+    """Yield every node in nodes and their children, depth first in source order."""
+    stack = [iter(nodes)]
+    while stack:
+        node = next(stack[-1], None)
+        if node is None:
+            stack.pop()
+            continue
+        yield node
+        children = getattr(node, 'children', None)
+        if children:
+            stack.append(iter(children))
+
+
+class _Parser:
+    """Recursive descent over the token list; blocks nest only as deep as the stylesheet does."""
+    
+    def __init__(self, tokens, errors):
+        self.tokens = tokens
+        self.errors = errors
+        self.position = 0
+    
+    def error(self, code, message, token):
+        self.errors.append(ParseError(code, message, token.line, token.column))
+    
+    def parse_contents(self, top_level):
+        """Parse rules, at-rules, declarations and comments up to the end of the block."""
+        tokens = self.tokens
+        nodes = []
+        while self.position < len(tokens):
+            token = tokens[self.position]
+            kind = token.kind
+            if kind == 'ws' or kind == ';':
+                self.position += 1
+            elif kind == 'comment':
+                nodes.append(Comment(token.text, token.line, token.column))
+                self.position += 1
+            elif kind == '}':
+                if not top_level:
+                    break
+                self.error('mismatched-braces', 'Unexpected closing brace', token)
+                self.position += 1
+            elif kind == 'at-keyword':
+                nodes.append(self.parse_at_rule())
+            elif top_level or not self.declaration_follows():
+                rule = self.parse_rule()
+                if rule is not None:
+                    nodes.append(rule)
+            else:
+                declaration = self.parse_declaration()
+                if declaration is not None:
+                    nodes.append(declaration)
+        return nodes
+    
+    def declaration_follows(self):
+        """Return whether the next ';' or '}' comes before any '{', so no nested rule starts here."""
+        tokens = self.tokens
+        depth = 0
+        for position in range(self.position, len(tokens)):
+            kind = tokens[position].kind
+            if kind in ('(', '[', 'function'):
+                depth += 1
+            elif kind in (')', ']'):
+                depth = max(depth - 1, 0)
+            elif depth == 0 and kind in ('{', ';', '}'):
+                return kind != '{'
+        return True
+    
+    def parse_block(self, opening):
+        """Parse the block after a '{' token, returning (children, line of the closing brace)."""
+        children = self.parse_contents(top_level=False)
+        if self.position < len(self.tokens):
+            end_line = self.tokens[self.position].line
+            self.position += 1
+        else:
+            self.error('mismatched-braces', 'Unclosed block', opening)
+            end_line = self.tokens[-1].line
+        return children, end_line
+    
+    def parse_prelude(self, stops):
+        """Collect tokens up to one of stops outside parentheses, leaving the stop unconsumed."""
+        tokens = self.tokens
+        start = self.position
+        depth = 0
+        while self.position < len(tokens):
+            kind = tokens[self.position].kind
+            if kind in ('(', '[', 'function'):
+                depth += 1
+            elif kind in (')', ']'):
+                depth = max(depth - 1, 0)
+            elif depth == 0 and kind in stops:
+                break
+            self.position += 1
+        return tokens[start:self.position]
+    
+    def parse_rule(self):
+        first = self.tokens[self.position]
+        prelude = self.parse_prelude(('{', '}'))
+        if self.position >= len(self.tokens) or self.tokens[self.position].kind != '{':
+            self.error('invalid-rule', 'Selector without a declaration block', first)
+            return None
+        opening = self.tokens[self.position]
+        self.position += 1
+        children, end_line = self.parse_block(opening)
+        return Rule(split_selectors(prelude), children, first.line, first.column, end_line)
+    
+    def parse_at_rule(self):
+        keyword = self.tokens[self.position]
+        self.position += 1
+        prelude = self.parse_prelude(('{', ';', '}'))
+        children = None
+        end_line = prelude[-1].line if prelude else keyword.line
+        if self.position < len(self.tokens):
+            stop = self.tokens[self.position]
+            if stop.kind == '{':
+                self.position += 1
+                children, end_line = self.parse_block(stop)
+            elif stop.kind == ';':
+                self.position += 1
+        return AtRule(keyword.text[1:].lower(), tokens_text(prelude), children,
+                      keyword.line, keyword.column, end_line)
+    
+    def parse_declaration(self):
+        tokens = self.tokens
+        name = tokens[self.position]
+        start = self.position
+        self.position += 1
+        while self.position < len(tokens) and tokens[self.position].kind in SKIPPED:
+            self.position += 1
+        
+        if name.kind != 'ident' or self.position >= len(tokens) or tokens[self.position].kind != ':':
+            # Not a declaration: skip to the end of it, as browsers do
+            self.position = start
+            self.parse_prelude((';', '}'))
+            self.error('invalid-declaration', 'Expected "property: value"', name)
+            return None
+        self.position += 1
+        
+        value = []
+        depth = 0
+        terminated = False
+        while self.position < len(tokens):
+            token = tokens[self.position]
+            kind = token.kind
+            if depth == 0:
+                if kind == ';':
+                    terminated = True
+                    self.position += 1
+                    break
+                if kind == '}':
+                    break
+                if kind == 'ws' and '\n' in token.text and self.starts_declaration(self.position + 1):
+                    # A new "property:" line: the semicolon before it is missing
+                    last = next((t for t in reversed(value) if t.kind not in SKIPPED), name)
+                    self.errors.append(ParseError('missing-semicolon', 'Missing semicolon', last.line,
+                                                  last.column + len(last.text)))
+                    break
+            if kind in ('(', '[', 'function'):
+                depth += 1
+            elif kind in (')', ']'):
+                depth = max(depth - 1, 0)
+            value.append(token)
+            self.position += 1
+        
+        tokens = strip_whitespace([token for token in value if token.kind != 'comment'])
+        significant = [index for index, token in enumerate(tokens) if token.kind != 'ws'][-2:]
+        important = (len(significant) == 2 and tokens[significant[0]].text == '!' and
+                     tokens[significant[1]].kind == 'ident' and tokens[significant[1]].text.lower() == 'important')
+        if important:
+            tokens = strip_whitespace(tokens[:significant[0]])
+        
+        property_name = name.text if name.text.startswith('--') else name.text.lower()
+        return Declaration(property_name, tokens_text(tokens), important, tokens,
+                           name.line, name.column, terminated)
+    
+    def starts_declaration(self, position):
+        """Return whether an ident followed by ':' starts at position."""
+        tokens = self.tokens
+        if position >= len(tokens) or tokens[position].kind != 'ident':
+            return False
+        position += 1
+        while position < len(tokens) and tokens[position].kind in SKIPPED:
+            position += 1
+        return position < len(tokens) and tokens[position].kind == ':'
+
+
+def split_selectors(prelude):
+    """Split a rule prelude into Selectors at commas outside parentheses."""
+    selectors = []
+    current = []
+    depth = 0
+    for token in prelude + [None]:
+        kind = token.kind if token else ','
+        if kind in ('(', '[', 'function'):
+            depth += 1
+        elif kind in (')', ']'):
+            depth = max(depth - 1, 0)
+        if kind == ',' and depth == 0:
+            tokens = strip_whitespace([t for t in current if t.kind != 'comment'])
+            if tokens:
+                selectors.append(Selector(tokens_text(tokens), tokens, tokens[0].line, tokens[0].column))
+            current = []
+        else:
+            current.append(token)
+    return selectors
+
+
+def selector_specificity(selector):
+    """Return the (a, b, c) specificity of a Selector, computed once per selector text."""
+    result = _specificity_cache.get(selector.text)
+    if result is None:
+        result = _specificity_cache[selector.text] = specificity(selector.tokens)
+    return result
+
+
+def specificity(tokens):
+    """Return the (a, b, c) specificity of a selector's tokens: IDs, then classes,
+    attributes and pseudo-classes, then type selectors and pseudo-elements."""
+    a = b = c = 0
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        kind = token.kind
+        if kind == 'hash':
+            a += 1
+        elif kind == 'delim' and token.text == '.':
+            b += 1
+            index += 1
+        elif kind == '[':
+            b += 1
+            index = _closing_index(tokens, index)
+        elif kind == ':' and index + 1 < len(tokens):
+            element = tokens[index + 1].kind == ':'
+            index += 2 if element else 1
+            if index >= len(tokens):
+                break
+            name = tokens[index].text.lower()
+            if tokens[index].kind == 'function':
+                end = _closing_index(tokens, index)
+                arguments = tokens[index + 1:end]
+                name = name[:-1]
+                if element:
+                    c += 1
+                elif name in SELECTOR_LIST_PSEUDO_CLASSES:
+                    a, b, c = _add(a, b, c, _max_specificity(arguments))
+                elif name in ('nth-child', 'nth-last-child'):
+                    # "of S" adds the specificity of the most specific S
+                    b += 1
+                    of = next((i for i, t in enumerate(arguments) if t.kind == 'ident' and t.text.lower() == 'of'), None)
+                    if of is not None:
+                        a, b, c = _add(a, b, c, _max_specificity(arguments[of + 1:]))
+                elif name != 'where':
+                    b += 1
+                index = end
+            elif element or name in LEGACY_PSEUDO_ELEMENTS:
+                c += 1
+            else:
+                b += 1
+        elif kind == 'ident' and not (index + 1 < len(tokens) and tokens[index + 1].text == '|'):
+            # A type selector, but not a namespace prefix
+            c += 1
+        index += 1
+    return a, b, c
+
+
+def _add(a, b, c, other):
+    return a + other[0], b + other[1], c + other[2]
+
+
+def _closing_index(tokens, index):
+    # Index of the token closing the bracket or function opened at index
+    depth = 0
+    for position in range(index, len(tokens)):
+        kind = tokens[position].kind
+        if kind in ('(', '[', 'function'):
+            depth += 1
+        elif kind in (')', ']'):
+            depth -= 1
+            if depth == 0:
+                return position
+    return len(tokens)
+
+
+def _max_specificity(tokens):
+    return max((specificity(selector.tokens) for selector in split_selectors(tokens)), default=(0, 0, 0))
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+"""
+JS Lexer - Shared JavaScript tokenizer for the CotEditor JavaScript scripts
+
+Split JavaScript into tokens with their source positions. Strings,
+template literals (with nested substitutions), regular expression
+literals and comments are recognised, so nothing inside them is mistaken
+for code. Tokenizing never fails: unterminated literals are recorded as
+errors.
+"""
+
+import re
+from collections import namedtuple
+
+
+KEYWORDS = {
+    'await', 'break', 'case', 'catch', 'class', 'const', 'continue', 'debugger', 'default',
+    'delete', 'do', 'else', 'export', 'extends', 'false', 'finally', 'for', 'function', 'if',
+    'import', 'in', 'instanceof', 'let', 'new', 'null', 'return', 'super', 'switch', 'this',
+    'throw', 'true', 'try', 'typeof', 'var', 'void', 'while', 'with', 'yield',
+}
+
+# Keywords after which a '/' starts a regular expression rather than a division
+REGEX_PRECEDING_KEYWORDS = {
+    'await', 'case', 'delete', 'do', 'else', 'in', 'instanceof', 'new', 'of', 'return',
+    'throw', 'typeof', 'void', 'yield',
+}
+
+LINE_TERMINATORS = '\n\r\u2028\u2029'
+
+# One token per match, after any whitespace and line breaks: name, '}',
+# punctuator, number, string, line comment, block comment, '/' or '/=',
+# '`', any other character, or the end of the code. The most frequent
+# tokens come first, as alternatives are tried in order. Literals, here and
+# in the patterns below, match runs of plain characters between escapes, as
+# an alternative per character would keep backtracking state for each one.
+TOKEN_PATTERN = re.compile(r'''
+    ((?:[^\S\x1c-\x1f]|\ufeff)*)
+  (?:
+    (\#?(?:[A-Za-z_$\x80-\U0010ffff]|\\u(?:[\da-fA-F]{4}|\{[\da-fA-F]+\}))
+        (?:[\w$\x80-\U0010ffff]+|\\u(?:[\da-fA-F]{4}|\{[\da-fA-F]+\}))*)
+  | (\})
+  | ([()\[\]{};,~@:]|\.\.\.|\.(?!\d)|=(?:==?|>)?|!(?:==?)?|\*\*=?|\*=?|<<=?|<=?|>>>=?|>>=?|>=?
+     |&&=?|&=?|\|\|=?|\|=?|\?\?=?|\?\.(?!\d)|\?|\+\+|\+=?|--|-=?|%=?|\^=?)
+  | ((?:0[xX][\da-fA-F_]+|0[oO][0-7_]+|0[bB][01_]+)n?
+     |(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d[\d_]*)?n?)
+  | ("[^"\\\n\r]*(?:\\(?:\r\n|[\s\S])[^"\\\n\r]*)*"?|'[^'\\\n\r]*(?:\\(?:\r\n|[\s\S])[^'\\\n\r]*)*'?)
+  | (//[^\n\r\u2028\u2029]*)
+  | (/\*[\s\S]*?(?:\*/|\Z))
+  | (/=?)
+  | (`)
+  | (.)
+  | \Z
+  )
+''', re.VERBOSE)
+(WHITESPACE, NAME, CLOSE_BRACE, PUNCTUATOR, NUMBER, STRING, LINE_COMMENT, BLOCK_COMMENT,
+ SLASH, BACKTICK, INVALID) = range(1, 12)
+
+# The rest of a template literal piece, after '`' or the '}' ending a substitution
+TEMPLATE_PATTERN = re.compile(r'[^`\\$]*(?:(?:\\[\s\S]|\$(?!\{))[^`\\$]*)*(`|\$\{)?')
+
+# A regular expression literal: a body that is not empty, of plain
+# characters, escapes and classes (in which '/' does not end it), and flags
+REGEX_PATTERN = re.compile(r'''
+    /(?!/)[^\\/\[\n\r\u2028\u2029]*
+    (?:(?:\\[^\n\r\u2028\u2029]|\[[^\]\\\n\r\u2028\u2029]*(?:\\[^\n\r\u2028\u2029][^\]\\\n\r\u2028\u2029]*)*\])
+       [^\\/\[\n\r\u2028\u2029]*)*
+    /[A-Za-z]*
+''', re.VERBOSE)
+
+# A '#!' first line is skipped like a comment
+HASHBANG_PATTERN = re.compile(r'(?:#![^\n\r\u2028\u2029]*)?')
+
+Token = namedtuple('Token', ['kind', 'text', 'line', 'column', 'newline'])
+Token.__doc__ = ("A token: kind is 'name' (identifiers and keywords), 'number', 'string', 'template' "
+                 "(a template literal up to its end or next substitution), 'regex', 'punct' or 'invalid'; "
+                 "newline tells whether a line break comes between it and the previous token.")
+
+LexError = namedtuple('LexError', ['code', 'message', 'line', 'column'])
+
+
+def tokenize(code):
+    """Split code into Tokens, skipping whitespace and comments; returns (tokens, errors)."""
+    tokens = []
+    errors = []
+    append = tokens.append
+    new = tuple.__new__  # Skips the namedtuple constructor's argument handling
+    braces = []  # For each open '{' or '${': whether it is a template substitution
+    parens = []  # For each open '(': whether it holds an if, for, while or with condition
+    after_condition = False  # Whether the last token closed such a condition
+    line, line_start = 1, 0
+    newline = False
+    previous = None  # The last token, to tell a regular expression from a division
+    position = HASHBANG_PATTERN.match(code).end()
+    
+    # Regular expressions and template literals are matched separately;
+    # the token scan restarts after each one
+    scanning = True
+    while scanning:
+        scanning = False
+        for match in TOKEN_PATTERN.finditer(code, position):
+            index = match.lastindex
+            space = match.group(WHITESPACE)
+            if space and space != ' ':
+                breaks = _count_line_breaks(space)
+                if breaks:
+                    line += breaks
+                    line_start = match.start() + _last_line_start(space)
+                    newline = True
+            if index == WHITESPACE:
+                break  # Only whitespace was left
+            start = match.start(index)
+            text = match.group(index)
+            kind = 'punct'
+            
+            if index == NAME:
+                kind = 'name'
+            elif index == PUNCTUATOR:
+                if text == '{':
+                    braces.append(False)
+                elif text == '(':
+                    parens.append(previous is not None and previous.text in ('if', 'for', 'while', 'with'))
+            elif index == NUMBER:
+                kind = 'number'
+            elif index == STRING:
+                kind = 'string'
+                if len(text) < 2 or text[-1] != text[0] or not _closes(text):
+                    errors.append(LexError('unterminated-string', 'Unterminated string', line, start - line_start + 1))
+            elif index == LINE_COMMENT:
+                continue
+            elif index == BLOCK_COMMENT:
+                if not text.endswith('*/') or len(text) < 4:
+                    errors.append(LexError('unterminated-comment', 'Unterminated comment', line, start - line_start + 1))
+                breaks = _count_line_breaks(text)
+                if breaks:
+                    line += breaks
+                    line_start = start + _last_line_start(text)
+                    newline = True
+                continue
+            elif index == SLASH and (after_condition or _regex_allowed(previous)):
+                regex = REGEX_PATTERN.match(code, start)
+                if regex:
+                    kind = 'regex'
+                    text = regex.group()
+                    position = regex.end()
+                    scanning = True
+                else:
+                    errors.append(LexError('unterminated-regex', 'Unterminated regular expression',
+                                           line, start - line_start + 1))
+            elif index == BACKTICK or (index == CLOSE_BRACE and braces and braces[-1]):
+                if index == CLOSE_BRACE:
+                    braces.pop()
+                piece = TEMPLATE_PATTERN.match(code, match.end())
+                position = piece.end()
+                scanning = True
+                text = code[start:position]
+                kind = 'template'
+                if piece.group(1) == '${':
+                    braces.append(True)
+                elif piece.group(1) is None:
+                    errors.append(LexError('unterminated-template', 'Unterminated template literal',
+                                           line, start - line_start + 1))
+            elif index == CLOSE_BRACE:
+                if braces:
+                    braces.pop()
+            elif index == INVALID:
+                kind = 'invalid'
+            
+            after_condition = text == ')' and bool(parens) and parens.pop()
+            previous = new(Token, (kind, text, line, start - line_start + 1, newline))
+            append(previous)
+            newline = False
+            
+            if kind == 'string' or kind == 'template':
+                breaks = _count_line_breaks(text)
+                if breaks:
+                    line += breaks
+                    line_start = start + _last_line_start(text)
+            if scanning:
+                break
+    
+    return tokens, errors
+
+
+def _regex_allowed(previous):
+    if previous is None:
+        return True
+    if previous.kind == 'punct':
+        return previous.text not in (')', ']', '++', '--')
+    if previous.kind == 'name':
+        return previous.text in REGEX_PRECEDING_KEYWORDS
+    return previous.kind == 'template' and previous.text.endswith('${')
+
+
+def _closes(text):
+    # The closing quote counts unless it is escaped by an odd run of backslashes
+    body = text[1:-1]
+    return (len(body) - len(body.rstrip('\\'))) % 2 == 0
+
+
+def _count_line_breaks(text):
+    return text.count('\n') + text.count('\r') - text.count('\r\n') + text.count('\u2028') + text.count('\u2029')
+
+
+def _last_line_start(text):
+    return max(text.rfind(terminator) for terminator in LINE_TERMINATORS) + 1
+
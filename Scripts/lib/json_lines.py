@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+"""
+JSON Lines - Shared helpers for the CotEditor JSON scripts
+
+Stream newline-delimited JSON (one value per line), optionally handing
+records to worker processes. Scripts import this module from the lib
+folder next to their category folders.
+"""
+
+import itertools
+import json
+import os
+from collections import deque
+
+
+# Lines handed to a worker process at a time
+PARALLEL_BATCH_LINES = 4096
+
+
+def sniff_json_lines(lines):
+    """Read the first two non-blank lines and decide whether the input is JSON Lines.
+    
+    A complete object or array on the first line, followed by more content,
+    cannot be a single JSON document; nor can a first line that looks like
+    one followed by a line opening another. Returns (lines read, is JSON Lines);
+    the caller continues with the rest of lines after the ones read.
+    """
+    head = []
+    records = []
+    for line in lines:
+        head.append(line)
+        if line.strip():
+            records.append(line)
+            if len(records) == 2:
+                break
+    
+    if len(records) < 2:
+        return head, False
+    try:
+        return head, isinstance(json.loads(records[0]), (dict, list))
+    except ValueError:
+        # A broken first record still reads as one when shaped like a container
+        first, second = records[0].strip(), records[1].lstrip()
+        return head, first[0] in '{[' and first[-1] in '}]' and second[0] in '{['
+
+
+def describe_error(error):
+    """Describe a record's error; a syntax error's line is the record's, so only its column is given."""
+    if isinstance(error, json.JSONDecodeError):
+        return f"{error.msg} at column {error.colno}"
+    return str(error)
+
+
+def _apply(function, number, line):
+    try:
+        return number, function(line), None
+    except ValueError as e:
+        # Covers json.JSONDecodeError; the line is passed back for callers that keep it
+        return number, line, e
+
+
+def _apply_batch(function, batch):
+    return [_apply(function, number, line) for number, line in batch]
+
+
+def map_json_lines(lines, function, workers=1):
+    """Apply function to each non-blank line, yielding (line number, result, error) in input order.
+    
+    Args:
+        lines: Iterable of input lines
+        function: Called with a line's text, without its line ending; must
+            be a module-level function when workers are used. A ValueError
+            it raises, such as json.JSONDecodeError, is yielded as the error
+            with the line's text as the result.
+        workers: Worker processes to handle PARALLEL_BATCH_LINES line
+            batches in, or None for one per CPU. Inputs that fit in a single
+            batch are handled serially.
+    
+    Only a bounded number of batches is in flight, so memory is set by the
+    batch size and the largest record rather than the input size.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    
+    numbered = ((number, line.rstrip('\r\n')) for number, line in enumerate(lines, 1) if line.strip())
+    if workers <= 1:
+        for number, line in numbered:
+            yield _apply(function, number, line)
+        return
+    
+    batches = iter(lambda: list(itertools.islice(numbered, PARALLEL_BATCH_LINES)), [])
+    first = next(batches, [])
+    following = next(batches, None)
+    if following is None:
+        yield from _apply_batch(function, first)
+        return
+    
+    # Only imported here, as it costs more at startup than most inputs take to process
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for batch in itertools.chain([first, following], batches):
+            pending.append(executor.submit(_apply_batch, function, batch))
+            if len(pending) > 2 * workers:
+                yield from pending.popleft().result()
+        for future in pending:
+            yield from future.result()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+"""
+Lint Cache - Shared on-disk caches for the CotEditor linter scripts
+
+Locate the scripts' cache directory and keep lint results per file
+content, so files that have not changed since they were last linted,
+under the same rules and configuration, are not linted again.
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+
+# Limits past which the least recently used lint results are dropped
+LINT_CACHE_MAX_BYTES = 64 << 20
+LINT_CACHE_MAX_ENTRIES = 50000
+
+
+def cache_directory():
+    """Return the directory for script caches, creating it if needed."""
+    directory = os.environ.get('COT_CACHE_DIR')
+    if not directory:
+        if sys.platform == 'darwin':
+            base = os.path.expanduser('~/Library/Caches')
+        else:
+            base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+        directory = os.path.join(base, 'CotEditor Scripts')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def source_digest(paths):
+    """Return a digest of the files at paths, to version results by the code producing them."""
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        with open(path, 'rb') as file:
+            digest.update(hashlib.blake2b(file.read(), digest_size=16).digest())
+    return digest.digest()
+
+
+def lint_cache_key(content, linter, rule_set_version, config=b''):
+    """Return the cache key of a file's issues.
+    
+    Args:
+        content: The file's bytes
+        linter: Name of the linter
+        rule_set_version: Bytes identifying the linter's rules, such as a
+            source_digest() of its code
+        config: Bytes identifying its configuration
+    """
+    key = hashlib.blake2b(digest_size=20)
+    for part in (linter.encode('utf-8'), rule_set_version, config, content):
+        key.update(hashlib.blake2b(part, digest_size=16).digest())
+    return key.hexdigest()
+
+
+class LintCache:
+    """Issue lists by cache key, one JSON file per entry.
+    
+    Entries are written atomically, so runs may share the directory. A
+    hit refreshes the entry's modification time, and when entries were
+    added, prune() drops the least recently used ones beyond max_bytes or
+    max_entries. Issues are stored as the same dicts the linters return,
+    so they format exactly like fresh ones.
+    """
+    
+    def __init__(self, directory, max_bytes=LINT_CACHE_MAX_BYTES, max_entries=LINT_CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.modified = False
+        os.makedirs(directory, exist_ok=True)
+    
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+    
+    def get(self, key):
+        """Return the cached issues for key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as file:
+                issues = json.load(file)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return issues
+    
+    def put(self, key, issues):
+        """Cache issues under key; failures only cost a re-lint."""
+        import tempfile
+        try:
+            descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+                json.dump(issues, file, ensure_ascii=False)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            return
+        self.modified = True
+    
+    def prune(self):
+        """Drop the least recently used entries beyond the size and entry limits."""
+        if not self.modified:
+            return
+        try:
+            entries = [(entry.stat().st_mtime_ns, entry.stat().st_size, entry.path)
+                       for entry in os.scandir(self.directory) if entry.name.endswith('.json')]
+        except OSError:
+            return
+        entries.sort(reverse=True)
+        total = 0
+        for count, (mtime, size, path) in enumerate(entries, 1):
+            total += size
+            if total > self.max_bytes or count > self.max_entries:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        self.modified = False
+
+
+def open_lint_cache():
+    """Return the shared LintCache, or None if there is no cache directory."""
+    try:
+        return LintCache(os.path.join(cache_directory(), 'lint-results'))
+    except OSError:
+        return None
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+Script Client - Hand a CotEditor script run to the resident script server
+
+Scripts put this folder on sys.path and call bootstrap(__file__) before
+their other imports:
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'lib'))
+    if __name__ == "__main__":
+        from script_client import bootstrap
+        bootstrap(__file__)
+
+If a script server (see script_server.py) is listening, it runs the script
+with this process's arguments, working directory, environment and stdin,
+and this process just relays its output and exit status; otherwise the
+call returns and the script runs as usual, profiled if $COT_PROFILE is set
+(see script_profiler.py). Only builtin modules are imported until a server
+is found.
+"""
+
+import os
+import sys
+
+
+# Set in the server process, where scripts must run rather than forward
+serving = False
+
+# Response frame channels
+CHANNEL_EXIT, CHANNEL_STDOUT, CHANNEL_STDERR = 0, 1, 2
+
+STDIN_CHUNK_SIZE = 1 << 16
+
+
+def socket_path():
+    """Return the server socket path: $COT_SCRIPT_SERVER, or one per user in the temporary directory."""
+    return os.environ.get('COT_SCRIPT_SERVER') or os.path.join(
+        os.environ.get('TMPDIR') or '/tmp', f'coteditor-scripts-{os.getuid()}', 'server.sock')
+
+
+def encode_fields(fields):
+    """Join str fields into a length-prefixed request header."""
+    data = '\0'.join(fields).encode('utf-8', 'surrogateescape')
+    return len(data).to_bytes(4, 'big') + data
+
+
+def read_exactly(connection, size):
+    """Read size bytes from a socket; fewer mean the connection closed."""
+    chunks = []
+    while size:
+        chunk = connection.recv(min(size, 1 << 20))
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def send_stdin(connection, sent):
+    """Send all of stdin to the server, then release the sent lock."""
+    import _socket
+    try:
+        stdin = sys.stdin.buffer if sys.stdin is not None else None
+        while stdin is not None:
+            chunk = stdin.read1(STDIN_CHUNK_SIZE)
+            if not chunk:
+                break
+            connection.sendall(chunk)
+    except (OSError, ValueError):
+        pass  # Input ends here; a failed connection is reported as output is relayed
+    try:
+        # End the input even so, as the server reads it to its end before finishing
+        connection.shutdown(_socket.SHUT_WR)
+    except OSError:
+        pass
+    sent.release()
+
+
+def forward_to_server(script):
+    """Run script in the script server and exit with its status, or return if none is running."""
+    path = socket_path()
+    try:
+        if serving or os.stat(path).st_uid != os.getuid():
+            return
+    except OSError:
+        return
+    
+    # The builtin socket type, as the socket module's own imports cost more than a served run
+    import _socket
+    connection = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        connection.connect(path)
+        args = sys.argv[1:]
+        environment = [f'{key}={value}' for key, value in os.environ.items()]
+        connection.sendall(encode_fields([os.path.abspath(script), os.getcwd(), str(len(args))] +
+                                         args + environment))
+        # The server declines scripts it cannot run, before any input is read
+        if connection.recv(1) != b'+':
+            connection.close()
+            return
+    except OSError:
+        connection.close()
+        return
+    
+    # Past this point stdin is being consumed, so the script can no longer run here.
+    # It is sent from a thread of its own while output is relayed here as it arrives,
+    # so a script writing output before it has read all of its input cannot block.
+    import _thread
+    sent = _thread.allocate_lock()
+    sent.acquire()
+    _thread.start_new_thread(send_stdin, (connection, sent))
+    status = 1
+    try:
+        streams = {CHANNEL_STDOUT: sys.stdout.buffer, CHANNEL_STDERR: sys.stderr.buffer}
+        while True:
+            head = read_exactly(connection, 5)
+            if len(head) < 5:
+                sys.stderr.write("Script server closed the connection\n")
+                break
+            data = read_exactly(connection, int.from_bytes(head[1:], 'big'))
+            if head[0] == CHANNEL_EXIT:
+                status = int(data)
+                break
+            streams[head[0]].write(data)
+            if head[0] == CHANNEL_STDERR:
+                sys.stderr.flush()
+    except OSError as e:
+        sys.stderr.write(f"Script server error: {e}\n")
+    finally:
+        # The server reads all of stdin before it sends the status, so this waits only on errors
+        sent.acquire()
+        connection.close()
+    
+    sys.stdout.flush()
+    sys.exit(status)
+
+
+def bootstrap(script):
+    """Hand this run of script to a script server, or else start profiling it if $COT_PROFILE asks."""
+    forward_to_server(script)
+    if os.environ.get('COT_PROFILE'):
+        # Imported only when asked, as the profiler's own imports would slow every run
+        from script_profiler import start_profiling
+        start_profiling(script)
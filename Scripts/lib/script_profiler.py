@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+
+"""
+Script Profiler - See where a CotEditor script run spends its time
+
+script_client.bootstrap() calls start_profiling(__file__) for a script
+when $COT_PROFILE is set, in the script server if one runs it, so nothing
+is imported or wrapped when it is not. A profiled run writes a report to
+a side file, never to stdout, which replaces the selection, and names the
+file on stderr:
+
+- wall time per phase: startup (the script's imports, up to its first
+  input or output), reading stdin, the phases the script declares, the
+  rest of the processing, and writing stdout
+- input and output sizes
+- the functions taking the most time, from cProfile, whose raw stats are
+  saved next to the report for pstats or other viewers
+- peak traced memory and the largest allocation sites alive when output
+  began, from tracemalloc
+
+$COT_PROFILE is 1 (or all) for everything, or a comma-separated list of
+time, cprofile and tracemalloc; phase times are most accurate with time
+alone, as the other two slow the run down. Reports are written to
+$COT_PROFILE_DIR, by default the 'profiles' folder of the scripts' cache
+directory.
+
+A script declares its phases in a module-level PROFILE_PHASES dict that
+maps phase names to names of its functions (or attributes of modules it
+imported, such as 'json.loads'):
+
+    PROFILE_PHASES = {'parse': ['parse_stylesheet'], 'format': ['format_css_issues']}
+
+Those functions are timed when the script first reads or writes, so they
+must return their results rather than be generators. Time in a phase
+function is counted once, in the innermost phase running.
+"""
+
+import os
+import sys
+import time
+
+
+PROFILE_VARIABLE = 'COT_PROFILE'
+PROFILE_MODES = ('time', 'cprofile', 'tracemalloc')
+
+# Lines of cProfile functions and tracemalloc allocation sites reported
+REPORT_FUNCTIONS = 40
+REPORT_ALLOCATION_SITES = 15
+
+# The profiler of this run, once started
+_profiler = None
+
+
+def profile_modes(value):
+    """Return the profiling modes named by a $COT_PROFILE value, empty if profiling is off."""
+    value = value.strip().lower()
+    if value in ('', '0', 'no', 'false', 'off'):
+        return set()
+    if value in ('1', 'yes', 'true', 'on', 'all'):
+        return set(PROFILE_MODES)
+    return ({mode.strip() for mode in value.split(',')} & set(PROFILE_MODES)) | {'time'}
+
+
+class TimedReader:
+    """Proxy of sys.stdin that counts what is read and times reading as the 'read' phase."""
+    
+    def __init__(self, stream, profiler):
+        self._stream = stream
+        self._profiler = profiler
+    
+    def _call(self, method, *args):
+        profiler = self._profiler
+        profiler.enter('read')
+        try:
+            data = method(*args)
+        finally:
+            profiler.leave()
+        profiler.count_input(data)
+        return data
+    
+    def read(self, *args):
+        return self._call(self._stream.read, *args)
+    
+    def readline(self, *args):
+        return self._call(self._stream.readline, *args)
+    
+    def readlines(self, *args):
+        return self._call(self._stream.readlines, *args)
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+    
+    @property
+    def buffer(self):
+        return TimedBinaryReader(self._stream.buffer, self._profiler)
+    
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class TimedBinaryReader(TimedReader):
+    """Proxy of sys.stdin.buffer, for scripts reading bytes (see lib/stream_io.py)."""
+    
+    def read1(self, *args):
+        return self._call(self._stream.read1, *args)
+    
+    def readinto(self, buffer):
+        profiler = self._profiler
+        profiler.enter('read')
+        try:
+            size = self._stream.readinto(buffer)
+        finally:
+            profiler.leave()
+        profiler.input_bytes += size or 0
+        return size
+
+
+class TimedWriter:
+    """Proxy of sys.stdout that counts what is written and times writing as the 'write' phase."""
+    
+    def __init__(self, stream, profiler):
+        self._stream = stream
+        self._profiler = profiler
+    
+    def _call(self, method, *args):
+        profiler = self._profiler
+        profiler.output_started()
+        profiler.enter('write')
+        try:
+            return method(*args)
+        finally:
+            profiler.leave()
+    
+    def write(self, text):
+        self._profiler.count_output(text)
+        return self._call(self._stream.write, text)
+    
+    def writelines(self, lines):
+        lines = list(lines)
+        for line in lines:
+            self._profiler.count_output(line)
+        return self._call(self._stream.writelines, lines)
+    
+    def flush(self):
+        return self._call(self._stream.flush)
+    
+    @property
+    def buffer(self):
+        return TimedBinaryWriter(self._stream.buffer, self._profiler)
+    
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class TimedBinaryWriter(TimedWriter):
+    """Proxy of sys.stdout.buffer, for scripts writing bytes (see lib/stream_io.py)."""
+
+
+class ScriptProfiler:
+    """Phase timer, IO counter and cProfile/tracemalloc session of one script run."""
+    
+    def __init__(self, script, modes):
+        self.script = os.path.abspath(script)
+        self.modes = modes
+        self.started = time.perf_counter()
+        self.first_io = None
+        self.phases = {}  # Phase name -> seconds
+        self.stack = []  # [phase, time it last resumed] of the phases running
+        self.wrapped = []  # (owner, name, original) of the phase functions
+        self.input_characters = self.input_bytes = 0
+        self.output_characters = self.output_bytes = 0
+        self.profile = None
+        self.snapshot = None
+        self.stdin = self.stdout = None
+    
+    def start(self):
+        """Start timing the script, replacing sys.stdin and sys.stdout with counting proxies."""
+        if 'tracemalloc' in self.modes:
+            import tracemalloc
+            tracemalloc.start()
+        if 'cprofile' in self.modes:
+            import cProfile
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self.stdin, self.stdout = sys.stdin, sys.stdout
+        if sys.stdin is not None:
+            sys.stdin = TimedReader(sys.stdin, self)
+        sys.stdout = TimedWriter(sys.stdout, self)
+    
+    def enter(self, phase):
+        """Start timing phase, pausing the phase it runs within."""
+        now = time.perf_counter()
+        if self.first_io is None:
+            self.first_io = now
+            self.wrap_phases()
+        if self.stack:
+            running = self.stack[-1]
+            self.phases[running[0]] = self.phases.get(running[0], 0) + now - running[1]
+        self.stack.append([phase, now])
+    
+    def leave(self):
+        """Stop timing the innermost phase, resuming the one it ran within."""
+        now = time.perf_counter()
+        phase, since = self.stack.pop()
+        self.phases[phase] = self.phases.get(phase, 0) + now - since
+        if self.stack:
+            self.stack[-1][1] = now
+    
+    def count_input(self, data):
+        if isinstance(data, list):
+            for item in data:
+                self.count_input(item)
+        elif isinstance(data, str):
+            self.input_characters += len(data)
+            self.input_bytes += len(data.encode('utf-8', 'surrogateescape'))
+        else:
+            self.input_bytes += len(data)
+    
+    def count_output(self, data):
+        if isinstance(data, str):
+            self.output_characters += len(data)
+            self.output_bytes += len(data.encode('utf-8', 'surrogateescape'))
+        else:
+            self.output_bytes += len(data)
+    
+    def output_started(self):
+        """Note the live allocations once, as output begins and results are at hand."""
+        if self.snapshot is None and 'tracemalloc' in self.modes:
+            import tracemalloc
+            if tracemalloc.is_tracing():
+                self.snapshot = tracemalloc.take_snapshot()
+    
+    def wrap_phases(self):
+        """Time the functions named in the script's PROFILE_PHASES as their phases."""
+        main = sys.modules.get('__main__')
+        declared = getattr(main, 'PROFILE_PHASES', None) or {}
+        for phase, names in declared.items():
+            for name in names:
+                owner = main
+                *path, attribute = name.split('.')
+                for part in path:
+                    owner = getattr(owner, part, None)
+                function = getattr(owner, attribute, None)
+                if callable(function):
+                    self.wrapped.append((owner, attribute, function))
+                    setattr(owner, attribute, self.timed(phase, function))
+    
+    def timed(self, phase, function):
+        def timed_function(*args, **kwargs):
+            self.enter(phase)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.leave()
+        timed_function.__wrapped__ = function
+        return timed_function
+    
+    def finish(self):
+        """Stop profiling, restore stdin, stdout and the phase functions, and write the report."""
+        try:
+            sys.stdout.flush()
+        except (OSError, ValueError):
+            pass
+        ended = time.perf_counter()
+        if self.profile is not None:
+            self.profile.disable()
+        traced_peak = None
+        if 'tracemalloc' in self.modes:
+            import tracemalloc
+            if tracemalloc.is_tracing():
+                if self.snapshot is None:
+                    self.snapshot = tracemalloc.take_snapshot()
+                traced_peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        while self.stack:
+            self.leave()
+        for owner, attribute, function in self.wrapped:
+            setattr(owner, attribute, function)
+        if isinstance(sys.stdin, TimedReader):
+            sys.stdin = self.stdin
+        if isinstance(sys.stdout, TimedWriter):
+            sys.stdout = self.stdout
+        
+        try:
+            path = report_path(self.script)
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(self.format_report(ended, traced_peak))
+            if self.profile is not None:
+                self.profile.dump_stats(os.path.splitext(path)[0] + '.prof')
+        except OSError as e:
+            sys.stderr.write(f"Could not write profile: {e}\n")
+            return
+        sys.stderr.write(f"Profile written to {path}\n")
+    
+    def format_report(self, ended, traced_peak):
+        total = ended - self.started
+        first_io = self.first_io if self.first_io is not None else ended
+        phases = dict(self.phases)
+        startup = first_io - self.started
+        measured = {'startup': startup, 'read': phases.pop('read', 0)}
+        write = phases.pop('write', 0)
+        measured.update(phases)
+        measured['other'] = max(0.0, total - sum(measured.values()) - write)
+        measured['write'] = write
+        
+        slowed_by = ' and '.join(sorted(self.modes - {'time'}))
+        timing_note = f' (slowed down by {slowed_by})' if slowed_by else ''
+        lines = [
+            f"Script: {self.script}",
+            f"Arguments: {' '.join(sys.argv[1:])}",
+            f"Date: {time.strftime('%Y-%m-%d %H:%M:%S')}",
+            f"Python: {sys.version.split()[0]}",
+            "",
+            f"Input: {describe_size(self.input_characters, self.input_bytes)}",
+            f"Output: {describe_size(self.output_characters, self.output_bytes)}",
+            "",
+            f"Phases, wall time{timing_note}:",
+            f"  {'phase':<20} {'ms':>10} {'%':>6}",
+        ]
+        for phase, seconds in measured.items():
+            share = seconds / total * 100 if total else 0
+            lines.append(f"  {phase:<20} {seconds * 1000:>10.1f} {share:>6.1f}")
+        lines.append(f"  {'total':<20} {total * 1000:>10.1f}")
+        
+        if traced_peak is not None:
+            import tracemalloc
+            lines += ["", f"Memory: {traced_peak / (1 << 20):.1f} MiB traced at peak",
+                      "Largest allocations alive when output began:"]
+            statistics = self.snapshot.filter_traces([
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+                tracemalloc.Filter(False, __file__),
+            ]).statistics('lineno')
+            for statistic in statistics[:REPORT_ALLOCATION_SITES]:
+                frame = statistic.traceback[0]
+                lines.append(f"  {statistic.size / 1024:>10.1f} KiB {statistic.count:>8} blocks  {frame.filename}:{frame.lineno}")
+        
+        if self.profile is not None:
+            import io
+            import pstats
+            output = io.StringIO()
+            pstats.Stats(self.profile, stream=output).sort_stats('cumulative').print_stats(REPORT_FUNCTIONS)
+            lines += ["", "Functions by cumulative time (cProfile):", output.getvalue().strip('\n')]
+        return '\n'.join(lines) + '\n'
+
+
+def describe_size(characters, size):
+    """Describe an input or output size; characters are not counted when a script reads or writes bytes."""
+    return f"{characters} characters, {size} bytes" if characters else f"{size} bytes"
+
+
+def report_path(script):
+    """Return a new report file path for a run of script, creating its directory."""
+    directory = os.environ.get('COT_PROFILE_DIR')
+    if not directory:
+        from lint_cache import cache_directory
+        directory = os.path.join(cache_directory(), 'profiles')
+    os.makedirs(directory, exist_ok=True)
+    name = os.path.splitext(os.path.basename(script))[0]
+    return os.path.join(directory, f"{name} {time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.txt")
+
+
+def start_profiling(script):
+    """Profile this run of script as $COT_PROFILE asks, writing the report when it ends."""
+    global _profiler
+    modes = profile_modes(os.environ.get(PROFILE_VARIABLE, ''))
+    if not modes or _profiler is not None:
+        return
+    _profiler = ScriptProfiler(script, modes)
+    _profiler.start()
+    # The script server finishes its runs itself, as they end without exiting
+    import script_client
+    if not script_client.serving:
+        import atexit
+        atexit.register(finish_profiling)
+
+
+def finish_profiling():
+    """Write the report of the profiled run, if there is one."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.finish()
@@ -0,0 +1,289 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Script Server - Resident runner for the CotEditor Python scripts
+
+Every script normally starts a fresh interpreter, which then imports its
+modules (yaml, csv, json, email, ...) and compiles its patterns before
+doing what is often a sub-millisecond transform. The server pays that
+once: it loads every Python script under the Scripts folder, then runs
+each script that forwards to it (see script_client.py) in a forked
+child, with the caller's arguments, working directory, environment and
+stdin, as its __main__ module. Children start with every import and
+compiled pattern already in place, and a failing script cannot affect
+the server or other runs.
+
+Usage:
+    script_server.py [--socket=PATH]
+
+The socket defaults to script_client.socket_path(). Scripts edited while
+the server runs are compiled again on their next run.
+"""
+
+import sys
+import dis
+import importlib
+import io
+import os
+import signal
+import socket
+import traceback
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import script_client
+import script_profiler
+from script_client import CHANNEL_EXIT, CHANNEL_STDERR, CHANNEL_STDOUT, read_exactly
+
+
+SCRIPTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# Folders under the Scripts folder that hold no runnable scripts
+SKIPPED_FOLDERS = {'lib', 'Sample Scripts', '__pycache__'}
+
+# Seconds a client has to send its request header
+HEADER_TIMEOUT = 5
+
+# Bytes of a script's stdout gathered into one frame, unless it flushes sooner
+OUTPUT_BUFFER_SIZE = 1 << 16
+
+
+def find_scripts(directory=SCRIPTS_DIRECTORY):
+    """Yield the paths of the Python scripts under directory, by their '#!' line."""
+    for folder, folders, files in os.walk(directory):
+        folders[:] = sorted(name for name in folders if name not in SKIPPED_FOLDERS)
+        for name in sorted(files):
+            path = os.path.join(folder, name)
+            try:
+                with open(path, 'rb') as file:
+                    first_line = file.readline()
+            except OSError:
+                continue
+            if first_line.startswith(b'#!') and b'python' in first_line:
+                yield os.path.abspath(path)
+
+
+class ScriptCode:
+    """Compiled code of scripts by path, compiled again when a script's file changes."""
+    
+    def __init__(self):
+        self.code = {}  # Path -> (mtime_ns, code object)
+    
+    def get(self, path):
+        """Return the code object for the script at path, or None if it cannot be compiled."""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            cached = self.code.get(path)
+            if cached is None or cached[0] != mtime:
+                with open(path, 'rb') as file:
+                    cached = self.code[path] = (mtime, compile(file.read(), path, 'exec'))
+        except (OSError, SyntaxError, ValueError):
+            return None
+        return cached[1]
+    
+    def preload(self, paths):
+        """Compile and import each script, without running its main, so its imports are loaded.
+        
+        Modules the scripts import inside functions, only for the
+        operations that need them, are imported too.
+        """
+        for path in paths:
+            code = self.get(path)
+            if code is None:
+                continue
+            module = types.ModuleType('_preloaded_script')
+            module.__file__ = path
+            try:
+                exec(code, module.__dict__)
+            except Exception as e:
+                # Scripts missing an optional dependency still run, and report it, when asked
+                sys.stderr.write(f"{os.path.relpath(path, SCRIPTS_DIRECTORY)}: {e!r}\n")
+            for name in sorted(nested_imports(code)):
+                try:
+                    importlib.import_module(name)
+                except Exception:
+                    pass
+
+
+def nested_imports(code):
+    """Return the absolute module names imported by the functions within a code object."""
+    names = set()
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names.update(instruction.argval for instruction in dis.get_instructions(const)
+                         if instruction.opname == 'IMPORT_NAME')
+            names.update(nested_imports(const))
+    return names
+
+
+def decode_fields(connection):
+    """Read a request header and return its fields."""
+    size = int.from_bytes(read_exactly(connection, 4), 'big')
+    data = read_exactly(connection, size)
+    if len(data) < size:
+        raise OSError("Incomplete request")
+    return data.decode('utf-8', 'surrogateescape').split('\0')
+
+
+class SocketReader(io.RawIOBase):
+    """Raw stream over the client's stdin data on a socket."""
+    
+    def __init__(self, connection):
+        self.connection = connection
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        return self.connection.recv_into(buffer)
+
+
+class SocketWriter(io.RawIOBase):
+    """Raw stream sending what is written to it to the client as frames of one channel."""
+    
+    def __init__(self, connection, channel):
+        self.connection = connection
+        self.channel = channel
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        send_frame(self.connection, self.channel, data)
+        return len(data)
+
+
+def send_frame(connection, channel, data):
+    connection.sendall(bytes([channel]) + len(data).to_bytes(4, 'big') + data)
+
+
+def run_script(connection, path, code, cwd, args, environment):
+    """Run a script's code as __main__ with the client's stdio, sending its output and status.
+    
+    Output is sent as the script flushes it, while the client sends stdin
+    from a thread of its own, so neither side waits for the other to read.
+    """
+    os.chdir(cwd)
+    os.environ.clear()
+    os.environ.update(environment)
+    sys.argv = [path] + args
+    sys.path[0] = os.path.dirname(path)
+    
+    stdin = io.BufferedReader(SocketReader(connection))
+    stdout = io.BufferedWriter(SocketWriter(connection, CHANNEL_STDOUT), OUTPUT_BUFFER_SIZE)
+    stderr = io.BufferedWriter(SocketWriter(connection, CHANNEL_STDERR))
+    # Error handlers as the interpreter chose them, so served runs treat bad UTF-8 alike
+    input_errors = getattr(sys.__stdin__, 'errors', None)
+    output_errors = getattr(sys.__stdout__, 'errors', None)
+    sys.stdin = io.TextIOWrapper(stdin, encoding='utf-8', errors=input_errors, newline='\n')
+    sys.stdout = io.TextIOWrapper(stdout, encoding='utf-8', errors=output_errors, newline='\n')
+    sys.stderr = io.TextIOWrapper(stderr, encoding='utf-8', errors='backslashreplace', newline='\n',
+                                  line_buffering=True)
+    
+    module = types.ModuleType('__main__')
+    module.__file__ = path
+    module.__builtins__ = __builtins__
+    sys.modules['__main__'] = module
+    status = 0
+    try:
+        exec(code, module.__dict__)
+    except SystemExit as e:
+        # As the interpreter does: None is success, other non-integers are printed
+        if e.code is None or isinstance(e.code, int):
+            status = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            status = 1
+    except BaseException as e:
+        # Leave this frame out, as the interpreter would have no such caller
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        status = 1
+    # Children exit without running atexit handlers, so profiled runs report here
+    script_profiler.finish_profiling()
+    
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except (OSError, ValueError):
+        pass
+    # Read the rest of stdin, so the client has sent all of it when it learns the status
+    while stdin.read1(1 << 16):
+        pass
+    send_frame(connection, CHANNEL_EXIT, str(status).encode('ascii'))
+
+
+def handle(connection, scripts, server):
+    """Serve one request, forking a child to run the script."""
+    connection.settimeout(HEADER_TIMEOUT)
+    script, cwd, count, *fields = decode_fields(connection)
+    count = int(count)
+    args = fields[:count]
+    environment = dict(field.partition('=')[::2] for field in fields[count:])
+    
+    code = scripts.get(os.path.realpath(script)) if os.path.isabs(script) else None
+    if code is None:
+        connection.sendall(b'-')
+        return
+    connection.sendall(b'+')
+    
+    if os.fork():
+        return
+    try:
+        server.close()
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        connection.settimeout(None)
+        run_script(connection, script, code, cwd, args, environment)
+        status = 0
+    except BaseException:
+        status = 1
+    os._exit(status)
+
+
+def serve(path):
+    """Listen on a Unix domain socket at path and serve requests until interrupted."""
+    script_client.serving = True
+    scripts = ScriptCode()
+    script_paths = [os.path.realpath(script) for script in find_scripts()]
+    scripts.preload(script_paths)
+    
+    # Only this user may reach the socket
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    # Children are reaped automatically, and termination removes the socket
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit())
+    
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        previous_umask = os.umask(0o077)
+        try:
+            server.bind(path)
+        finally:
+            os.umask(previous_umask)
+        server.listen(64)
+        sys.stderr.write(f"Serving {len(script_paths)} scripts on {path}\n")
+        try:
+            while True:
+                connection, _ = server.accept()
+                with connection:
+                    try:
+                        handle(connection, scripts, server)
+                    except (OSError, ValueError) as e:
+                        sys.stderr.write(f"Request failed: {e}\n")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(path)
+
+
+def main():
+    options = dict(arg[2:].partition('=')[::2] for arg in sys.argv[1:] if arg.startswith('--'))
+    serve(options.get('socket') or script_client.socket_path())
+
+
+if __name__ == "__main__":
+    main()
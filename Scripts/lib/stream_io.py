@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+"""
+Stream IO - Chunked stdin and stdout for the CotEditor scripts
+
+sys.stdin.read() decodes the whole selection before a script can start,
+and sys.stdout.write() of a whole result encodes a second, binary copy of
+it. InputReader instead reads stdin's bytes in large chunks through an
+incremental UTF-8 decoder and hands them out as chunks, lines or records
+as they arrive; OutputWriter gathers output text and writes it to
+stdout's bytes in large encoded blocks. A script using both produces its
+first output while its input is still being read, and holds neither in
+full unless its transform needs to.
+
+    reader = InputReader()
+    with OutputWriter() as output:
+        for line in reader.lines():
+            output.write(convert(line))
+
+Newlines are left as they are, as sys.stdin leaves them, and lines end at
+'\\n' only. Input may be taken as lines, records and chunks in turn; each
+continues where the last one stopped.
+"""
+
+import codecs
+import sys
+
+
+# Bytes read from stdin, and characters gathered for stdout, at a time
+CHUNK_SIZE = 1 << 20
+
+
+class InputReader:
+    """Text of a binary stream, stdin's by default, decoded incrementally from large reads.
+    
+    Args:
+        stream: Binary stream to read; by default sys.stdin.buffer, or
+            sys.stdin itself if it is a text stream without one
+        chunk_size: Bytes to read at a time; a read returns what has
+            arrived, up to this size, rather than wait for all of it
+        errors: Decoding error handler, as for bytes.decode(); by default
+            sys.stdin's when reading stdin (surrogateescape in the C or
+            POSIX locale), otherwise strict
+    """
+    
+    def __init__(self, stream=None, chunk_size=CHUNK_SIZE, errors=None):
+        if stream is None:
+            errors = errors or getattr(sys.stdin, 'errors', None)
+            stream = getattr(sys.stdin, 'buffer', sys.stdin)
+        errors = errors or 'strict'
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = None
+        if stream is not None and not hasattr(stream, 'encoding'):
+            self.decoder = codecs.getincrementaldecoder('utf-8')(errors)
+        self.buffer = ''  # Decoded text not handed out yet, from position on
+        self.position = 0
+        self.finished = stream is None
+    
+    def _read_chunk(self):
+        """Return the next decoded chunk, '' at the end of the input."""
+        while not self.finished:
+            if self.decoder is None:
+                text = self.stream.read(self.chunk_size)
+                self.finished = not text
+                return text
+            read = getattr(self.stream, 'read1', self.stream.read)
+            data = read(self.chunk_size)
+            self.finished = not data
+            text = self.decoder.decode(data, final=self.finished)
+            if text:
+                return text
+        return ''
+    
+    def chunks(self):
+        """Yield the rest of the input as text chunks of about chunk_size characters or less."""
+        if self.position < len(self.buffer):
+            chunk = self.buffer[self.position:]
+            self.buffer, self.position = '', 0
+            yield chunk
+        self.buffer, self.position = '', 0
+        for chunk in iter(self._read_chunk, ''):
+            yield chunk
+    
+    def records(self, separator, keep_separator=False):
+        """Yield the rest of the input split at each separator, the last record unterminated.
+        
+        With keep_separator, each record ends with its separator. Records
+        are cut from the decoded text as each completes, so only the
+        current record and the chunk it ends in are held.
+        """
+        width = len(separator)
+        keep = width if keep_separator else 0
+        while True:
+            buffer, position = self.buffer, self.position
+            end = buffer.find(separator, position)
+            if end >= 0:
+                self.position = end + width
+                yield buffer[position:end + keep]
+                continue
+            # Gather chunks up to one that ends the unfinished record, then join them once,
+            # so a record of many chunks is not copied again for each
+            parts = [buffer[position:]]
+            chunk = self._read_chunk()
+            while chunk:
+                boundary = parts[-1][1 - width:] + chunk[:width - 1] if width > 1 else ''
+                parts.append(chunk)
+                if separator in chunk or separator in boundary:
+                    break
+                chunk = self._read_chunk()
+            self.buffer, self.position = ''.join(parts), 0
+            if not chunk:
+                break
+        rest = self.buffer[self.position:]
+        self.buffer, self.position = '', 0
+        if rest:
+            yield rest
+    
+    def lines(self):
+        """Yield the rest of the input line by line, each with its '\\n' ending but the last."""
+        return self.records('\n', keep_separator=True)
+    
+    def read(self, size=-1):
+        """Return up to size characters of the rest of the input, or all of it; '' at its end.
+        
+        Makes the reader a text stream to functions that read one.
+        """
+        if size is None or size < 0:
+            return ''.join(self.chunks())
+        parts = [self.buffer[self.position:]]
+        length = len(parts[0])
+        while length < size and not self.finished:
+            chunk = self._read_chunk()
+            parts.append(chunk)
+            length += len(chunk)
+        text = ''.join(parts)
+        self.buffer, self.position = text, min(size, length)
+        return text[:size]
+    
+    def readline(self):
+        """Return the next line with its ending, '' at the end of the input."""
+        return next(self.lines(), '')
+
+
+class OutputWriter:
+    """Text writer gathering output and writing it UTF-8 encoded to a binary stream in large blocks.
+    
+    Args:
+        stream: Binary stream to write; by default sys.stdout.buffer, or
+            sys.stdout itself if it is a text stream without one. Pending
+            sys.stdout text is flushed first, so output stays in order.
+        buffer_size: Characters gathered before they are encoded and written
+        errors: Encoding error handler, as for str.encode(); by default
+            sys.stdout's when writing stdout, so text decoded from stdin
+            with surrogateescape is written back as the same bytes
+    
+    Text is only written when buffer_size is reached, on flush() and on
+    leaving a with block, so use one or flush at the end.
+    """
+    
+    def __init__(self, stream=None, buffer_size=CHUNK_SIZE, errors=None):
+        if stream is None:
+            sys.stdout.flush()
+            errors = errors or getattr(sys.stdout, 'errors', None)
+            stream = getattr(sys.stdout, 'buffer', sys.stdout)
+        self.stream = stream
+        self.binary = not hasattr(stream, 'encoding')
+        self.buffer_size = buffer_size
+        self.errors = errors or 'strict'
+        self.pending = []
+        self.pending_size = 0
+    
+    def write(self, text):
+        self.pending.append(text)
+        self.pending_size += len(text)
+        if self.pending_size >= self.buffer_size:
+            self._write_pending()
+        return len(text)
+    
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+    
+    def _write_pending(self):
+        text = ''.join(self.pending)
+        self.pending.clear()
+        self.pending_size = 0
+        # A long text is encoded a block at a time, never as one copy of the whole
+        for start in range(0, len(text), self.buffer_size):
+            block = text[start:start + self.buffer_size]
+            self.stream.write(block.encode('utf-8', self.errors) if self.binary else block)
+    
+    def flush(self):
+        self._write_pending()
+        self.stream.flush()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.flush()
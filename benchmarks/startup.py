@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Startup Benchmark - Import time budget for the CotEditor Python scripts
+
+Run each Python script under `python -X importtime` the way CotEditor
+starts it, with no selection and no script server, and add up the time
+spent importing modules after interpreter startup. Reports every script's
+median import time over several runs and exits with status 1 if any
+exceeds its budget, so startup regressions are caught.
+
+Usage:
+    python3 benchmarks/startup.py [--runs=N] [--scale=F] [script ...]
+
+Options:
+    --runs=N   Runs per script; the median counts (default 5)
+    --scale=F  Multiply every budget by F, for slower or faster machines
+"""
+
+import sys
+import os
+import statistics
+import subprocess
+
+
+SCRIPTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Scripts')
+
+# Folders under the Scripts folder that hold no runnable scripts
+SKIPPED_FOLDERS = {'lib', 'Sample Scripts', '__pycache__'}
+
+# Import time budgets in milliseconds, by script file name. The default
+# covers re, json or csv; optional dependencies such as yaml (~35 ms) or
+# numpy (~80 ms) must be imported by the operation that needs them.
+DEFAULT_BUDGET_MS = 20
+BUDGETS_MS = {
+    # Token patterns are compiled when the lexer is imported
+    'JavaScript Linter.py': 30,
+    # The glob and result cache modules are needed before any file is linted
+    'Lint Files.py': 30,
+    # Output is spooled to a temporary file before the document is replaced
+    'Tidy JSON (python).sh': 30,
+}
+
+# Runs the script as __main__, as the interpreter would; the marker separates
+# interpreter startup from the script's imports
+LOADER = """
+import os, sys
+path = sys.argv[1]
+sys.argv = [path]
+sys.path[0] = os.path.dirname(path)
+with open(path, 'rb') as file:
+    code = compile(file.read(), path, 'exec')
+sys.stderr.write('\\0script\\n')
+sys.stderr.flush()
+exec(code, {'__name__': '__main__', '__file__': path, '__builtins__': __builtins__})
+"""
+
+
+def find_scripts(directory=SCRIPTS_DIRECTORY):
+    """Yield the paths of the Python scripts under directory, by their '#!' line."""
+    for folder, folders, files in os.walk(directory):
+        folders[:] = sorted(name for name in folders if name not in SKIPPED_FOLDERS)
+        for name in sorted(files):
+            path = os.path.join(folder, name)
+            with open(path, 'rb') as file:
+                first_line = file.readline()
+            if first_line.startswith(b'#!') and b'python' in first_line:
+                yield path
+
+
+def parse_import_times(report):
+    """Return {top-level module: cumulative microseconds} from -X importtime output after the marker."""
+    imports = {}
+    _, _, report = report.partition('\0script\n')
+    for line in report.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue  # The column header
+        name = fields[2][1:]
+        if not name.startswith(' '):
+            imports[name] = imports.get(name, 0) + int(fields[1])
+    return imports
+
+
+def measure_script(path):
+    """Run a script once with no input and return its top-level imports' times."""
+    # A socket path that cannot exist, so the script runs here rather than in a server
+    environment = dict(os.environ, COT_SCRIPT_SERVER=os.path.join(os.devnull, 'server.sock'))
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', LOADER, path],
+                             stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE, env=environment, text=True)
+    return parse_import_times(process.stderr)
+
+
+def main():
+    args = sys.argv[1:]
+    options = dict(arg[2:].partition('=')[::2] for arg in args if arg.startswith('--'))
+    runs = int(options.get('runs') or 5)
+    scale = float(options.get('scale') or 1)
+    scripts = [arg for arg in args if not arg.startswith('--')] or list(find_scripts())
+
+    failed = []
+    print(f"{'script':<40} {'ms':>7} {'budget':>7}  heaviest imports")
+    for path in scripts:
+        measure_script(path)  # Writes bytecode caches, so every counted run starts alike
+        samples = [measure_script(path) for _ in range(runs)]
+        milliseconds = statistics.median(sum(imports.values()) for imports in samples) / 1000
+        budget = BUDGETS_MS.get(os.path.basename(path), DEFAULT_BUDGET_MS) * scale
+
+        heaviest = sorted(samples[-1].items(), key=lambda item: -item[1])[:3]
+        details = ', '.join(f'{name} {time / 1000:.1f}' for name, time in heaviest)
+        over = milliseconds > budget
+        if over:
+            failed.append(path)
+        name = os.path.basename(path)
+        print(f"{name:<40} {milliseconds:>7.1f} {budget:>7.1f}  {details}{'  OVER BUDGET' if over else ''}")
+
+    if failed:
+        print(f"\n{len(failed)} script(s) over their import budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,605 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Transform Benchmark - Throughput of the CotEditor Python script transforms
+
+Generate deterministic synthetic inputs of each type the scripts work on
+(CSV, JSON pretty-printed and minified, JSON Lines, YAML, CSS, JavaScript, HTML, Markdown, and prose
+with and without whitespace) at each size, then time every benchmarked
+script function on them. Each function runs in its own process, so memory
+figures are its own:
+
+- seconds, runs: fastest of several runs, stopping early once they take
+  a second in total; mb_per_s is the input size over the fastest run
+- rss_before_bytes, peak_rss_bytes: resident memory with the input and
+  script loaded, and at its peak during the runs
+- traced_peak_bytes: peak Python memory allocated by one traced run
+- gc_collections: young-generation collections per run, one for every
+  few hundred container objects allocated and kept alive
+
+Results are printed as a table and written as JSON, with the commit and
+interpreter, so runs on different commits can be compared.
+
+Usage:
+    python3 benchmarks/transforms.py [options] [name ...]
+
+Names select the benchmarks starting with them, e.g. `lint_` or
+`csv_to_json`. Options:
+    --sizes=LIST    Comma-separated input sizes out of 1KB, 1MB and 100MB
+                    (default 1KB,1MB)
+    --repeat=N      Most runs per benchmark (default 5)
+    --timeout=S     Seconds after which a benchmark is stopped (default 600)
+    --output=PATH   JSON results file (default benchmark-results.json)
+    --compare=PATH  Earlier results file to show the throughput change from
+    --list          List the benchmarks and exit
+"""
+
+import sys
+import os
+import gc
+import importlib.machinery
+import importlib.util
+import io
+import itertools
+import json
+import random
+import subprocess
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+
+SCRIPTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Scripts')
+
+SIZES = {'1KB': 1 << 10, '1MB': 1 << 20, '100MB': 100 << 20}
+DEFAULT_SIZES = '1KB,1MB'
+
+# Runs stop once they have taken this many seconds in total
+MIN_RUN_TIME = 1.0
+
+
+# Corpus generation
+# Every corpus is built from a random.Random seeded with its type, so the
+# same size always yields the same text.
+
+WORDS = (
+    'the', 'of', 'and', 'to', 'in', 'is', 'that', 'for', 'it', 'as', 'was', 'with', 'be', 'by',
+    'on', 'not', 'he', 'she', 'this', 'are', 'or', 'his', 'from', 'at', 'which', 'but', 'have',
+    'an', 'had', 'they', 'you', 'were', 'their', 'one', 'all', 'we', 'can', 'her', 'has', 'there',
+    'been', 'if', 'more', 'when', 'will', 'would', 'who', 'so', 'no', 'editor', 'document',
+    'script', 'window', 'selection', 'theme', 'syntax', 'highlight', 'line', 'column', 'file',
+    'folder', 'project', 'format', 'encoding', 'character', 'paragraph', 'sentence', 'word',
+    'report', 'value', 'record', 'table', 'query', 'server', 'client', 'request', 'response',
+    'quickly', 'slowly', 'carefully', 'simple', 'complex', 'large', 'small', 'new', 'old',
+    'very', 'really', 'quite', 'basically', 'actually', 'just', 'literally', 'obviously',
+    'in order to', 'due to the fact that', 'at this point in time', 'absolutely essential',
+    'alot', 'recieve', 'seperate', 'definately', 'utilize', 'leverage', 'café', 'naïve',
+    'résumé', 'façade', 'Zürich', 'was written', 'were given', 'is used', 'running', 'walked',
+    'analysis', 'performance', 'throughput', 'memory', 'benchmark', 'corpus', 'parser',
+)
+FIRST_NAMES = ('Ada', 'Alan', 'Grace', 'Linus', 'Margaret', 'Dennis', 'Barbara', 'Ken', 'Frances',
+               'Edsger', 'Hedy', 'Niklaus', 'Radia', 'Guido', 'Yukihiro', 'Sophie', 'José', 'Chloé')
+LAST_NAMES = ('Lovelace', 'Turing', 'Hopper', 'Torvalds', 'Hamilton', 'Ritchie', 'Liskov',
+              'Thompson', 'Allen', 'Dijkstra', 'Lamarr', 'Wirth', 'Perlman', 'van Rossum',
+              'Matsumoto', 'Wilson', 'García', 'Dubois')
+CITIES = ('Tokyo', 'Paris', 'New York', 'São Paulo', 'Berlin', 'Zürich', 'Lagos', 'Mumbai',
+          'Sydney', 'Toronto', 'Reykjavík', 'Seoul', 'Mexico City', 'Cairo', 'Oslo')
+DOMAINS = ('example.com', 'example.org', 'test.net', 'mail.example.co.uk', 'coteditor.com')
+TAGS = ('alpha', 'beta', 'stable', 'urgent', 'archived', 'draft', 'review', 'public')
+IDENTIFIERS = tuple(word for word in WORDS if word.isascii() and word.isalpha() and len(word) > 2)
+
+CSS_SELECTORS = ('.{name}', '#{name}-{n}', '.{name} > .{name}-item', 'ul.{name} li a:hover',
+                 'div#{name}-{n} .{name}-title', 'button.{name}:focus, a.{name}:focus',
+                 '.{name}::before', 'input[type="text"].{name}', 'header .{name} nav')
+CSS_DECLARATIONS = (
+    ('color', '#FFFFFF'), ('color', '#333'), ('background-color', 'rgb(12, 34, 56)'),
+    ('background', '#fff url("/images/bg.png") no-repeat'), ('margin', '0px'),
+    ('margin', '0 auto'), ('padding', '10px 20px'), ('font-family', 'Helvetica, Arial, sans-serif'),
+    ('font-size', '14px'), ('font-weight', 'bold'), ('display', 'flex'), ('width', '100%'),
+    ('border', '1px solid #ccc'), ('border-radius', '4px'), ('z-index', '9999'),
+    ('-webkit-transition', 'all 0.3s ease'), ('transition', 'all 0.3s ease'),
+    ('color', 'red !important'), ('line-height', '1.5'), ('text-align', 'center'),
+    ('box-shadow', '0 2px 4px rgba(0, 0, 0, 0.2)'), ('float', 'left'),
+)
+
+JS_UNITS = (
+    'function {name}{n}(a, b) {{\n  var result = a + b;\n  if (result == null) {{\n'
+    '    console.log("empty {name}");\n  }}\n  return result;\n}}\n\n',
+    'const {name}{n} = (items) => items.map(item => item.{prop} * 2);\n\n',
+    'let {name}Count{n} = 0;\nfor (let i = 0; i < 10; i++) {{\n  {name}Count{n} += i;\n}}\n\n',
+    "class {Name}{n} {{\n  constructor(options) {{\n    this.{prop} = options.{prop} || '{name}';\n"
+    "  }}\n\n  get{Name}() {{\n    return `${{this.{prop}}}-{n}`;\n  }}\n}}\n\n",
+    '// {sentence}\nvar {name}Config{n} = {{ {prop}: "{name}", enabled: true, retries: {n} }};\n\n',
+    '/* {sentence} */\nasync function fetch{Name}{n}(url) {{\n'
+    '  const response = await fetch(url + "?id={n}");\n'
+    "  if (!response.ok) throw new Error('Request failed: ' + response.status);\n"
+    '  return response.json();\n}}\n\n',
+    "const pattern{n} = /^[a-z]+\\d*$/i;\nconst matches{n} = '{name}'.match(pattern{n}) !== null;\n\n",
+    'export default function {name}Handler{n}(event) {{\n  undefinedHelper{n}(event.target);\n'
+    '  return event.{prop} === "{name}" ? 1 : 0;\n}}\n\n',
+)
+
+
+def _date(rng):
+    return f'{rng.randint(1990, 2030)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+
+
+def _email(rng, name):
+    return f"{name.lower().replace(' ', '.')}@{rng.choice(DOMAINS)}"
+
+
+def _sentence(rng):
+    """Return a sentence of random words, now and then with a URL, email address or date in it."""
+    words = rng.choices(WORDS, k=rng.randint(4, 28))
+    extra = rng.random()
+    if extra < 0.04:
+        words.insert(rng.randrange(len(words)), f'https://www.{rng.choice(DOMAINS)}/{rng.choice(IDENTIFIERS)}'
+                                                 f'?id={rng.randint(1, 999)}&utm_source=newsletter')
+    elif extra < 0.06:
+        words.insert(rng.randrange(len(words)), _email(rng, rng.choice(FIRST_NAMES)))
+    elif extra < 0.08:
+        words.insert(rng.randrange(len(words)), _date(rng))
+    text = ' '.join(words)
+    return text[0].upper() + text[1:] + rng.choice('.....?!')
+
+
+def _records(rng):
+    for number in itertools.count(1):
+        name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        yield {
+            'id': number,
+            'name': name,
+            'email': _email(rng, name),
+            'active': rng.random() < 0.7,
+            'score': round(rng.uniform(0, 1000), 2),
+            'tags': rng.sample(TAGS, rng.randint(0, 3)),
+            'address': {'city': rng.choice(CITIES), 'zip': f'{rng.randint(1000, 99999):05d}'},
+            'created': _date(rng),
+            'note': None if rng.random() < 0.3 else _sentence(rng),
+        }
+
+
+def _take(size, units):
+    """Return units from an iterator until their total length reaches size."""
+    parts = []
+    total = 0
+    for unit in units:
+        parts.append(unit)
+        total += len(unit)
+        if total >= size:
+            break
+    return parts
+
+
+def generate_prose(size, rng):
+    def paragraphs():
+        while True:
+            yield ' '.join(_sentence(rng) for _ in range(rng.randint(1, 7))) + '\n\n'
+    return ''.join(_take(size, paragraphs()))
+
+
+def generate_unbroken(size, rng):
+    # Sentences run together with no whitespace, as in minified or encoded text
+    def tokens():
+        while True:
+            yield rng.choice('-/,.;') + _sentence(rng).replace(' ', rng.choice('-_'))
+    return ''.join(_take(size, tokens()))
+
+
+def generate_csv(size, rng):
+    def rows():
+        for record in _records(rng):
+            note = record['note'] or ''
+            if ',' in note or rng.random() < 0.2:
+                note = '"' + note.replace('"', '""') + ', see ' + record['address']['city'] + '"'
+            yield (f"{record['id']},{record['name']},{record['email']},{record['address']['city']},"
+                   f"{record['score']:.2f},{record['created']},{note}\n")
+    header = 'id,name,email,city,amount,date,note\n'
+    return header + ''.join(_take(size - len(header), rows()))
+
+
+def generate_json(size, rng):
+    records = (json.dumps(record, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+               for record in _records(rng))
+    return '[\n  ' + ',\n  '.join(_take(size, records)) + '\n]\n'
+
+
+def generate_minified_json(size, rng):
+    records = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) for record in _records(rng))
+    return '[' + ','.join(_take(size, records)) + ']'
+
+
+def generate_json_lines(size, rng):
+    return ''.join(_take(size, (json.dumps(record, ensure_ascii=False) + '\n' for record in _records(rng))))
+
+
+def generate_yaml(size, rng):
+    def documents():
+        for record in _records(rng):
+            strings = {key: json.dumps(record[key], ensure_ascii=False) for key in ('name', 'email', 'created', 'note')}
+            yield (f"- id: {record['id']}\n"
+                   f"  name: {strings['name']}\n"
+                   f"  email: {strings['email']}\n"
+                   f"  active: {'true' if record['active'] else 'false'}\n"
+                   f"  score: {record['score']}\n"
+                   f"  tags: [{', '.join(record['tags'])}]\n"
+                   f"  address:\n"
+                   f"    city: {json.dumps(record['address']['city'], ensure_ascii=False)}\n"
+                   f"    zip: '{record['address']['zip']}'\n"
+                   f"  created: {strings['created']}\n"
+                   f"  note: {strings['note']}\n")
+    return ''.join(_take(size, documents()))
+
+
+def generate_css(size, rng):
+    def rules():
+        for number in itertools.count(1):
+            selector = rng.choice(CSS_SELECTORS).format(name=rng.choice(IDENTIFIERS), n=number)
+            declarations = rng.sample(CSS_DECLARATIONS, rng.randint(2, 7))
+            rule = f'{selector} {{\n' + ''.join(f'  {name}: {value};\n' for name, value in declarations) + '}\n'
+            if number % 25 == 0:
+                rule = '@media (max-width: 768px) {\n  ' + rule.replace('\n', '\n  ').rstrip() + '\n}\n'
+            elif number % 40 == 0:
+                rule = f'/* {_sentence(rng)} */\n' + rule
+            yield rule + '\n'
+    # Statement at-rules have no block, which every rule visiting the tree must allow for
+    return '@charset "utf-8";\n@import url("base.css");\n\n' + ''.join(_take(size, rules()))
+
+
+def generate_javascript(size, rng):
+    def units():
+        for number in itertools.count(1):
+            name = rng.choice(IDENTIFIERS)
+            yield rng.choice(JS_UNITS).format(name=name, Name=name.capitalize(), n=number,
+                                              prop=rng.choice(IDENTIFIERS), sentence=_sentence(rng))
+    return "'use strict';\n\n" + ''.join(_take(size, units()))
+
+
+def generate_html(size, rng):
+    def sections():
+        for number in itertools.count(1):
+            word = rng.choice(IDENTIFIERS)
+            items = ''.join(f'  <li>{_sentence(rng)}</li>\n' for _ in range(rng.randint(2, 5)))
+            section = (f'<section id="section-{number}" class="content {word}">\n'
+                       f'<h2>{_sentence(rng).rstrip(".?!")}</h2>\n'
+                       f'<p>{_sentence(rng)} <a href="https://www.{rng.choice(DOMAINS)}/{word}/{number}">{word}</a> '
+                       f'{_sentence(rng)} <strong>{word}</strong> &amp; <em>{rng.choice(WORDS)}</em>.</p>\n'
+                       f'<ul>\n{items}</ul>\n'
+                       f'<img src="/images/{word}-{number}.png" alt="{word}">\n'
+                       f'<p><code>{word}({number})</code> {_sentence(rng)}</p>\n'
+                       f'<!-- {word} -->\n')
+            if number % 10 == 0:
+                section += (f'<table>\n<tr><th>Name</th><th>Value</th></tr>\n'
+                            f'<tr><td>{word}</td><td>{number}</td></tr>\n</table>\n'
+                            f'<script>console.log("{word}");</script>\n')
+            yield section + '</section>\n'
+    head = '<!DOCTYPE html>\n<html>\n<head>\n<title>Benchmark</title>\n<style>body { margin: 0; }</style>\n</head>\n<body>\n'
+    tail = '</body>\n</html>\n'
+    return head + ''.join(_take(size - len(head) - len(tail), sections())) + tail
+
+
+def generate_markdown(size, rng):
+    def blocks():
+        for number in itertools.count(1):
+            word = rng.choice(IDENTIFIERS)
+            kind = rng.random()
+            if number % 8 == 1:
+                yield f"{'#' * rng.randint(2, 4)} {_sentence(rng).rstrip('.?!')}\n\n"
+            elif kind < 0.4:
+                yield (f'{_sentence(rng)} **{word}** and *{rng.choice(WORDS)}* with `{word}()`. '
+                       f'See [{word}](https://www.{rng.choice(DOMAINS)}/{word}/{number}). {_sentence(rng)}\n\n')
+            elif kind < 0.55:
+                yield ''.join(f'- {_sentence(rng)}\n' for _ in range(rng.randint(2, 5))) + '\n'
+            elif kind < 0.65:
+                yield ''.join(f'{index}. {_sentence(rng)}\n' for index in range(1, rng.randint(3, 6))) + '\n'
+            elif kind < 0.75:
+                yield (f"```\n{rng.choice(('GET', 'POST', 'PUT', 'DELETE'))} /api/{word}/{number}\n"
+                       f"const {word} = fetch('/api/{word}');\n```\n\n")
+            elif kind < 0.85:
+                yield f'> {_sentence(rng)}\n> {_sentence(rng)}\n\n'
+            elif kind < 0.92:
+                yield f'![{word}](images/{word}-{number}.png)\n\n'
+            else:
+                yield f'| Name | Value |\n| --- | --- |\n| {word} | {number} |\n\n'
+    return '# Benchmark Document\n\n' + ''.join(_take(size, blocks()))
+
+
+GENERATORS = {
+    'prose': generate_prose,
+    'unbroken': generate_unbroken,
+    'csv': generate_csv,
+    'json': generate_json,
+    'json_min': generate_minified_json,
+    'jsonl': generate_json_lines,
+    'yaml': generate_yaml,
+    'css': generate_css,
+    'js': generate_javascript,
+    'html': generate_html,
+    'markdown': generate_markdown,
+}
+
+
+def generate(kind, size):
+    """Return the deterministic synthetic corpus of a type and approximate size in characters."""
+    return GENERATORS[kind](size, random.Random(kind))
+
+
+# Benchmarks
+
+# A benchmarked function: script path under the Scripts folder, corpus
+# type, and a function running it given the script module and the corpus
+Benchmark = namedtuple('Benchmark', ['name', 'script', 'kind', 'run'])
+
+CONVERSION = 'Case & Format Conversion/Data Format Conversion/'
+FORMAT = 'Case & Format Conversion/Format Conversion/'
+GENERATION = 'Code Formatting & Linting/Code Generation/'
+LINTING = 'Code Formatting & Linting/Linting/'
+ANALYSIS = 'Data Processing/Analysis/'
+EXTRACTION = 'Data Processing/Extraction/'
+DOCUMENT = 'Utilities/Document Operations/'
+
+
+def call(function, *args, **kwargs):
+    """Return a benchmark runner calling a script function with the corpus and args."""
+    return lambda module, text: getattr(module, function)(text, *args, **kwargs)
+
+
+def tidy(module, text, sort_keys=False):
+    """Re-indent JSON with Tidy JSON, given as 1MB chunks of text, and return the output."""
+    parts = []
+    module.tidy_json((text[start:start + (1 << 20)] for start in range(0, len(text), 1 << 20)), parts.append, sort_keys)
+    return ''.join(parts)
+
+
+BENCHMARKS = [
+    Benchmark('csv_to_json', CONVERSION + 'CSV to JSON.py', 'csv', call('csv_to_json')),
+    Benchmark('csv_to_json[object]', CONVERSION + 'CSV to JSON.py', 'csv', call('csv_to_json', 'object')),
+    Benchmark('json_to_csv', CONVERSION + 'JSON to CSV.py', 'json', call('json_to_csv')),
+    Benchmark('iter_json_lines_to_csv', CONVERSION + 'JSON to CSV.py', 'jsonl',
+              lambda module, text: ''.join(module.iter_json_lines_to_csv(io.StringIO(text), []))),
+    Benchmark('json_to_yaml', CONVERSION + 'JSON to YAML.py', 'json', call('json_to_yaml')),
+    Benchmark('iter_json_lines_to_yaml', CONVERSION + 'JSON to YAML.py', 'jsonl',
+              lambda module, text: ''.join(module.iter_json_lines_to_yaml(io.StringIO(text), [], workers=1))),
+    Benchmark('yaml_to_json', CONVERSION + 'YAML to JSON.py', 'yaml', call('yaml_to_json')),
+    Benchmark('css_to_scss', FORMAT + 'CSS to SCSS.py', 'css', call('css_to_scss')),
+    Benchmark('html_to_markdown', FORMAT + 'HTML to Markdown.py', 'html', call('html_to_markdown')),
+    Benchmark('markdown_to_html', FORMAT + 'Markdown to HTML.py', 'markdown', call('markdown_to_html')),
+    Benchmark('js_to_ts', FORMAT + 'JavaScript to TypeScript.py', 'js', call('js_to_ts')),
+    Benchmark('text_to_ascii_art', FORMAT + 'Text to ASCII Art.py', 'prose', call('text_to_ascii_art')),
+    Benchmark('generate_schema', GENERATION + 'JSON Schema Generator.py', 'json',
+              lambda module, text: module.format_schema(module.generate_schema(json.loads(text)))),
+    Benchmark('generate_api_client', GENERATION + 'API Client Generator.py', 'markdown',
+              lambda module, text: module.generate_api_client(module.parse_api_endpoints(text))),
+    Benchmark('lint_css', LINTING + 'CSS Linter.py', 'css', call('lint_css')),
+    Benchmark('lint_javascript', LINTING + 'JavaScript Linter.py', 'js', call('lint_javascript')),
+    Benchmark('lint_json', LINTING + 'JSON Linter.py', 'json', call('lint_json')),
+    Benchmark('lint_json_lines', LINTING + 'JSON Linter.py', 'jsonl',
+              lambda module, text: module.lint_json_lines(io.StringIO(text), workers=1)),
+    Benchmark('lint_writing', LINTING + 'Writing Style Linter.py', 'prose', call('lint_writing')),
+    Benchmark('analyze_text', ANALYSIS + 'Text Statistics.py', 'prose', call('analyze_text')),
+    Benchmark('analyze_text[approximate]', ANALYSIS + 'Text Statistics.py', 'prose',
+              call('analyze_text', approximate=True)),
+    Benchmark('analyze_stream', ANALYSIS + 'Text Statistics.py', 'prose',
+              lambda module, text: module.analyze_stream(io.StringIO(text))),
+    Benchmark('analyze_stream[unbroken]', ANALYSIS + 'Text Statistics.py', 'unbroken',
+              lambda module, text: module.analyze_stream(io.StringIO(text))),
+    Benchmark('process_csv[info]', ANALYSIS + 'CSV Processor.py', 'csv', call('process_csv', 'info')),
+    Benchmark('process_csv[stats]', ANALYSIS + 'CSV Processor.py', 'csv', call('process_csv', 'stats')),
+    Benchmark('process_csv[transpose]', ANALYSIS + 'CSV Processor.py', 'csv', call('process_csv', 'transpose')),
+    Benchmark('process_csv[sort]', ANALYSIS + 'CSV Processor.py', 'csv',
+              lambda module, text: module.process_csv(text, 'sort', module.parse_sort_keys('5:numeric:desc,2'))),
+    Benchmark('process_csv[unique]', ANALYSIS + 'CSV Processor.py', 'csv', call('process_csv', 'unique')),
+    Benchmark('validate_data[csv]', ANALYSIS + 'Data Validator.py', 'csv', call('validate_data', 'csv')),
+    Benchmark('validate_data[json]', ANALYSIS + 'Data Validator.py', 'json', call('validate_data', 'json')),
+    Benchmark('validate_data[email]', ANALYSIS + 'Data Validator.py', 'prose', call('validate_data', 'email')),
+    Benchmark('validate_data[date]', ANALYSIS + 'Data Validator.py', 'prose', call('validate_data', 'date')),
+    Benchmark('process_markdown[info]', ANALYSIS + 'Markdown Processor.py', 'markdown', call('process_markdown', 'info')),
+    Benchmark('process_markdown[toc]', ANALYSIS + 'Markdown Processor.py', 'markdown', call('process_markdown', 'toc')),
+    Benchmark('process_markdown[clean]', ANALYSIS + 'Markdown Processor.py', 'markdown',
+              call('process_markdown', 'clean')),
+    Benchmark('process_markdown[extract_links]', ANALYSIS + 'Markdown Processor.py', 'markdown',
+              call('process_markdown', 'extract_links')),
+    Benchmark('process_markdown[validate]', ANALYSIS + 'Markdown Processor.py', 'markdown',
+              call('process_markdown', 'validate')),
+    Benchmark('transform_text[snake_case]', ANALYSIS + 'Text Transformer.py', 'prose',
+              call('transform_text', 'snake_case')),
+    Benchmark('transform_text[Title Case]', ANALYSIS + 'Text Transformer.py', 'prose',
+              call('transform_text', 'Title Case')),
+    Benchmark('transform_text[slug]', ANALYSIS + 'Text Transformer.py', 'prose', call('transform_text', 'slug')),
+    Benchmark('tidy_json', DOCUMENT + 'Tidy JSON (python).sh', 'json', lambda module, text: tidy(module, text)),
+    Benchmark('tidy_json[minified]', DOCUMENT + 'Tidy JSON (python).sh', 'json_min',
+              lambda module, text: tidy(module, text)),
+    Benchmark('tidy_json[sort_keys]', DOCUMENT + 'Tidy JSON (python).sh', 'json_min',
+              lambda module, text: tidy(module, text, sort_keys=True)),
+    Benchmark('add_line_number', ANALYSIS + 'Smart Line Numbers.py', 'prose', call('add_line_number')),
+    Benchmark('process_html[clean]', EXTRACTION + 'HTML Processor.py', 'html', call('process_html', 'clean')),
+    Benchmark('process_html[extract_text]', EXTRACTION + 'HTML Processor.py', 'html',
+              call('process_html', 'extract_text')),
+    Benchmark('process_html[extract_links]', EXTRACTION + 'HTML Processor.py', 'html',
+              call('process_html', 'extract_links')),
+    Benchmark('process_html[format]', EXTRACTION + 'HTML Processor.py', 'html', call('process_html', 'format')),
+    Benchmark('process_urls[validate]', EXTRACTION + 'URL Processor.py', 'prose', call('process_urls', 'validate')),
+    Benchmark('process_urls[parse]', EXTRACTION + 'URL Processor.py', 'prose', call('process_urls', 'parse')),
+    Benchmark('process_urls[clean]', EXTRACTION + 'URL Processor.py', 'prose', call('process_urls', 'clean')),
+    Benchmark('process_urls[extract_domains]', EXTRACTION + 'URL Processor.py', 'prose',
+              call('process_urls', 'extract_domains')),
+]
+BENCHMARKS_BY_NAME = {benchmark.name: benchmark for benchmark in BENCHMARKS}
+
+
+def load_script(script):
+    """Import a script as a module, without running its main."""
+    path = os.path.join(SCRIPTS_DIRECTORY, script)
+    module_name = 'benchmarked_' + os.path.splitext(os.path.basename(script))[0].lower().replace(' ', '_')
+    # The .sh scripts are Python too, which their extension would not tell
+    loader = importlib.machinery.SourceFileLoader(module_name, path)
+    spec = importlib.util.spec_from_file_location(module_name, path, loader=loader)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def peak_rss():
+    """Return the process's peak resident memory in bytes."""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def reset_peak_rss():
+    """Reset the peak resident memory to the current one, where the system allows (Linux)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+    except OSError:
+        pass
+
+
+def young_collections():
+    return gc.get_stats()[0]['collections']
+
+
+def measure(benchmark, corpus_path, repeat):
+    """Run a benchmark on the corpus file in this process and return its measurements."""
+    import tracemalloc
+    with open(corpus_path, 'rb') as file:
+        data = file.read()
+    input_bytes = len(data)
+    text = data.decode('utf-8')
+    del data
+    module = load_script(benchmark.script)
+    gc.collect()
+    reset_peak_rss()
+    rss_before = peak_rss()
+    
+    times = []
+    collections = young_collections()
+    while len(times) < repeat and sum(times) < MIN_RUN_TIME:
+        start = time.perf_counter()
+        result = benchmark.run(module, text)
+        times.append(time.perf_counter() - start)
+        del result
+    collections = young_collections() - collections
+    peak = peak_rss()
+    
+    # Tracing slows allocation down, so it gets a run of its own
+    tracemalloc.start()
+    result = benchmark.run(module, text)
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    
+    times.sort()
+    return {
+        'input_bytes': input_bytes,
+        'runs': len(times),
+        'seconds': times[0],
+        'median_seconds': times[len(times) // 2],
+        'mb_per_s': input_bytes / (1 << 20) / times[0] if times[0] else None,
+        'rss_before_bytes': rss_before,
+        'peak_rss_bytes': peak,
+        'traced_peak_bytes': traced_peak,
+        'gc_collections': collections / len(times),
+    }
+
+
+def run_benchmark(benchmark, corpus_path, repeat, timeout):
+    """Measure a benchmark in a child process and return its measurements with a status."""
+    try:
+        process = subprocess.run([sys.executable, os.path.abspath(__file__), '--measure', benchmark.name,
+                                  corpus_path, str(repeat)],
+                                 stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'status': 'timeout'}
+    lines = process.stdout.splitlines()
+    if process.returncode != 0 or not lines:
+        error = process.stderr.strip().splitlines()
+        return {'status': 'error: ' + (error[-1] if error else f'exit status {process.returncode}')}
+    return dict(json.loads(lines[-1]), status='ok')
+
+
+def git_commit():
+    """Return the checked out commit of the repository, or None."""
+    try:
+        process = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                 capture_output=True, text=True)
+    except OSError:
+        return None
+    return process.stdout.strip() or None
+
+
+def format_bytes(size):
+    return f'{size / (1 << 20):.1f}' if size is not None else '-'
+
+
+def main():
+    args = sys.argv[1:]
+    if args[:1] == ['--measure']:
+        name, corpus_path, repeat = args[1:4]
+        print(json.dumps(measure(BENCHMARKS_BY_NAME[name], corpus_path, int(repeat))))
+        return
+    
+    options = dict(arg[2:].partition('=')[::2] for arg in args if arg.startswith('--'))
+    prefixes = [arg for arg in args if not arg.startswith('--')]
+    benchmarks = [benchmark for benchmark in BENCHMARKS
+                  if not prefixes or benchmark.name.startswith(tuple(prefixes))]
+    if 'list' in options:
+        for benchmark in benchmarks:
+            print(f'{benchmark.name:<36} {benchmark.kind:<9} {benchmark.script}')
+        return
+    sizes = (options.get('sizes') or DEFAULT_SIZES).split(',')
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown or not benchmarks:
+        sys.exit(f"Unknown size: {', '.join(unknown)}" if unknown else "No benchmark matches")
+    repeat = int(options.get('repeat') or 5)
+    timeout = float(options.get('timeout') or 600)
+    output = options.get('output') or 'benchmark-results.json'
+    baseline = {}
+    if options.get('compare'):
+        with open(options['compare'], encoding='utf-8') as file:
+            baseline = {(result['benchmark'], result['size']): result for result in json.load(file)['results']}
+    
+    results = []
+    print(f"{'benchmark':<36} {'size':>5} {'MB/s':>9} {'peak MB':>8} {'traced MB':>9}"
+          + ('   change' if baseline else ''))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            corpora = {}
+            for benchmark in benchmarks:
+                if benchmark.kind not in corpora:
+                    corpora[benchmark.kind] = os.path.join(directory, f'{benchmark.kind}-{size}')
+                    with open(corpora[benchmark.kind], 'w', encoding='utf-8') as file:
+                        file.write(generate(benchmark.kind, SIZES[size]))
+                
+                result = {'benchmark': benchmark.name, 'script': benchmark.script, 'input': benchmark.kind, 'size': size}
+                result.update(run_benchmark(benchmark, corpora[benchmark.kind], repeat, timeout))
+                results.append(result)
+                
+                if result['status'] != 'ok':
+                    print(f"{benchmark.name:<36} {size:>5}  {result['status']}")
+                    continue
+                line = (f"{benchmark.name:<36} {size:>5} {result['mb_per_s']:>9.2f} "
+                        f"{format_bytes(result['peak_rss_bytes']):>8} {format_bytes(result['traced_peak_bytes']):>9}")
+                previous = baseline.get((benchmark.name, size))
+                if previous and previous.get('mb_per_s'):
+                    line += f"  {(result['mb_per_s'] / previous['mb_per_s'] - 1) * 100:>+6.1f}%"
+                print(line, flush=True)
+    
+    report = {
+        'commit': git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+        file.write('\n')
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()